@@ -1,6 +1,14 @@
 from flask import Flask
 from .extensions import ma, limiter, cache
 from app.models import db 
+from app.migrations import upgrade_db_command
+from app.utils.json_provider import FastJSONProvider
+from app.utils.compression import init_compression
+from app.utils.metrics import init_metrics
+from app.utils.query_budget import init_query_budget
+from app.utils.engine_profiles import init_db
+from app.utils.limiter_storage import instance_storage_uri
+from app.utils.replicas import sync_replicas_command
 from .blueprints.customers import customers_bp
 from .blueprints.mechanics import mechanics_bp
 from .blueprints.tickets import tickets_bp
@@ -29,12 +37,16 @@ def create_app(config_name):
     app = Flask(__name__)
     #app.config.from_object(f'config.{config_name}')
     app.config.from_object(config_mapping[config_name])
+    app.json = FastJSONProvider(app) #same bytes as Flask's provider, encoded with orjson when installed
 
     #initialize extensions
     ma.init_app(app)
-    db.init_app(app)
+    init_db(app, db) #pool options and SQLite pragmas from DATABASE_PROFILE, READ_REPLICA_URIS binds
+    instance_storage_uri(app) #relative sqlite:/// limiter files live in the instance folder, like the database
     limiter.init_app(app)
     cache.init_app(app)
+    init_metrics(app) #Server-Timing on every response and GET /metrics; first, so it times the other hooks
+    init_query_budget(app) #per-route SQL statement budgets, QUERY_BUDGET_MODE
 
     #Register blueprints
     app.register_blueprint(customers_bp, url_prefix='/customers')
@@ -43,4 +55,10 @@ def create_app(config_name):
     app.register_blueprint(inventory_bp, url_prefix='/inventory')
     app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL) #Registering our swagger blueprint
 
+    #gzip/br for large responses; swagger.yaml and the Swagger UI files are compressed once, here
+    init_compression(app, static=[(SWAGGER_URL, swaggerui_blueprint.static_folder)])
+
+    app.cli.add_command(upgrade_db_command) #flask upgrade-db: migrate an existing database
+    app.cli.add_command(sync_replicas_command) #flask sync-replicas: refresh local SQLite replicas
+
     return app
\ No newline at end of file
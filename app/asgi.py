@@ -0,0 +1,134 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only, greenlet_spawn
+from app import create_app
+from app.models import db
+from app.utils.engine_profiles import PROFILES, set_pragmas
+from app.utils.replicas import EVENT_LOOP_ENGINE
+
+# ASGI serving (asgi_app.py): the same Flask app and blueprints, with reads on an event loop.
+#
+# GET and HEAD requests run on the loop, each in a greenlet, the way SQLAlchemy's
+# asyncio extension runs ORM code: the view is the ordinary synchronous one, but its
+# database calls go through an async driver (aiosqlite for SQLite, asyncpg for Postgres)
+# and every round trip awaits, so the loop serves other reads while one waits on the
+# database. db.session picks that engine up from the request (see RoutingSession).
+# Other requests run the app in a thread pool on the regular engine, since writes hash
+# passwords and hold SQLite's write lock, neither of which should stall the loop.
+#
+# Anything else a read does synchronously (cache and rate limit lookups) does block
+# the loop; those are local and short. Read replicas are not used in this mode.
+#
+# Optional packages, only for this mode: an ASGI server (uvicorn) and the async driver
+# (aiosqlite, or asyncpg). benchmarks/asgi_vs_wsgi.py compares it with gunicorn.
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+READ_METHODS = ('GET', 'HEAD')
+DEFAULT_WRITE_THREADS = 8
+
+def async_url(url):
+    """The URL of the same database through its asyncio driver."""
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        #WSGI paths are the raw bytes spelled as latin-1
+        'SCRIPT_NAME': root_path.encode().decode('latin-1'),
+        'PATH_INFO': path.encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ[name] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+class AsyncApp:
+    """ASGI app around a Flask app: reads on the event loop, everything else in threads."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        with flask_app.app_context():
+            url = db.engine.url #with the instance path already applied to SQLite files
+        self.engine = create_async_engine(async_url(url), **config['SQLALCHEMY_ENGINE_OPTIONS'])
+        set_pragmas(self.engine.sync_engine, PROFILES[config['DATABASE_PROFILE']]['pragmas'])
+        self.executor = ThreadPoolExecutor(config.get('ASGI_WRITE_THREADS', DEFAULT_WRITE_THREADS),
+                                           thread_name_prefix='asgi-write')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        environ = wsgi_environ(scope, await _read_body(receive))
+        if scope['method'] in READ_METHODS:
+            environ[EVENT_LOOP_ENGINE] = self.engine.sync_engine
+            await greenlet_spawn(self._respond, environ, lambda message: await_only(send(message)))
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._respond, environ,
+                                       lambda message: asyncio.run_coroutine_threadsafe(send(message), loop).result())
+
+    def _respond(self, environ, send):
+        #runs the WSGI app; send() hands one ASGI message to the server and waits for it
+        started = []
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]),
+                          [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]]
+        body = self.flask_app(environ, start_response)
+        try:
+            send({'type': 'http.response.start', 'status': started[0], 'headers': started[1]})
+            for chunk in body:
+                if chunk:
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown()
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def create_asgi_app(config_name):
+    return AsyncApp(create_app(config_name))
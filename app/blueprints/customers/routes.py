@@ -1,16 +1,25 @@
-from .schemas import customer_schema, customers_schema, login_schema
+from .schemas import customer_schema, login_schema, CustomerSchema
 from flask import request, jsonify
 from marshmallow import ValidationError
 from sqlalchemy import select
 from app.models import Customer, db, ServiceTicket
 from sqlalchemy.exc import IntegrityError
 from . import customers_bp
-from app.extensions import limiter, cache
+from app.extensions import rate_limit
+from app.utils.caching import cached_view
 from app.utils.util import encode_token, token_required
-from app.blueprints.tickets.schemas import tickets_schema
+from app.utils.passwords import hash_password, verify_password, burn_verify, PasswordHasherBusy
+from app.utils.pagination import keyset_paginate
+from app.utils.streaming import wants_ndjson, stream_collection
+from app.blueprints.tickets.schemas import ServiceTicketSchema
+from app.utils.fieldsets import read_plan
+from app.utils.serializers import dump
+from app.utils.etags import conditional
+from app.utils.query_budget import query_budget
 from sqlalchemy.exc import SQLAlchemyError
 
 @customers_bp.route("/login", methods=['POST'])
+@query_budget(3)
 def login():
     try:
         credentials = login_schema.load(request.json)
@@ -22,7 +31,20 @@ def login():
     query =select(Customer).where(Customer.email == email) 
     user = db.session.execute(query).scalars().first()
 
-    if user and user.password == password: #if we have a user associated with the username, validate the password
+    try:
+        if user is None:
+            burn_verify(password)
+            matches = False
+        else:
+            matches, needs_rehash = verify_password(user.password, password)
+    except PasswordHasherBusy:
+        return jsonify({'messages': "Too many logins in progress, try again shortly"}), 503, {'Retry-After': '1'}
+
+    if matches: #if we have a user associated with the username, validate the password
+        if needs_rehash:
+            #legacy plaintext row, or hashed with an older cost: upgrade it now that we know the password
+            user.password = hash_password(password)
+            db.session.commit()
         auth_token = encode_token(user.id)
 
         response = {
@@ -36,7 +58,8 @@ def login():
 
 # CREATE customer
 @customers_bp.route('/', methods=['POST'])
-@limiter.limit("5 per day") #no more than 5 new accounts per ip address
+@query_budget(3)
+@rate_limit('create_customer')
 def create_customer():
     try:
         input_data = request.get_json()
@@ -51,43 +74,57 @@ def create_customer():
 
         # This returns a Customer instance because load_instance=True
         new_customer = customer_schema.load(input_data)
+        new_customer.password = hash_password(new_customer.password)
         db.session.add(new_customer)
         db.session.commit()
         return customer_schema.jsonify(new_customer), 201
 
     except ValidationError as err:
         return jsonify(err.messages), 400
+    except PasswordHasherBusy:
+        return jsonify({"error": "Server busy, try again shortly"}), 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Unexpected error: {e}")
         return jsonify({"error": str(e)}), 500
 
-# Get all customers
+# Get all customers (?limit=&cursor=&count=true, or Accept: application/x-ndjson to stream)
+# ?fields=id,name picks fields, ?expand=tickets nests each customer's tickets
 @customers_bp.route('/', methods=['GET'])
-#@cache.cached(timeout=60) #store members for 60s. does not need to be the most updated
+@query_budget(3)
+@conditional(Customer)
 def get_customers():
+    key = [Customer.id]
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
-        query = select(Customer)
-        customers = db.paginate(query, page=page, per_page=per_page)
-        return customers_schema.jsonify(customers), 200
+        _, schema, columns, loaders = read_plan(Customer, CustomerSchema, key)
+        query = select(Customer).options(*columns)
+        if wants_ndjson():
+            return stream_collection(query, key, schema, options=columns + loaders)
+        page = keyset_paginate(query, key, schema, options=loaders)
+        return jsonify(page), 200
     except (ValueError, TypeError):
-        return jsonify({"error": "Invalid pagination parameters."}), 400
+        return jsonify({"error": "Invalid pagination or field parameters."}), 400
     except SQLAlchemyError as e:
         return jsonify({"error": str(e)}), 500
 
-# Get customer by id
+# Get customer by id (?fields= and ?expand= as above)
 @customers_bp.route('/<int:id>', methods=['GET'])
-@cache.cached(timeout=60) #store member for 60s. does not need to be the most updated
+@query_budget(5)
+@conditional(Customer)
+@cached_view('customers', 'tickets') #evicted by any customer or ticket write, so it can live for hours
 def get_customer(id):
-    customer = db.session.get(Customer, id)
+    try:
+        schema, _, columns, loaders = read_plan(Customer, CustomerSchema)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    customer = db.session.get(Customer, id, options=columns + loaders)
     if customer:
-        return customer_schema.jsonify(customer)
+        return jsonify(dump(schema, customer))
     return jsonify({"error": "Customer not found"}), 404
 
 #update by id
 @customers_bp.route('/<int:id>', methods=['PUT'])
-@limiter.limit("5 per day")  # prevent changes to accounts too often
+@query_budget(3)
+@rate_limit('update_customer')
 @token_required
 def update_customer(id, user_id):
     customer = db.session.get(Customer, id)
@@ -132,8 +169,9 @@ def update_customer(id, user_id):
 
 # DELETE customer
 @customers_bp.route('/<int:id>', methods=['DELETE'])
+@query_budget(3)
 @token_required
-@limiter.limit("5 per day") #limit the amount of accounts deleted to 5 max
+@rate_limit('delete_customer')
 def delete_customer(id, user_id):
     customer = db.session.get(Customer, id)
     if not customer:
@@ -144,10 +182,17 @@ def delete_customer(id, user_id):
     return jsonify({"message": f"Customer {id} deleted"}), 200
 
 @customers_bp.route('/my-tickets', methods=['GET'])
+@query_budget(4)
 @token_required
 def get_my_tickets(user_id):
-    tickets = db.session.execute(
-        select(ServiceTicket).where(ServiceTicket.customer_id == user_id)
-    ).scalars().all()
+    key = [ServiceTicket.service_date, ServiceTicket.id]
+    try:
+        _, schema, columns, loaders = read_plan(ServiceTicket, ServiceTicketSchema, key)
+        query = select(ServiceTicket).where(ServiceTicket.customer_id == user_id).options(*columns)
+        if wants_ndjson():
+            return stream_collection(query, key, schema, descending=True, options=columns + loaders)
+        page = keyset_paginate(query, key, schema, descending=True, options=loaders)
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid pagination or field parameters."}), 400
 
-    return tickets_schema.jsonify(tickets), 200
+    return jsonify(page), 200
@@ -6,6 +6,11 @@ class CustomerSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Customer
         load_instance = True
+        exclude = ('version',)
+    password = ma.auto_field(load_only=True) #only ever stored as a hash, never returned
+
+    # ?expand=tickets, each ticket in its compact shape
+    expansions = {'tickets': lambda: ma.Nested('ServiceTicketSchema', many=True)}
 
 customer_schema = CustomerSchema()
 customers_schema = CustomerSchema(many=True)
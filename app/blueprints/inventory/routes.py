@@ -1,12 +1,28 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from . import inventory_bp
-from .schemas import inventory_schema, inventories_schema
+from .schemas import inventory_schema, inventories_schema, inventory_import_schema
 from app.models import Inventory, db
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, func
 from marshmallow import ValidationError
+from app.utils.pagination import keyset_paginate, MAX_PAGE_SIZE
+from app.utils.streaming import wants_ndjson, stream_collection, NDJSON_MIMETYPE
+from app.utils.stock import restock
+from app.utils.search import search_parts, SEARCH_CANDIDATES
+from app.utils.serializers import dump
+from app.utils.etags import conditional
+from app.utils.query_budget import query_budget
+import csv
+import io
+import json
+import time
+
+SEARCH_DEFAULT_LIMIT = 20
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 100 #rows past this still count as failed, they just aren't listed
 
 # Create a part in inventory
 @inventory_bp.route("/", methods=["POST"])
+@query_budget(2)
 def create_part():
     try:
         part_data = inventory_schema.load(request.json)
@@ -18,15 +34,40 @@ def create_part():
 
     return inventory_schema.jsonify(part_data), 201
 
-# Get all parts
+# Get all parts (?limit=&cursor=&count=true, or Accept: application/x-ndjson to stream)
 @inventory_bp.route("/", methods=["GET"])
+@query_budget(3)
+@conditional(Inventory)
 def get_parts():
-    query = select(Inventory)
-    result = db.session.execute(query).scalars().all()
-    return inventories_schema.jsonify(result), 200
+    try:
+        if wants_ndjson():
+            return stream_collection(select(Inventory), [Inventory.id], inventories_schema)
+        page = keyset_paginate(select(Inventory), [Inventory.id], inventories_schema)
+    except (ValueError, TypeError):
+        return jsonify({"message": "Invalid pagination parameters."}), 400
+    return jsonify(page), 200
+
+# Search parts by name as you type (?q=oil fil&limit=20), best match first
+@inventory_bp.route("/search", methods=["GET"])
+@query_budget(1)
+def search_inventory():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"message": "q is required"}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"message": "limit must be positive"}), 400
+    limit = min(limit, current_app.config.get('MAX_PAGE_SIZE', MAX_PAGE_SIZE))
+    parts = search_parts(q, limit, current_app.config.get('SEARCH_CANDIDATES', SEARCH_CANDIDATES))
+    return jsonify({"items": dump(inventories_schema, parts)}), 200
 
 # Get a single part
 @inventory_bp.route("/<int:part_id>", methods=["GET"])
+@query_budget(2)
+@conditional(Inventory)
 def get_part(part_id):
     query = select(Inventory).where(Inventory.id == part_id)
     part = db.session.execute(query).scalars().first()
@@ -38,6 +79,7 @@ def get_part(part_id):
 
 #update part
 @inventory_bp.route("/<int:part_id>", methods=["PUT"])
+@query_budget(3)
 def update_part(part_id):
     part = db.session.get(Inventory, part_id)
     if part is None:
@@ -61,6 +103,7 @@ def update_part(part_id):
 
 # delete a part
 @inventory_bp.route("/<int:part_id>", methods=["DELETE"])
+@query_budget(5)
 def delete_part(part_id):
     query = select(Inventory).where(Inventory.id == part_id)
     part = db.session.execute(query).scalars().first()
@@ -70,4 +113,160 @@ def delete_part(part_id):
 
     db.session.delete(part)
     db.session.commit()
-    return jsonify({"message": f"Successfully deleted part {part_id}"}), 200
\ No newline at end of file
+    return jsonify({"message": f"Successfully deleted part {part_id}"}), 200
+
+# Put parts back on the shelf ({"quantity": 10})
+@inventory_bp.route("/<int:part_id>/restock", methods=["POST"])
+@query_budget(1)
+def restock_part(part_id):
+    quantity = (request.get_json(silent=True) or {}).get('quantity')
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        return jsonify({"message": "quantity must be a positive integer"}), 400
+
+    stock = restock(part_id, quantity)
+    if stock is None:
+        db.session.rollback()
+        return jsonify({"message": "Invalid part ID"}), 404
+    db.session.commit()
+    return jsonify({"id": part_id, "stock": stock}), 200
+
+def _import_format():
+    fmt = request.args.get('format')
+    if not fmt:
+        mimetype = request.files['file'].mimetype if 'file' in request.files else request.mimetype
+        fmt = 'ndjson' if mimetype in (NDJSON_MIMETYPE, 'application/jsonlines') else 'csv'
+    return fmt
+
+def _import_rows(stream, fmt):
+    #yields (line number, row dict or error message), reading the upload one line at a time
+    lines = (line.decode('utf-8-sig' if number == 0 else 'utf-8') for number, line in enumerate(stream))
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, "Too many columns"
+            else:
+                yield reader.line_num, row
+    else:
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield number, "Invalid JSON"
+                continue
+            yield number, row if isinstance(row, dict) else "Each line must be a JSON object"
+
+def _upsert_parts(batch):
+    #batch maps part name -> validated values; one lookup, one executemany per kind, one commit
+    existing = dict(db.session.execute(
+        select(Inventory.name, func.min(Inventory.id)).where(Inventory.name.in_(list(batch))).group_by(Inventory.name)
+    ).all())
+    updates = [{'id': existing[name], **values} for name, values in batch.items() if name in existing]
+    inserts = [values for name, values in batch.items() if name not in existing]
+    if updates:
+        db.session.execute(update(Inventory), updates)
+    if inserts:
+        db.session.execute(insert(Inventory), inserts)
+    db.session.commit()
+    return len(inserts), len(updates)
+
+# Import parts from a CSV or NDJSON upload (raw body or multipart "file"), upserting by name
+@inventory_bp.route("/import", methods=["POST"])
+@query_budget(None, repeats=None) #3 statements per IMPORT_BATCH_SIZE rows
+def import_parts():
+    fmt = _import_format()
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+    stream = request.files['file'].stream if 'file' in request.files else request.stream
+    batch_size = current_app.config.get('IMPORT_BATCH_SIZE', IMPORT_BATCH_SIZE)
+
+    started = time.perf_counter()
+    processed = created = updated = failed = 0
+    errors = []
+    pending = [] #(line, raw row) waiting to be validated and written as one batch
+
+    def record_error(line, error):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"line": line, "error": error})
+
+    def flush():
+        nonlocal created, updated
+        #validate the whole batch in one load(many=True) call, it is much cheaper than a call per row
+        try:
+            loaded = inventory_import_schema.load([row for _, row in pending], many=True)
+            messages = {}
+        except ValidationError as e:
+            loaded, messages = e.valid_data, e.messages
+        batch = {}
+        for i, (line, _) in enumerate(pending):
+            if i in messages:
+                record_error(line, messages[i])
+            else:
+                batch[loaded[i]['name']] = loaded[i] #last row for a name wins
+        pending.clear()
+        if batch:
+            inserted, changed = _upsert_parts(batch)
+            created, updated = created + inserted, updated + changed
+
+    try:
+        for line, row in _import_rows(stream, fmt):
+            processed += 1
+            if isinstance(row, str):
+                record_error(line, row)
+                continue
+            row.pop('id', None) #exports carry ids; imports match on name
+            if row.get('stock') == '':
+                row['stock'] = None #an untracked part, as exported
+            pending.append((line, row))
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({"message": "Upload must be UTF-8 encoded"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Unexpected error during inventory import: {e}")
+        return jsonify({"message": "Import failed", "details": str(e), "created": created, "updated": updated}), 500
+
+    elapsed = time.perf_counter() - started
+    return jsonify({
+        "processed": processed,
+        "created": created,
+        "updated": updated,
+        "failed": failed,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(processed / elapsed) if elapsed else processed,
+    }), 200
+
+# Export the whole catalog as CSV (default) or NDJSON (?format=ndjson), streamed in chunks
+@inventory_bp.route("/export", methods=["GET"])
+@query_budget(1)
+def export_parts():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+    try:
+        if fmt == 'ndjson':
+            return stream_collection(select(Inventory), [Inventory.id], inventories_schema,
+                                     headers={"Content-Disposition": "attachment; filename=inventory.ndjson"})
+
+        fieldnames = list(inventories_schema.fields)
+        def encode_csv(rows):
+            buffer = io.StringIO()
+            csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator='\n').writerows(rows)
+            return buffer.getvalue()
+        header = io.StringIO()
+        csv.DictWriter(header, fieldnames=fieldnames, lineterminator='\n').writeheader()
+
+        return stream_collection(select(Inventory), [Inventory.id], inventories_schema,
+                                 encode=encode_csv, mimetype='text/csv', prefix=header.getvalue(),
+                                 headers={"Content-Disposition": "attachment; filename=inventory.csv"})
+    except (ValueError, TypeError):
+        return jsonify({"message": "Invalid pagination parameters."}), 400
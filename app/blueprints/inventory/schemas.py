@@ -1,10 +1,14 @@
 from app.models import Inventory
 from app.extensions import ma
+from marshmallow import validate
 
 class InventorySchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Inventory
         load_instance = True
+        exclude = ('version',)
+    stock = ma.auto_field(validate=validate.Range(min=0))
 
 inventory_schema = InventorySchema()
 inventories_schema = InventorySchema(many=True)
+inventory_import_schema = InventorySchema(load_instance=False, exclude=('id',)) #plain dicts for bulk upserts
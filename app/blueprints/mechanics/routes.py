@@ -1,15 +1,25 @@
-from .schemas import mechanic_schema, mechanics_schema
+from .schemas import mechanic_schema, MechanicSchema
 from flask import request, jsonify
 from marshmallow import ValidationError
-from sqlalchemy import select
-from app.models import Mechanic, db
+from sqlalchemy import select, func, and_
+from sqlalchemy.orm import aliased
+from app.models import Mechanic, ServiceTicket, ticket_mechanic, db
+from datetime import datetime
 from sqlalchemy.exc import IntegrityError
 from . import mechanics_bp
-from app.extensions import limiter, cache
+from app.extensions import rate_limit
+from app.utils.caching import cached_view
+from app.utils.pagination import keyset_paginate
+from app.utils.streaming import wants_ndjson, stream_collection
+from app.utils.fieldsets import read_plan
+from app.utils.serializers import dump
+from app.utils.etags import conditional
+from app.utils.query_budget import query_budget
 
 #create mechanic
 @mechanics_bp.route('/', methods=['POST'])
-@limiter.limit("5 per day") #no more than 5 new accounts per ip address
+@query_budget(3)
+@rate_limit('create_mechanic')
 def create_mechanic():
     try:
         input_data = request.get_json()
@@ -33,26 +43,43 @@ def create_mechanic():
         print(f"Unexpected error: {e}")
         return jsonify({"error": str(e)}), 500
 
-#get all mechanics
+#get all mechanics (?limit=&cursor=&count=true, or Accept: application/x-ndjson to stream)
+#?fields=id,name picks fields, ?expand=tickets nests each mechanic's tickets
 @mechanics_bp.route('/', methods=['GET'])
-@cache.cached(timeout=60) #store memchanics for 60s. does not need frequent updates
+@query_budget(6)
+@conditional(Mechanic)
+@cached_view('mechanics', 'tickets', unless=wants_ndjson) #evicted by any mechanic or ticket write
 def get_mechanics():
-    query = select(Mechanic)
-    mechanics = db.session.execute(query).scalars().all()
-    return mechanics_schema.jsonify(mechanics)
-
-#get mechanic by id
+    key = [Mechanic.id]
+    try:
+        _, schema, columns, loaders = read_plan(Mechanic, MechanicSchema, key)
+        query = select(Mechanic).options(*columns)
+        if wants_ndjson():
+            return stream_collection(query, key, schema, options=columns + loaders)
+        page = keyset_paginate(query, key, schema, options=loaders)
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid pagination or field parameters."}), 400
+    return jsonify(page)
+
+#get mechanic by id (?fields= and ?expand= as above)
 @mechanics_bp.route('/<int:id>', methods=['GET'])
-@cache.cached(timeout=60) #store memchanic for 60s. does not need frequent updates
+@query_budget(5)
+@conditional(Mechanic)
+@cached_view('mechanics', 'tickets')
 def get_mechanic(id):
-    mechanic = db.session.get(Mechanic, id)
+    try:
+        schema, _, columns, loaders = read_plan(Mechanic, MechanicSchema)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    mechanic = db.session.get(Mechanic, id, options=columns + loaders)
     if mechanic:
-        return mechanic_schema.jsonify(mechanic)
+        return jsonify(dump(schema, mechanic))
     return jsonify({"error": "Mechanic not found"}), 404
 
 #update mechanic by id
 @mechanics_bp.route('/<int:id>', methods=['PUT'])
-@limiter.limit("50 per day") #prevent changes to accounts too often
+@query_budget(3)
+@rate_limit('update_mechanic')
 def update_mechanic(id):
     mechanic = db.session.get(Mechanic, id)
     if not mechanic:
@@ -87,7 +114,8 @@ def update_mechanic(id):
 
 #delete mechanic
 @mechanics_bp.route('/<int:id>', methods=['DELETE'])
-@limiter.limit("5 per day") #limit the amount of accounts deleted to 5 max
+@query_budget(5)
+@rate_limit('delete_mechanic')
 def delete_mechanic(id):
     mechanic = db.session.get(Mechanic, id)
     if not mechanic:
@@ -98,23 +126,48 @@ def delete_mechanic(id):
     return jsonify({"message": f"Mechanic {id} deleted"}), 200
 
 @mechanics_bp.route('/most_worked', methods=['GET'])
+@query_budget(1)
 def mechanics_by_ticket_count():
-    mechanics = db.session.query(Mechanic).all()
-
-    # create list of (mechanic, count of tickets)
-    mechanics_with_counts = [
-        (mechanic, len(mechanic.tickets))
-        for mechanic in mechanics
-    ]
-
-    # sort descending by ticket count
-    mechanics_with_counts.sort(key=lambda x: x[1], reverse=True)
+    # ?limit=N returns the top N ranks, so every mechanic tied at the cut-off is included
+    # ?start_date=&end_date= (YYYY-MM-DD, inclusive) only count tickets serviced in that range
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_date = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None
+        end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None
+    except ValueError:
+        return jsonify({"error": "Invalid limit or date. Dates use YYYY-MM-DD."}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": "limit must be positive."}), 400
+
+    # count assignments straight from ticket_mechanic, only joining tickets when filtering on date
+    worked = ticket_mechanic
+    date_filter = []
+    if start_date:
+        date_filter.append(ServiceTicket.service_date >= start_date)
+    if end_date:
+        date_filter.append(ServiceTicket.service_date <= end_date)
+    if date_filter:
+        worked = ticket_mechanic.join(ServiceTicket, and_(ServiceTicket.id == ticket_mechanic.c.ticket_id, *date_filter))
+
+    # one GROUP BY; the LEFT JOIN keeps mechanics with no tickets at 0
+    ticket_count = func.count(ticket_mechanic.c.ticket_id)
+    ranked = (
+        select(Mechanic, ticket_count.label('ticket_count'), func.rank().over(order_by=ticket_count.desc()).label('rank'))
+        .outerjoin(worked, ticket_mechanic.c.mechanic_id == Mechanic.id)
+        .group_by(Mechanic.id)
+    ).subquery()
+    mechanic = aliased(Mechanic, ranked)
+    query = select(mechanic, ranked.c.ticket_count, ranked.c.rank).order_by(ranked.c.rank, ranked.c.id)
+    if limit:
+        query = query.where(ranked.c.rank <= limit)
 
-    # response
     result = []
-    for mechanic, count in mechanics_with_counts:
-        mechanic_data = mechanic_schema.dump(mechanic)
-        mechanic_data['ticket_count'] = count
+    for row in db.session.execute(query):
+        mechanic_data = mechanic_schema.dump(row[0])
+        mechanic_data['ticket_count'] = row.ticket_count
+        mechanic_data['rank'] = row.rank
         result.append(mechanic_data)
 
     return jsonify(result)
@@ -5,6 +5,10 @@ class MechanicSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Mechanic
         load_instance = True
+        exclude = ('version',)
+
+    # ?expand=tickets, each ticket in its compact shape
+    expansions = {'tickets': lambda: ma.Nested('ServiceTicketSchema', many=True)}
 
 mechanic_schema = MechanicSchema()
 mechanics_schema = MechanicSchema(many=True)
\ No newline at end of file
@@ -1,15 +1,24 @@
-from .schemas import ticket_schema, tickets_schema
-from flask import request, jsonify
+from .schemas import ticket_schema, ServiceTicketSchema
+from flask import request, jsonify, current_app
 from marshmallow import ValidationError
-from sqlalchemy import select
-from app.models import ServiceTicket, Customer, Mechanic, db, Inventory
+from sqlalchemy import select, insert, delete
+from app.models import ServiceTicket, Customer, Mechanic, db, Inventory, ticket_mechanic, bump_versions
 from . import tickets_bp
 from datetime import datetime
-from app.extensions import limiter, cache
+from app.extensions import rate_limit
+from app.utils.caching import cached_view
+from app.utils.pagination import keyset_paginate
+from app.utils.streaming import wants_ndjson, stream_collection
+from app.utils.stock import consume_part
+from app.utils.fieldsets import read_plan
+from app.utils.serializers import dump
+from app.utils.etags import conditional
+from app.utils.query_budget import query_budget
 
 #create ticket
 @tickets_bp.route('/', methods=['POST'])
-@limiter.limit("100 per day") #a small mechanic company likely will not have more than 100 issues in a day. 100 tix max
+@query_budget(7)
+@rate_limit('create_ticket')
 def create_ticket():
     try:
         input_data = request.get_json()
@@ -52,27 +61,146 @@ def create_ticket():
         return jsonify(err.messages), 400
     except Exception as e:
         print(f"Unexpected error: {e}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": "An unexpected error occurred"}), 500
 
-#get all service tickets
+BULK_TICKETS_MAX = 10000
+ID_LOOKUP_CHUNK = 500 #stay well under SQLite's bound parameter limit
+
+def _existing_ids(column, ids):
+    #one set-based query (per chunk of ids) instead of one lookup per ticket
+    ids = list(ids)
+    found = set()
+    for i in range(0, len(ids), ID_LOOKUP_CHUNK):
+        found.update(db.session.execute(select(column).where(column.in_(ids[i:i + ID_LOOKUP_CHUNK]))).scalars())
+    return found
+
+def _parse_bulk_ticket(item):
+    #returns (row, mechanic_ids) or raises ValueError with the reason
+    if not isinstance(item, dict):
+        raise ValueError("Each ticket must be an object")
+    required_fields = ['VIN', 'service_date', 'service_desc', 'customer_id', 'mechanic_ids']
+    missing_fields = [field for field in required_fields if field not in item]
+    if missing_fields:
+        raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
+    customer_id = item['customer_id']
+    mechanic_ids = item['mechanic_ids']
+    if not isinstance(customer_id, int) or isinstance(customer_id, bool):
+        raise ValueError("Invalid customer ID")
+    if not isinstance(mechanic_ids, list) or not mechanic_ids or \
+            not all(isinstance(m, int) and not isinstance(m, bool) for m in mechanic_ids):
+        raise ValueError("Invalid mechanic IDs")
+    for field in ('VIN', 'service_desc'):
+        value, length = item[field], ServiceTicket.__table__.c[field].type.length
+        if not isinstance(value, str) or not value.strip() or len(value) > length:
+            raise ValueError(f"{field} must be a non-empty string of at most {length} characters")
+    try:
+        service_date = datetime.strptime(item['service_date'], "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+    row = {
+        'VIN': item['VIN'],
+        'service_date': service_date,
+        'service_desc': item['service_desc'],
+        'customer_id': customer_id,
+    }
+    return row, list(dict.fromkeys(mechanic_ids))
+
+#create many tickets in one transaction
+@tickets_bp.route('/bulk', methods=['POST'])
+@query_budget(None, repeats=None) #a lookup per ID_LOOKUP_CHUNK ids and an insert per batch of rows
+@rate_limit('create_tickets_bulk')
+def create_tickets_bulk():
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty JSON array of tickets"}), 400
+    max_items = current_app.config.get('BULK_TICKETS_MAX', BULK_TICKETS_MAX)
+    if len(items) > max_items:
+        return jsonify({"error": f"At most {max_items} tickets per request"}), 413
+
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, *_parse_bulk_ticket(item)))
+        except ValueError as e:
+            results[index] = {"index": index, "error": str(e)}
+
+    # validate every referenced customer and mechanic with one query each
+    customers = _existing_ids(Customer.id, {row['customer_id'] for _, row, _ in parsed})
+    mechanics = _existing_ids(Mechanic.id, {m for _, _, mechanic_ids in parsed for m in mechanic_ids})
+    valid = []
+    for index, row, mechanic_ids in parsed:
+        if row['customer_id'] not in customers:
+            results[index] = {"index": index, "error": "Invalid customer ID"}
+        elif not mechanics.issuperset(mechanic_ids):
+            results[index] = {"index": index, "error": "Invalid mechanic IDs"}
+        else:
+            valid.append((index, row, mechanic_ids))
+
+    if valid:
+        try:
+            # batched multi-row INSERTs. ids come from the autoincrement key, which hands them out
+            # in row order within the statement, so sorted RETURNING ids line up with `valid`
+            # (asking for sort_by_parameter_order makes SQLite fall back to one INSERT per row)
+            ticket_ids = sorted(db.session.execute(
+                insert(ServiceTicket).returning(ServiceTicket.id),
+                [row for _, row, _ in valid]
+            ).scalars().all())
+            db.session.execute(insert(ticket_mechanic), [
+                {'ticket_id': ticket_id, 'mechanic_id': mechanic_id}
+                for ticket_id, (_, _, mechanic_ids) in zip(ticket_ids, valid)
+                for mechanic_id in mechanic_ids
+            ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Unexpected error during bulk ticket create: {e}")
+            return jsonify({"error": "An unexpected error occurred"}), 500
+        for ticket_id, (index, _, _) in zip(ticket_ids, valid):
+            results[index] = {"index": index, "id": ticket_id}
+
+    created = len(valid)
+    failed = len(items) - created
+    status = 201 if not failed else (207 if created else 400)
+    return jsonify({"created": created, "failed": failed, "results": results}), status
+
+#get all service tickets, newest first (?limit=&cursor=&count=true, or Accept: application/x-ndjson to stream)
+#?fields=id,VIN picks fields, ?expand=customer,mechanics,parts nests related objects instead of ids
 @tickets_bp.route('/', methods=['GET'])
-@cache.cached(timeout=60) #store tickets accessed for 60s. tickets are not frequently updated
+@query_budget(5)
+@conditional(ServiceTicket)
+@cached_view('tickets', 'customers', 'mechanics', 'inventory', unless=wants_ndjson) #expanded tickets nest all three
 def get_tickets():
-    tickets = db.session.execute(select(ServiceTicket)).scalars().all()
-    return tickets_schema.jsonify(tickets)
+    key = [ServiceTicket.service_date, ServiceTicket.id]
+    try:
+        _, schema, columns, loaders = read_plan(ServiceTicket, ServiceTicketSchema, key)
+        query = select(ServiceTicket).options(*columns)
+        if wants_ndjson():
+            return stream_collection(query, key, schema, descending=True, options=columns + loaders)
+        page = keyset_paginate(query, key, schema, descending=True, options=loaders)
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid pagination or field parameters."}), 400
+    return jsonify(page)
 
-#get tickets by id
+#get tickets by id (?fields= and ?expand= as above)
 @tickets_bp.route('/<int:id>', methods=['GET'])
-@cache.cached(timeout=60) #store tickets accessed for 60s. tickets are not frequently updated
+@query_budget(4)
+@conditional(ServiceTicket)
+@cached_view('tickets', 'customers', 'mechanics', 'inventory')
 def get_ticket(id):
-    ticket = db.session.get(ServiceTicket, id)
+    try:
+        schema, _, columns, loaders = read_plan(ServiceTicket, ServiceTicketSchema)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    ticket = db.session.get(ServiceTicket, id, options=columns + loaders)
     if ticket:
-        return ticket_schema.jsonify(ticket)
+        return jsonify(dump(schema, ticket))
     return jsonify({"error": "Ticket not found"}), 404
 
 #update ticket by id
 @tickets_bp.route('/<int:id>', methods=['PUT'])
-@limiter.limit("100 per day") ##a small mechanic company likely will not have more than 100 issues in a day. 100 tix max
+@query_budget(11)
+@rate_limit('update_ticket')
 def update_ticket(id):
     ticket = db.session.get(ServiceTicket, id)
     if not ticket:
@@ -115,10 +243,53 @@ def update_ticket(id):
     except Exception as e:
         db.session.rollback()
         print(f"Unexpected error during ticket update: {e}")
-        return jsonify({"error": "An unexpected error occurred", "details": str(e)}), 500
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+def _id_list(data, field):
+    ids = data.get(field, [])
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError(f"{field} must be a list of integer ids.")
+    return list(dict.fromkeys(ids))
+
+def _reassign_mechanics(ticket_ids, add_ids, remove_ids):
+    """Link `add_ids` to and unlink `remove_ids` from every ticket in `ticket_ids`.
+
+    Mechanic ids are resolved with one query and the links are written as plain
+    INSERT/DELETE statements on ticket_mechanic, so the cost doesn't grow with the
+    size of each ticket's mechanics collection. Unknown mechanic ids are ignored and
+    an id in both lists ends up removed. Returns (links added, links removed).
+    """
+    mechanics = _existing_ids(Mechanic.id, add_ids + remove_ids)
+    remove = [m for m in remove_ids if m in mechanics]
+    add = [m for m in add_ids if m in mechanics and m not in remove]
+
+    added = removed = 0
+    for i in range(0, len(ticket_ids), ID_LOOKUP_CHUNK):
+        chunk = ticket_ids[i:i + ID_LOOKUP_CHUNK]
+        changed = 0
+        if remove:
+            changed += db.session.execute(delete(ticket_mechanic).where(
+                ticket_mechanic.c.ticket_id.in_(chunk), ticket_mechanic.c.mechanic_id.in_(remove)
+            )).rowcount
+            removed += changed
+        if add:
+            linked = set(db.session.execute(
+                select(ticket_mechanic.c.ticket_id, ticket_mechanic.c.mechanic_id).where(
+                    ticket_mechanic.c.ticket_id.in_(chunk), ticket_mechanic.c.mechanic_id.in_(add))
+            ).tuples())
+            rows = [{'ticket_id': t, 'mechanic_id': m} for t in chunk for m in add if (t, m) not in linked]
+            if rows:
+                db.session.execute(insert(ticket_mechanic), rows)
+                added += len(rows)
+                changed += len(rows)
+        if changed:
+            #the link table changed under these tickets, so their ETags must too
+            db.session.execute(bump_versions(ServiceTicket, chunk).execution_options(synchronize_session=False))
+    return added, removed
 
 #edit mechanics
 @tickets_bp.route('/<int:ticket_id>/edit', methods=['PUT'])
+@query_budget(5)
 def update_ticket_mechanics(ticket_id):
     ticket = db.session.get(ServiceTicket, ticket_id)
     if not ticket:
@@ -128,31 +299,60 @@ def update_ticket_mechanics(ticket_id):
     if not data:
         return jsonify({"error": "No input data provided."}), 400
 
-    add_ids = data.get("add_ids", [])
-    remove_ids = data.get("remove_ids", [])
-
     try:
-        # add mechanics
-        for mech_id in add_ids:
-            mechanic = db.session.get(Mechanic, mech_id)
-            if mechanic and mechanic not in ticket.mechanics:
-                ticket.mechanics.append(mechanic)
-
-        # remove mechanics
-        for mech_id in remove_ids:
-            mechanic = db.session.get(Mechanic, mech_id)
-            if mechanic and mechanic in ticket.mechanics:
-                ticket.mechanics.remove(mechanic)
+        add_ids = _id_list(data, "add_ids")
+        remove_ids = _id_list(data, "remove_ids")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    try:
+        _reassign_mechanics([ticket_id], add_ids, remove_ids)
         db.session.commit()
         return jsonify({"message": "Ticket mechanics updated successfully."}), 200
 
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": str(e)}), 500
+        print(f"Unexpected error during ticket mechanics update: {e}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+#edit mechanics on many tickets at once, e.g. handing a shift's tickets to another mechanic
+@tickets_bp.route('/edit', methods=['PUT'])
+@query_budget(None, repeats=None) #4 statements per ID_LOOKUP_CHUNK tickets
+def update_tickets_mechanics():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({"error": "No input data provided."}), 400
+
+    try:
+        ticket_ids = _id_list(data, "ticket_ids")
+        add_ids = _id_list(data, "add_ids")
+        remove_ids = _id_list(data, "remove_ids")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not ticket_ids:
+        return jsonify({"error": "ticket_ids must not be empty."}), 400
+    max_items = current_app.config.get('BULK_TICKETS_MAX', BULK_TICKETS_MAX)
+    if len(ticket_ids) > max_items:
+        return jsonify({"error": f"At most {max_items} tickets per request"}), 413
+
+    found = _existing_ids(ServiceTicket.id, ticket_ids)
+    missing = [t for t in ticket_ids if t not in found]
+    if missing:
+        return jsonify({"error": "Service tickets not found.", "ticket_ids": missing}), 404
 
-#add part to service ticket
+    try:
+        added, removed = _reassign_mechanics(ticket_ids, add_ids, remove_ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Unexpected error during ticket mechanics update: {e}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+    return jsonify({"message": "Ticket mechanics updated successfully.", "tickets": len(ticket_ids),
+                    "added": added, "removed": removed}), 200
+
+#add part to service ticket, taking it out of stock ({"part_id": 1, "quantity": 2}, quantity defaults to 1)
 @tickets_bp.route('/<int:ticket_id>/add_part', methods=['PUT'])
+@query_budget(7)
 def add_part_to_ticket(ticket_id):
     ticket = db.session.get(ServiceTicket, ticket_id)
     if not ticket:
@@ -166,17 +366,24 @@ def add_part_to_ticket(ticket_id):
     if not part_id:
         return jsonify({"error": "Missing part_id"}), 400
 
-    part = db.session.get(Inventory, part_id)
-    if not part:
-        return jsonify({"error": "Part not found"}), 404
-
-    if part in ticket.parts:
-        return jsonify({"message": "Part already associated with this ticket."}), 200
+    quantity = data.get('quantity', 1)
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        return jsonify({"error": "quantity must be a positive integer"}), 400
 
     try:
-        ticket.parts.append(part)
+        result = consume_part(ticket_id, part_id, quantity)
+        if result is None:
+            db.session.rollback()
+            part = db.session.get(Inventory, part_id)
+            if not part:
+                return jsonify({"error": "Part not found"}), 404
+            return jsonify({"error": "Not enough stock", "stock": part.stock}), 409
         db.session.commit()
-        return jsonify({"message": f"Part {part.name} added to ticket {ticket_id}"}), 200
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": "Failed to add part to ticket", "details": str(e)}), 500
+        print(f"Unexpected error adding part to ticket: {e}")
+        return jsonify({"error": "Failed to add part to ticket"}), 500
+
+    stock, used = result
+    return jsonify({"message": f"Added {quantity} of part {part_id} to ticket {ticket_id}",
+                    "quantity": used, "stock": stock}), 200
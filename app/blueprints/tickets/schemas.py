@@ -2,13 +2,23 @@ from app.extensions import ma
 from app.models import ServiceTicket
 from app.blueprints.customers.schemas import CustomerSchema
 from app.blueprints.mechanics.schemas import MechanicSchema
+from app.blueprints.inventory.schemas import InventorySchema
 
 class ServiceTicketSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = ServiceTicket
         load_instance = True
-    customer = ma.Nested(CustomerSchema)
-    mechanics = ma.Nested(MechanicSchema, many=True)
+        exclude = ('version',) #row version, sent as the ETag header instead
+    # compact by default: related rows as ids, ?expand=customer,mechanics,parts nests the objects
+    customer = ma.Integer(attribute='customer_id') #straight from the ticket row, no join
+    mechanics = ma.Pluck(MechanicSchema, 'id', many=True)
+    parts = ma.Pluck(InventorySchema, 'id', many=True)
+
+    expansions = {
+        'customer': lambda: ma.Nested(CustomerSchema),
+        'mechanics': lambda: ma.Nested(MechanicSchema, many=True),
+        'parts': lambda: ma.Nested(InventorySchema, many=True),
+    }
 
 ticket_schema = ServiceTicketSchema()
-tickets_schema = ServiceTicketSchema(many=True)
\ No newline at end of file
+tickets_schema = ServiceTicketSchema(many=True)
@@ -1,8 +1,14 @@
+from flask import current_app
 from flask_marshmallow import Marshmallow
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
+from app.utils.limiter_storage import SQLiteStorage #registers the sqlite:// RATELIMIT_STORAGE_URI scheme
 
 ma = Marshmallow()
-limiter = Limiter(key_func=get_remote_address) #creating and instance of Limiter
-cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
\ No newline at end of file
+limiter = Limiter(key_func=get_remote_address) #creating and instance of Limiter, storage comes from RATELIMIT_STORAGE_URI
+cache = Cache() #backend comes from CACHE_TYPE in the active config class
+
+def rate_limit(name):
+    #limiter.limit() with the limit the active config sets for `name` in RATE_LIMITS
+    return limiter.limit(lambda: current_app.config['RATE_LIMITS'][name])
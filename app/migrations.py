@@ -0,0 +1,120 @@
+"""Schema upgrades for databases that already exist.
+
+db.create_all() only creates missing tables, so any change to an existing table
+(a new key, index or column) ships here as a numbered step. Each step is written
+to be a no-op when the schema is already right, so it is safe to run on a fresh
+database built by create_all() as well as on production. Applied steps are
+recorded in the schema_migrations table.
+
+    flask --app flask_app upgrade-db
+"""
+from datetime import datetime, timezone
+import click
+from sqlalchemy import inspect, text
+from app.models import db, ticket_mechanic, inventory_ticket, ServiceTicket, Inventory, Customer, Mechanic
+from app.utils.search import create_search_index
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+def _create_missing_indexes(conn, table):
+    #indexes on columns a later step adds are left to that step
+    existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    columns = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    for index in table.indexes:
+        if index.name not in existing and all(column.name in columns for column in index.columns):
+            index.create(conn)
+
+@migration(1, "ticket_mechanic primary key and lookup indexes")
+def add_lookup_indexes(conn):
+    pk = inspect(conn).get_pk_constraint('ticket_mechanic')
+    if not pk.get('constrained_columns'):
+        # no backend can add a primary key to SQLite in place, so rebuild the table,
+        # dropping duplicate and half-empty links on the way
+        conn.execute(text("ALTER TABLE ticket_mechanic RENAME TO ticket_mechanic_old"))
+        ticket_mechanic.create(conn)
+        conn.execute(text(
+            "INSERT INTO ticket_mechanic (ticket_id, mechanic_id) "
+            "SELECT DISTINCT ticket_id, mechanic_id FROM ticket_mechanic_old "
+            "WHERE ticket_id IS NOT NULL AND mechanic_id IS NOT NULL"
+        ))
+        conn.execute(text("DROP TABLE ticket_mechanic_old"))
+
+    for table in (ticket_mechanic, inventory_ticket, ServiceTicket.__table__):
+        _create_missing_indexes(conn, table)
+
+@migration(2, "inventory name index")
+def add_inventory_name_index(conn):
+    _create_missing_indexes(conn, Inventory.__table__)
+
+@migration(3, "inventory stock and parts quantity")
+def add_stock_and_quantity(conn):
+    #existing parts get a NULL stock: not tracked, so tickets can keep using them, rather
+    #than 0, which would refuse them all until each one was restocked by hand
+    columns = {c['name'] for c in inspect(conn).get_columns('inventory')}
+    if 'stock' not in columns:
+        conn.execute(text(
+            "ALTER TABLE inventory ADD COLUMN stock INTEGER "
+            "CONSTRAINT ck_inventory_stock_nonnegative CHECK (stock >= 0)"
+        ))
+    columns = {c['name'] for c in inspect(conn).get_columns('inventory_ticket')}
+    if 'quantity' not in columns:
+        conn.execute(text("ALTER TABLE inventory_ticket ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1"))
+
+@migration(4, "inventory name search index")
+def add_search_index(conn):
+    if conn.dialect.name == 'sqlite':
+        create_search_index(conn)
+
+@migration(5, "room for password hashes")
+def widen_password(conn):
+    #SQLite doesn't enforce VARCHAR lengths; plaintext rows are hashed on their next login
+    if conn.dialect.name != 'sqlite':
+        conn.execute(text("ALTER TABLE customers ALTER COLUMN password TYPE VARCHAR(255)"))
+
+@migration(6, "row versions")
+def add_row_versions(conn):
+    #existing rows start at 0; their first write moves them past every other row
+    for model in (Customer, Mechanic, ServiceTicket, Inventory):
+        table = model.__table__
+        columns = {c['name'] for c in inspect(conn).get_columns(table.name)}
+        if 'version' not in columns:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN version INTEGER NOT NULL DEFAULT 0"))
+        _create_missing_indexes(conn, table)
+
+def upgrade(engine):
+    """Apply every pending migration in order, one transaction each. Returns the versions applied."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, applied_at VARCHAR(40) NOT NULL)"
+        ))
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    done = []
+    for version, description, fn in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": version, "applied_at": datetime.now(timezone.utc).isoformat()}
+            )
+        done.append(version)
+    return done
+
+@click.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables, then apply pending schema migrations."""
+    db.create_all()
+    applied = upgrade(db.engine)
+    for version, description, fn in MIGRATIONS:
+        if version in applied:
+            click.echo(f"applied {version}: {description}")
+    if not applied:
+        click.echo(f"{db.engine.url.render_as_string(hide_password=True)} is up to date")
@@ -1,40 +1,64 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, select, text, update
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, declared_attr
 from datetime import date
-from typing import List
+from typing import List, Optional
+from app.utils.replicas import RoutingSession
 
 # Create base class for models
 class Base(DeclarativeBase):
     pass
 
 #set up db 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession}) #GET reads from replicas, see app/utils/replicas.py
+
+# Row versions. Every insert or update sets `version` to one past the table's highest,
+# so a row's version goes up on each write and MAX(version) with COUNT(*) changes
+# whenever anything in the table does. They back the ETags in app/utils/etags.py.
+# Inserts and statement-level update()s get it from the column default/onupdate; rows
+# whose only change is a many-to-many collection are bumped in _bump_versions below.
+# MAX + 1 is only race-free while writes are serialized, i.e. on SQLite; the engine
+# profiles for server databases turn the ETags off (see app/utils/engine_profiles.py).
+
+def next_version(table_name):
+    return text(f"(SELECT COALESCE(MAX(version), 0) + 1 FROM {table_name})")
+
+class Versioned:
+    @declared_attr
+    def version(cls) -> Mapped[int]:
+        #indexed so MAX(version) is a single index lookup
+        return mapped_column(db.Integer, nullable=False, index=True, server_default='0',
+                             default=next_version(cls.__tablename__), onupdate=next_version(cls.__tablename__))
 
 # ---Models---
 
 # Customer model
-class Customer(Base):
+class Customer(Versioned, Base):
     __tablename__ = 'customers'
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(db.String(100), nullable=False)
     email: Mapped[str] = mapped_column(db.String(150), nullable=False, unique=True)
     phone: Mapped[str] = mapped_column(db.String(20), nullable=False)
-    password: Mapped[str] = mapped_column(db.String(100), nullable=False)
+    password: Mapped[str] = mapped_column(db.String(255), nullable=False) #scrypt hash, see app/utils/passwords.py
     
     tickets: Mapped[List['ServiceTicket']] = db.relationship(
         back_populates='customer',
         foreign_keys='ServiceTicket.customer_id'
     )
 
+# the PK (ticket_id, mechanic_id) serves ticket -> mechanics and rejects duplicates,
+# the reverse index serves mechanic -> tickets
 ticket_mechanic = db.Table(
     'ticket_mechanic',
     Base.metadata,
-    db.Column('ticket_id', db.ForeignKey('service_tickets.id')),
-    db.Column('mechanic_id', db.ForeignKey('mechanics.id'))
+    db.Column('ticket_id', db.ForeignKey('service_tickets.id'), primary_key=True),
+    db.Column('mechanic_id', db.ForeignKey('mechanics.id'), primary_key=True),
+    db.Index('ix_ticket_mechanic_mechanic_id_ticket_id', 'mechanic_id', 'ticket_id')
 )
 # Mechanic model
-class Mechanic(Base):
+class Mechanic(Versioned, Base):
     __tablename__ = 'mechanics'
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -45,11 +69,17 @@ class Mechanic(Base):
     tickets: Mapped[List['ServiceTicket']] = db.relationship(secondary='ticket_mechanic', back_populates='mechanics')
 
 # Service ticket model
-class ServiceTicket(Base):
+class ServiceTicket(Versioned, Base):
     __tablename__ = 'service_tickets'
+    __table_args__ = (
+        # /customers/my-tickets: filter on customer, page on (service_date, id)
+        db.Index('ix_service_tickets_customer_id_service_date', 'customer_id', 'service_date'),
+        # GET /tickets pages on (service_date, id)
+        db.Index('ix_service_tickets_service_date_id', 'service_date', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    VIN: Mapped[str] = mapped_column(db.String(17), nullable=False) 
+    VIN: Mapped[str] = mapped_column(db.String(17), nullable=False, index=True) 
     service_date: Mapped[date] = mapped_column(db.Date, nullable=False)
     service_desc: Mapped[str] = mapped_column(db.String(255), nullable=False)
     customer_id: Mapped[int] = mapped_column(db.ForeignKey('customers.id'), nullable=False)
@@ -58,18 +88,48 @@ class ServiceTicket(Base):
     parts: Mapped[List["Inventory"]] = db.relationship("Inventory",secondary="inventory_ticket",back_populates="tickets"
 )
 
-# association table for inventory and service tickets
+# parts used on service tickets: one row per (part, ticket), adding the same part again raises the quantity
 inventory_ticket = db.Table(
     'inventory_ticket',
     db.Column('inventory_id', db.Integer, db.ForeignKey('inventory.id'), primary_key=True),
-    db.Column('ticket_id', db.Integer, db.ForeignKey('service_tickets.id'), primary_key=True)
+    db.Column('ticket_id', db.Integer, db.ForeignKey('service_tickets.id'), primary_key=True),
+    db.Column('quantity', db.Integer, nullable=False, default=1, server_default='1'),
+    db.Index('ix_inventory_ticket_ticket_id_inventory_id', 'ticket_id', 'inventory_id') #ticket -> parts
 )
 
-class Inventory(Base):
+class Inventory(Versioned, Base):
     __tablename__ = 'inventory'
+    __table_args__ = (
+        db.CheckConstraint('stock >= 0', name='ck_inventory_stock_nonnegative'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str] = mapped_column(db.String(100), nullable=False)
+    name: Mapped[str] = mapped_column(db.String(100), nullable=False, index=True) #imports upsert by name
     price: Mapped[float] = mapped_column(db.Float, nullable=False)
+    #units on hand; NULL for a part whose stock isn't tracked (any created before stock
+    #was) until it is set or restocked, see app/utils/stock.py
+    stock: Mapped[Optional[int]] = mapped_column(db.Integer, nullable=True, default=0)
 
     tickets: Mapped[List['ServiceTicket']] = db.relationship(secondary='inventory_ticket', back_populates='parts')
+
+
+def bump_versions(model, ids):
+    """Bump the version of rows whose body changed without a write to their own table (e.g. their links)."""
+    return update(model).where(model.id.in_(ids)).values(version=next_version(model.__tablename__))
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions(session, flush_context, instances):
+    for obj in session.dirty:
+        #a changed many-to-many collection emits no UPDATE of its own
+        if isinstance(obj, Versioned) and session.is_modified(obj):
+            obj.version = next_version(obj.__tablename__)
+    for obj in session.deleted:
+        #rows linked to a deleted one through an association table lose that link
+        for relationship in db.inspect(type(obj)).relationships:
+            target = relationship.mapper.class_
+            if relationship.secondary is None or not issubclass(target, Versioned):
+                continue
+            (key, own_link), = relationship.synchronize_pairs
+            (_, target_link), = relationship.secondary_synchronize_pairs
+            linked = select(target_link).where(own_link == getattr(obj, key.key))
+            session.execute(bump_versions(target, linked).execution_options(synchronize_session=False))
@@ -0,0 +1,79 @@
+import asyncio
+import importlib.util
+import json
+import threading
+import unittest
+from sqlalchemy import event
+from app import db
+from app.asgi import create_asgi_app
+
+async def call(app, method, path, payload=None, headers=()):
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'), *headers],
+        'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+    }
+    messages = []
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    async def send(message):
+        messages.append(message)
+    await app(scope, receive, send)
+    return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+@unittest.skipUnless(importlib.util.find_spec('aiosqlite'), "aiosqlite is not installed")
+class AsgiTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_asgi_app("testing")
+        with self.app.flask_app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.flask_app.app_context():
+            db.drop_all()
+
+    def run_requests(self, requests):
+        async def run():
+            try:
+                return await requests()
+            finally:
+                await self.app.engine.dispose()
+        return asyncio.run(run())
+
+    def test_reads_on_event_loop_writes_in_threads(self):
+        threads = {}
+        @event.listens_for(self.app.engine.sync_engine, 'before_cursor_execute')
+        def on_loop(conn, cursor, statement, *args):
+            threads.setdefault('loop', set()).add(threading.current_thread().name)
+        with self.app.flask_app.app_context():
+            @event.listens_for(db.engine, 'before_cursor_execute')
+            def in_thread(conn, cursor, statement, *args):
+                threads.setdefault('pool', set()).add(threading.current_thread().name)
+
+        async def requests():
+            status, body = await call(self.app, 'POST', '/customers/', {
+                "name": "Ada", "email": "ada@example.com", "phone": "1234567890", "password": "password123"
+            })
+            self.assertEqual(status, 201)
+            customer_id = json.loads(body)['id']
+            return await asyncio.gather(*(call(self.app, 'GET', f'/customers/{customer_id}') for _ in range(5)))
+
+        for status, body in self.run_requests(requests):
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body)['email'], 'ada@example.com')
+        self.assertEqual(threads['loop'], {threading.current_thread().name})
+        self.assertTrue(all(name.startswith('asgi-write') for name in threads['pool']))
+
+    def test_streamed_reads(self):
+        async def requests():
+            for i in range(3):
+                await call(self.app, 'POST', '/inventory/', {"name": f"Part {i}", "price": 1.5})
+            return await call(self.app, 'GET', '/inventory/', headers=[(b'accept', b'application/x-ndjson')])
+
+        status, body = self.run_requests(requests)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+if __name__ == '__main__':
+    unittest.main()
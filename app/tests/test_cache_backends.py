@@ -0,0 +1,126 @@
+import os
+import tempfile
+import stat
+import unittest
+from unittest import mock
+from flask import Flask
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from app.utils.cache_backends import TieredCache, LRUCache, SHARED_ONLY_PREFIX
+from app.utils.limiter_storage import SQLiteStorage, instance_storage_uri
+
+class TieredCacheTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        os.remove(self.path)
+        self.cache = TieredCache(path=self.path, l1_max_entries=2)
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_second_worker_reads_shared_tier(self):
+        other_worker = TieredCache(path=self.path)
+        self.cache.set('ticket', {'id': 1})
+        self.assertEqual(other_worker.get('ticket'), {'id': 1})
+        self.assertEqual(other_worker.stats(), {'l1': {'hits': 0, 'misses': 1}, 'l2': {'hits': 1, 'misses': 0}})
+        # promoted into the second worker's local tier
+        other_worker.get('ticket')
+        self.assertEqual(other_worker.stats()['l1']['hits'], 1)
+
+    def test_local_tier_is_bounded_lru(self):
+        lru = LRUCache(max_entries=2)
+        lru.set('a', b'1', 0)
+        lru.set('b', b'2', 0)
+        lru.get('a')
+        lru.set('c', b'3', 0)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), b'1')
+        self.assertEqual(len(lru), 2)
+
+    def test_shared_only_keys_skip_local_tier(self):
+        key = SHARED_ONLY_PREFIX + 'version'
+        self.cache.set(key, 'v1')
+        TieredCache(path=self.path).set(key, 'v2')
+        self.assertEqual(self.cache.get(key), 'v2')
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.cache.add('k', 1))
+        self.assertFalse(self.cache.add('k', 2))
+        self.assertEqual(self.cache.get('k'), 1)
+        self.cache.set('gone', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('gone'))
+
+    def test_shared_tier_evicts_oldest_over_size_budget(self):
+        small = TieredCache(path=self.path, l2_max_bytes=4000)
+        for i in range(20):
+            small.set(f'key{i}', 'x' * 500)
+        self.assertLessEqual(small.l2.size_bytes(), 4000)
+        self.assertIsNone(small.l2.get('key0'))
+        self.assertIsNotNone(small.l2.get('key19'))
+
+    def test_overwrites_keep_byte_total_exact(self):
+        for i in range(100):
+            self.cache.set('ticket', 'x' * (i % 7 * 10))
+        conn = self.cache.l2._connection()
+        self.assertEqual(self.cache.l2.size_bytes(), conn.execute("SELECT SUM(size) FROM cache_entries").fetchone()[0])
+        self.cache.clear()
+        self.assertEqual(self.cache.l2.size_bytes(), 0)
+
+    def test_shared_file_is_private_to_its_owner(self):
+        #values are unpickled, so nobody else may write the file
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        os.chmod(self.path, 0o666)
+        TieredCache(path=self.path)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        with mock.patch('os.getuid', return_value=os.stat(self.path).st_uid + 1), self.assertRaises(PermissionError):
+            TieredCache(path=self.path)
+
+    def test_relative_path_is_in_instance_folder(self):
+        with tempfile.TemporaryDirectory() as directory:
+            app = Flask(__name__, instance_path=os.path.join(directory, 'instance'))
+            cache = TieredCache.factory(app, {'CACHE_SQLITE_PATH': 'cache.sqlite'}, (), {})
+            self.assertEqual(cache.l2.path, os.path.join(directory, 'instance', 'cache.sqlite'))
+            self.assertTrue(os.path.exists(cache.l2.path))
+
+class SQLiteLimiterStorageTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.uri = 'sqlite:///' + os.path.join(self.dir.name, 'limits.sqlite')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_workers_share_one_counter(self):
+        first = FixedWindowRateLimiter(storage_from_string(self.uri))
+        second = FixedWindowRateLimiter(storage_from_string(self.uri))
+        self.assertIsInstance(first.storage, SQLiteStorage)
+        limit = parse("3 per day")
+        hits = [first.hit(limit, 'ip'), second.hit(limit, 'ip'), first.hit(limit, 'ip'), second.hit(limit, 'ip')]
+        self.assertEqual(hits, [True, True, True, False])
+        self.assertEqual(first.get_window_stats(limit, 'ip').remaining, 0)
+        self.assertTrue(first.hit(limit, 'other ip'))
+
+    def test_expired_window_starts_over(self):
+        storage = storage_from_string(self.uri)
+        self.assertEqual(storage.incr('key', expiry=0), 1)
+        self.assertEqual(storage.incr('key', expiry=60), 1)
+        self.assertEqual(storage.incr('key', expiry=60, amount=2), 3)
+        self.assertEqual(storage.get('key'), 3)
+        storage.clear('key')
+        self.assertEqual(storage.get('key'), 0)
+
+    def test_relative_file_is_in_instance_folder(self):
+        app = Flask(__name__, instance_path=os.path.join(self.dir.name, 'instance'))
+        app.config['RATELIMIT_STORAGE_URI'] = 'sqlite:///limits.sqlite'
+        instance_storage_uri(app)
+        path = os.path.join(self.dir.name, 'instance', 'limits.sqlite')
+        self.assertEqual(app.config['RATELIMIT_STORAGE_URI'], 'sqlite:///' + path)
+        storage_from_string(app.config['RATELIMIT_STORAGE_URI']).incr('key', expiry=60)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import gzip
+import unittest
+import zlib
+from app import create_app, db
+from app.models import Inventory
+
+class CompressionTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add_all([Inventory(name=f"Part {i}", price=i, stock=i) for i in range(100)])
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_large_responses_are_gzipped_when_accepted(self):
+        plain = self.client.get('/inventory/?limit=100')
+        self.assertNotIn("Content-Encoding", plain.headers)
+        res = self.client.get('/inventory/?limit=100', headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", res.headers["Vary"])
+        self.assertEqual(gzip.decompress(res.data), plain.data)
+        self.assertLess(len(res.data), len(plain.data))
+        # the encoded body has its own tag, and still revalidates
+        self.assertTrue(res.headers["ETag"].endswith('-gzip"'))
+        res = self.client.get('/inventory/?limit=100', headers={"Accept-Encoding": "gzip", "If-None-Match": res.headers["ETag"]})
+        self.assertEqual(res.status_code, 304)
+
+    def test_small_responses_are_not_compressed(self):
+        res = self.client.get('/inventory/1', headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", res.headers)
+
+    def test_streams_are_compressed_per_chunk(self):
+        res = self.client.get('/inventory/', headers={"Accept-Encoding": "gzip", "Accept": "application/x-ndjson"})
+        self.assertEqual(res.headers["Content-Encoding"], "gzip")
+        self.assertEqual(len(zlib.decompress(res.data, 31).splitlines()), 100)
+
+    def test_static_files_are_precompressed(self):
+        plain = self.client.get('/static/swagger.yaml')
+        res = self.client.get('/static/swagger.yaml', headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(res.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(res.data), plain.data)
+        plain.close()
+        res = self.client.get('/static/swagger.yaml', headers={"Accept-Encoding": "gzip", "If-None-Match": res.headers["ETag"]})
+        self.assertEqual(res.status_code, 304)
+
+if __name__ == '__main__':
+    unittest.main()
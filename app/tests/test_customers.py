@@ -1,5 +1,9 @@
 import unittest
 from app import create_app, db
+from app.models import Customer
+from app.utils.passwords import verify_password
+from jose import jwt
+from app.utils.util import SECRET_KEY, encode_token, token_cache_stats
 
 class CustomerTests(unittest.TestCase):
     def setUp(self):
@@ -113,5 +117,69 @@ class CustomerTests(unittest.TestCase):
         res = self.client.post('/customers/login', json={"email": "someone@example.com"}, follow_redirects=True)
         self.assertEqual(res.status_code, 400)
 
+    def test_password_is_hashed_and_never_returned(self):
+        res = self.client.post('/customers', json={
+            "name": "Hash", "email": "hash@example.com", "phone": "7777777777", "password": "s3cret"
+        }, follow_redirects=True)
+        self.assertNotIn("password", res.get_json())
+        with self.app.app_context():
+            stored = db.session.get(Customer, res.get_json()["id"]).password
+        self.assertTrue(stored.startswith("scrypt$"))
+        self.assertNotIn("s3cret", stored)
+
+    def test_legacy_plaintext_password_is_rehashed_on_login(self):
+        with self.app.app_context():
+            db.session.add(Customer(name="Old", email="old@example.com", phone="8888888888", password="legacy"))
+            db.session.commit()
+        self.assertEqual(self.client.post('/customers/login', json={"email": "old@example.com", "password": "nope"}).status_code, 401)
+        res = self.client.post('/customers/login', json={"email": "old@example.com", "password": "legacy"})
+        self.assertEqual(res.status_code, 200)
+        with self.app.app_context():
+            stored = db.session.execute(db.select(Customer.password).where(Customer.email == "old@example.com")).scalar_one()
+            self.assertTrue(stored.startswith("scrypt$10$"))
+            self.assertEqual(verify_password(stored, "legacy"), (True, False))
+            # raising the cost marks existing hashes for an upgrade
+            self.app.config['PASSWORD_SCRYPT_LOG2_N'] = 11
+            self.assertEqual(verify_password(stored, "legacy"), (True, True))
+
+    def test_unreadable_hash_never_matches(self):
+        for i, stored in enumerate(("scrypt$x$8$1$c2FsdA$aGFzaA", "scrypt$10$8$1$!!$aGFzaA", "scrypt$10$0$1$c2FsdA$aGFzaA")):
+            with self.app.app_context():
+                db.session.add(Customer(name="Bad", email=f"bad{i}@example.com", phone="8888888888", password=stored))
+                db.session.commit()
+                self.assertEqual(verify_password(stored, "anything"), (False, False))
+            res = self.client.post('/customers/login', json={"email": f"bad{i}@example.com", "password": "anything"})
+            self.assertEqual(res.status_code, 401)
+
+    def test_login_unknown_email(self):
+        res = self.client.post('/customers/login', json={"email": "ghost@example.com", "password": "pw"})
+        self.assertEqual(res.status_code, 401)
+
+    def test_verified_tokens_are_cached(self):
+        headers = {"Authorization": f"Bearer {encode_token(1)}"}
+        before = token_cache_stats()
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 200)
+        self.assertEqual(self.client.get('/customers/my-tickets', headers=headers).status_code, 200)
+        after = token_cache_stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+        res = self.client.get('/customers/my-tickets', headers={"Authorization": "Bearer not.a.token"})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(token_cache_stats()['rejections'] - after['rejections'], 1)
+
+    def test_token_without_expiry_is_rejected(self):
+        token = jwt.encode({'sub': '1'}, SECRET_KEY, algorithm='HS256')
+        before = token_cache_stats()['rejections']
+        res = self.client.get('/customers/my-tickets', headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.get_json()['message'], 'Invalid token!')
+        self.assertEqual(token_cache_stats()['rejections'] - before, 1)
+
+    def test_malformed_authorization_header(self):
+        for header in ("Bearer", "Bearer ", "token-without-scheme"):
+            res = self.client.get('/customers/my-tickets', headers={"Authorization": header})
+            self.assertEqual(res.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, text
+from app import create_app, db
+from app.utils.engine_profiles import PROFILES, profile_for, set_pragmas
+
+class EngineProfileTests(unittest.TestCase):
+    def test_testing_config_uses_test_profile(self):
+        app = create_app("testing")
+        self.assertEqual(app.config['DATABASE_PROFILE'], 'test')
+        with app.app_context(), db.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 0)
+            self.assertEqual(conn.execute(text("PRAGMA busy_timeout")).scalar(), 5000)
+
+    def test_production_sqlite_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, 'prod.db')}",
+                                   **PROFILES['production-sqlite']['engine_options'])
+            set_pragmas(engine, PROFILES['production-sqlite']['pragmas'])
+            with engine.connect() as conn:
+                self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), 'wal')
+                self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 1)
+                self.assertEqual(conn.execute(text("PRAGMA mmap_size")).scalar(), 256 * 1024 * 1024)
+            engine.dispose()
+
+    def test_profile_follows_database_uri(self):
+        self.assertEqual(profile_for('sqlite:////srv/shop.db'), 'production-sqlite')
+        self.assertEqual(profile_for('postgresql+psycopg2://shop@db/shop'), 'production-server-db')
+
+    def test_row_version_etags_only_on_sqlite(self):
+        #concurrent writers on a server database can share a MAX(version) + 1
+        self.assertFalse(PROFILES['production-server-db']['row_version_etags'])
+        app = create_app("testing")
+        self.assertTrue(app.config['ROW_VERSION_ETAGS'])
+        app.config['ROW_VERSION_ETAGS'] = False
+        with app.app_context():
+            db.create_all()
+        try:
+            res = app.test_client().get('/inventory/')
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn('ETag', res.headers)
+        finally:
+            with app.app_context():
+                db.drop_all()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
 import unittest
+import csv
+import io
+import json
 from app import create_app, db
 
 class InventoryTests(unittest.TestCase):
@@ -26,7 +29,40 @@ class InventoryTests(unittest.TestCase):
         self.client.post('/inventory/', json={"name": "Window", "price": 15.00})
         res = self.client.get('/inventory/')
         self.assertEqual(res.status_code, 200)
-        self.assertIsInstance(res.get_json(), list)
+        self.assertIsInstance(res.get_json()["items"], list)
+
+    def test_get_parts_cursor_pages(self):
+        for i in range(5):
+            self.client.post('/inventory/', json={"name": f"Spark Plug {i}", "price": 4.00})
+        seen = []
+        cursor = None
+        while True:
+            url = '/inventory/?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            body = self.client.get(url).get_json()
+            self.assertLessEqual(len(body["items"]), 2)
+            seen.extend(part["id"] for part in body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, sorted(seen))
+        self.assertEqual(len(seen), 5)
+
+    def test_get_parts_count_is_optional(self):
+        self.client.post('/inventory/', json={"name": "Fuse", "price": 1.00})
+        self.assertNotIn("count", self.client.get('/inventory/').get_json())
+        self.assertEqual(self.client.get('/inventory/?count=true').get_json()["count"], 1)
+
+    def test_get_parts_ndjson_stream(self):
+        for i in range(3):
+            self.client.post('/inventory/', json={"name": f"Bulb {i}", "price": 2.50})
+        res = self.client.get('/inventory/', headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        names = [json.loads(line)["name"] for line in res.get_data(as_text=True).splitlines()]
+        self.assertEqual(names, ["Bulb 0", "Bulb 1", "Bulb 2"])
+
+    def test_get_parts_invalid_cursor(self):
+        res = self.client.get('/inventory/?cursor=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
 
     def test_get_part_by_id(self):
         res = self.client.post('/inventory/', json={"name": "Brake Pad", "price": 30.00})
@@ -51,5 +87,60 @@ class InventoryTests(unittest.TestCase):
         res_check = self.client.get(f'/inventory/{part_id}')
         self.assertEqual(res_check.status_code, 404)
 
+    def test_import_csv_upserts_by_name(self):
+        self.client.post('/inventory/', json={"name": "Oil Filter", "price": 8.00})
+        upload = "name,price\nOil Filter,9.50\nWiper Blade,12.25\nBad Row,abc\n"
+        res = self.client.post('/inventory/import', data=upload, content_type='text/csv')
+        self.assertEqual(res.status_code, 200)
+        body = res.get_json()
+        self.assertEqual((body["processed"], body["created"], body["updated"], body["failed"]), (3, 1, 1, 1))
+        self.assertEqual(body["errors"][0]["line"], 4)
+        self.assertIn("rows_per_second", body)
+        prices = {p["name"]: p["price"] for p in self.client.get('/inventory/').get_json()["items"]}
+        self.assertEqual(prices, {"Oil Filter": 9.50, "Wiper Blade": 12.25})
+
+    def test_import_ndjson_file_upload(self):
+        self.app.config['IMPORT_BATCH_SIZE'] = 2
+        upload = "\n".join(json.dumps({"name": f"Belt {i}", "price": i}) for i in range(5))
+        res = self.client.post('/inventory/import', data={
+            "file": (io.BytesIO(upload.encode()), "parts.ndjson", "application/x-ndjson")
+        }, content_type='multipart/form-data')
+        self.assertEqual(res.get_json()["created"], 5)
+
+    def test_export_csv_round_trips(self):
+        self.client.post('/inventory/', json={"name": "Hose, Radiator", "price": 22.00})
+        res = self.client.get('/inventory/export')
+        self.assertEqual(res.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(res.get_data(as_text=True))))
+        self.assertEqual(rows[0]["name"], "Hose, Radiator")
+        reimport = self.client.post('/inventory/import', data=res.get_data(), content_type='text/csv')
+        self.assertEqual(reimport.get_json()["updated"], 1)
+
+    def test_export_rejects_bad_pagination(self):
+        for query in ('limit=abc', 'cursor=zz', 'format=ndjson&limit=abc', 'format=ndjson&cursor=zz'):
+            res = self.client.get(f'/inventory/export?{query}')
+            self.assertEqual(res.status_code, 400, query)
+
+    def test_search_matches_word_prefixes(self):
+        for name in ("Oil filter", "Air filter", "Brake pad", "Oil pan gasket"):
+            self.client.post('/inventory/', json={"name": name, "price": 5.0})
+        res = self.client.get('/inventory/search?q=fil')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual({p["name"] for p in res.get_json()["items"]}, {"Oil filter", "Air filter"})
+        res = self.client.get('/inventory/search?q=oil fi')
+        self.assertEqual([p["name"] for p in res.get_json()["items"]], ["Oil filter"])
+        self.assertEqual(len(self.client.get('/inventory/search?q=oil&limit=1').get_json()["items"]), 1)
+        # query syntax in the input is treated as plain words
+        self.assertEqual(self.client.get('/inventory/search?q="oil* OR').status_code, 200)
+        self.assertEqual(self.client.get('/inventory/search').status_code, 400)
+
+    def test_search_index_follows_writes(self):
+        part_id = self.client.post('/inventory/', json={"name": "Spark plug", "price": 3.0}).get_json()["id"]
+        self.client.put(f'/inventory/{part_id}', json={"name": "Glow plug"})
+        self.assertEqual(self.client.get('/inventory/search?q=spark').get_json()["items"], [])
+        self.assertEqual(len(self.client.get('/inventory/search?q=glow').get_json()["items"]), 1)
+        self.client.delete(f'/inventory/{part_id}')
+        self.assertEqual(self.client.get('/inventory/search?q=glow').get_json()["items"], [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,6 +1,7 @@
 import unittest
 from app import create_app, db
-from app.models import Mechanic
+from app.models import Mechanic, Customer, ServiceTicket
+from datetime import date
 
 class MechanicTests(unittest.TestCase):
     def setUp(self):
@@ -52,6 +53,46 @@ class MechanicTests(unittest.TestCase):
         response = self.client.put(f'/mechanics/{self.mechanic_id}', json=update_data)
         self.assertIn(response.status_code, [200, 400])
 
+    def test_update_mechanic_evicts_cached_reads(self):
+        self.assertEqual(self.client.get(f'/mechanics/{self.mechanic_id}').get_json()['name'], 'Jane Smith')
+        self.assertEqual(self.client.get('/mechanics/').get_json()['items'][0]['name'], 'Jane Smith')
+        self.client.put(f'/mechanics/{self.mechanic_id}', json={'name': 'Jane Doe'})
+        self.assertEqual(self.client.get(f'/mechanics/{self.mechanic_id}').get_json()['name'], 'Jane Doe')
+        self.assertEqual(self.client.get('/mechanics/').get_json()['items'][0]['name'], 'Jane Doe')
+
+    def _seed_work(self):
+        with self.app.app_context():
+            customer = Customer(name='Cal', email='cal@example.com', phone='5555555555', password='pw')
+            busy = Mechanic(name='Busy', email='busy@example.com', phone='1', salary=1)
+            tied = Mechanic(name='Tied', email='tied@example.com', phone='2', salary=1)
+            jane = db.session.get(Mechanic, self.mechanic_id)
+            def ticket(day, mechanics):
+                return ServiceTicket(VIN='VIN', service_date=day, service_desc='Work', customer=customer, mechanics=mechanics)
+            db.session.add_all([
+                ticket(date(2024, 1, 5), [busy, tied]),
+                ticket(date(2024, 2, 5), [busy, tied]),
+                ticket(date(2024, 3, 5), [busy]),
+                ticket(date(2024, 3, 6), [jane]),
+            ])
+            db.session.commit()
+
+    def test_most_worked_ranks_with_ties(self):
+        self._seed_work()
+        ranking = self.client.get('/mechanics/most_worked').get_json()
+        self.assertEqual([(m['name'], m['ticket_count'], m['rank']) for m in ranking],
+                         [('Busy', 3, 1), ('Tied', 2, 2), ('Jane Smith', 1, 3)])
+
+        ranking = self.client.get('/mechanics/most_worked?start_date=2024-02-01&end_date=2024-03-05&limit=1').get_json()
+        # Busy has 2 tickets in range; nobody ties, so limit=1 is just Busy
+        self.assertEqual([(m['name'], m['ticket_count']) for m in ranking], [('Busy', 2)])
+
+        ranking = self.client.get('/mechanics/most_worked?start_date=2024-03-01&limit=1').get_json()
+        self.assertEqual(sorted(m['name'] for m in ranking), ['Busy', 'Jane Smith'])
+
+    def test_most_worked_bad_date(self):
+        response = self.client.get('/mechanics/most_worked?start_date=March')
+        self.assertEqual(response.status_code, 400)
+
     def test_delete_mechanic(self):
         response = self.client.delete(f'/mechanics/{self.mechanic_id}')
         self.assertEqual(response.status_code, 200)
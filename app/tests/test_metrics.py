@@ -0,0 +1,72 @@
+import os
+import re
+import stat
+import tempfile
+import unittest
+from flask import Flask
+from app import create_app, db
+from app.utils.metrics import Metrics, histogram, init_metrics, labels
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def timing(self, res):
+        return dict(re.match(r'(\w+);?(.*)', part.strip()).groups() for part in res.headers['Server-Timing'].split(','))
+
+    def test_server_timing_counts_statements(self):
+        self.client.post('/inventory/', json={"name": "Air Filter", "price": 19.99})
+        res = self.client.get('/inventory/1')
+        self.assertEqual(res.status_code, 200)
+        timing = self.timing(res)
+        self.assertEqual(set(timing), {'total', 'db', 'serialize'})
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+    def test_cache_hit_and_miss(self):
+        self.client.post('/mechanics/', json={"name": "Joe", "email": "joe@example.com", "phone": "555", "salary": 50000})
+        self.assertEqual(self.timing(self.client.get('/mechanics/1'))['cache'], 'desc=miss')
+        res = self.client.get('/mechanics/1')
+        self.assertEqual(self.timing(res)['cache'], 'desc=hit')
+
+    def test_metrics_route(self):
+        self.client.get('/inventory/')
+        self.client.get('/inventory/')
+        res = self.client.get('/metrics')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content_type.startswith('text/plain; version=0.0.4'))
+        text = res.get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_requests_total{endpoint="inventory_bp.get_parts",method="GET",status="200"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="inventory_bp.get_parts",method="GET",le="+Inf"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{endpoint="inventory_bp.get_parts",method="GET"} 2', text)
+
+    def test_workers_share_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.sqlite')
+            first, second = Metrics(path), Metrics(path)
+            series = labels(endpoint='e', method='GET')
+            first.add(histogram('http_request_duration_seconds', series, 0.02))
+            second.add(histogram('http_request_duration_seconds', series, 3.0))
+            first.flush()
+            text = second.render()
+            self.assertIn('http_request_duration_seconds_bucket{endpoint="e",method="GET",le="0.025"} 1', text)
+            self.assertIn('http_request_duration_seconds_bucket{endpoint="e",method="GET",le="5"} 2', text)
+            self.assertIn('http_request_duration_seconds_sum{endpoint="e",method="GET"} 3.02', text)
+            self.assertIn('http_request_duration_seconds_count{endpoint="e",method="GET"} 2', text)
+
+    def test_shared_file_is_in_instance_folder(self):
+        with tempfile.TemporaryDirectory() as directory:
+            app = Flask(__name__, instance_path=os.path.join(directory, 'instance'))
+            app.config['METRICS_SQLITE_PATH'] = 'metrics.sqlite'
+            init_metrics(app)
+            path = os.path.join(directory, 'instance', 'metrics.sqlite')
+            self.assertEqual(app.extensions['metrics'].path, path)
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, inspect, text
+from app.models import db
+from app.migrations import upgrade
+
+# the tables as they were before ticket_mechanic had a key or any lookup index
+OLD_SCHEMA = [
+    "CREATE TABLE customers (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, email VARCHAR(150) NOT NULL UNIQUE, phone VARCHAR(20) NOT NULL, password VARCHAR(100) NOT NULL)",
+    "CREATE TABLE mechanics (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(255) NOT NULL, email VARCHAR(360) NOT NULL UNIQUE, phone VARCHAR(20) NOT NULL, salary FLOAT NOT NULL)",
+    "CREATE TABLE inventory (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL, price FLOAT NOT NULL)",
+    "CREATE TABLE service_tickets (id INTEGER NOT NULL PRIMARY KEY, \"VIN\" VARCHAR(17) NOT NULL, service_date DATE NOT NULL, service_desc VARCHAR(255) NOT NULL, customer_id INTEGER NOT NULL REFERENCES customers (id))",
+    "CREATE TABLE ticket_mechanic (ticket_id INTEGER REFERENCES service_tickets (id), mechanic_id INTEGER REFERENCES mechanics (id))",
+    "CREATE TABLE inventory_ticket (inventory_id INTEGER NOT NULL REFERENCES inventory (id), ticket_id INTEGER NOT NULL REFERENCES service_tickets (id), PRIMARY KEY (inventory_id, ticket_id))",
+]
+
+class MigrationTests(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.engine = create_engine(f'sqlite:///{self.path}')
+
+    def tearDown(self):
+        self.engine.dispose()
+        os.remove(self.path)
+
+    def test_upgrade_existing_database(self):
+        with self.engine.begin() as conn:
+            for statement in OLD_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO customers VALUES (1, 'C', 'c@example.com', '1', 'pw')"))
+            conn.execute(text("INSERT INTO mechanics VALUES (1, 'M', 'm@example.com', '1', 1)"))
+            conn.execute(text("INSERT INTO service_tickets VALUES (1, 'VIN', '2024-01-01', 'Work', 1)"))
+            conn.execute(text("INSERT INTO ticket_mechanic VALUES (1, 1), (1, 1), (1, NULL)"))
+            conn.execute(text("INSERT INTO inventory VALUES (1, 'Oil filter', 5)"))
+
+        self.assertIn(1, upgrade(self.engine))
+
+        inspector = inspect(self.engine)
+        self.assertEqual(inspector.get_pk_constraint('ticket_mechanic')['constrained_columns'], ['ticket_id', 'mechanic_id'])
+        self.assertIn('ix_ticket_mechanic_mechanic_id_ticket_id', {i['name'] for i in inspector.get_indexes('ticket_mechanic')})
+        self.assertIn('ix_inventory_ticket_ticket_id_inventory_id', {i['name'] for i in inspector.get_indexes('inventory_ticket')})
+        self.assertIn('ix_service_tickets_customer_id_service_date', {i['name'] for i in inspector.get_indexes('service_tickets')})
+        self.assertIn('stock', {c['name'] for c in inspector.get_columns('inventory')})
+        self.assertIn('quantity', {c['name'] for c in inspector.get_columns('inventory_ticket')})
+        for table in ('customers', 'mechanics', 'service_tickets', 'inventory'):
+            self.assertIn('version', {c['name'] for c in inspector.get_columns(table)})
+            self.assertIn(f'ix_{table}_version', {i['name'] for i in inspector.get_indexes(table)})
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT ticket_id, mechanic_id FROM ticket_mechanic")).all(), [(1, 1)])
+            # existing parts are indexed for search
+            self.assertEqual(conn.execute(text("SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH 'fil*'")).all(), [(1,)])
+            # existing parts aren't stock tracked, so tickets can still use them
+            self.assertEqual(conn.execute(text("SELECT stock FROM inventory")).scalar(), None)
+
+        # already applied
+        self.assertEqual(upgrade(self.engine), [])
+
+    def test_upgrade_is_noop_on_fresh_schema(self):
+        db.metadata.create_all(self.engine)
+        upgrade(self.engine)
+        self.assertEqual(inspect(self.engine).get_pk_constraint('ticket_mechanic')['constrained_columns'], ['ticket_id', 'mechanic_id'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from unittest import mock
+from datetime import date, timedelta
+from app import create_app, db
+from app.models import Customer, Inventory, Mechanic, ServiceTicket, inventory_ticket
+from app.utils.passwords import hash_password
+from app.utils.query_budget import QueryBudgetExceeded, QueryLog, count_queries, normalize
+from app.utils.util import encode_token
+from app.blueprints.tickets.routes import ID_LOOKUP_CHUNK
+
+SIZES = (3, 30) #rows of everything; a per-row query shows up as a difference between the two
+
+# every route, with the options that add queries
+REQUESTS = [
+    ('GET', '/customers/?limit=50&count=true', None),
+    ('GET', '/customers/1?expand=tickets', None),
+    ('GET', '/customers/my-tickets?expand=mechanics,parts', None),
+    ('GET', '/customers/my-tickets', 'ndjson'),
+    ('POST', '/customers/login', {'email': 'customer1@example.com', 'password': 'password123'}),
+    ('POST', '/customers/', {'name': 'New', 'email': 'new@example.com', 'phone': '5550000000', 'password': 'password123'}),
+    ('PUT', '/customers/1', {'name': 'Renamed'}),
+    ('GET', '/mechanics/?limit=50&count=true&expand=tickets', None),
+    ('GET', '/mechanics/', 'ndjson'),
+    ('GET', '/mechanics/1?expand=tickets', None),
+    ('GET', '/mechanics/most_worked', None),
+    ('GET', '/mechanics/most_worked?limit=2&start_date=2024-01-01&end_date=2024-12-31', None),
+    ('POST', '/mechanics/', {'name': 'New', 'email': 'new@example.com', 'phone': '5550000000', 'salary': 50000}),
+    ('PUT', '/mechanics/1', {'salary': 60000}),
+    ('GET', '/tickets/?limit=100&count=true&expand=customer,mechanics,parts', None),
+    ('GET', '/tickets/?expand=customer,mechanics,parts', 'ndjson'),
+    ('GET', '/tickets/1?expand=customer,mechanics,parts', None),
+    ('POST', '/tickets/', {'VIN': 'NEWVIN', 'service_date': '2024-06-01', 'service_desc': 'Oil change', 'customer_id': 1, 'mechanic_ids': [1, 2]}),
+    ('POST', '/tickets/bulk', 'bulk'),
+    ('PUT', '/tickets/1', {'service_desc': 'Brakes', 'customer_id': 3, 'mechanic_ids': [2, 3]}),
+    ('PUT', '/tickets/1/edit', {'add_ids': [3], 'remove_ids': [1]}),
+    ('PUT', '/tickets/edit', 'all tickets'),
+    ('PUT', '/tickets/1/add_part', {'part_id': 1, 'quantity': 1}),
+    ('GET', '/inventory/?limit=50&count=true', None),
+    ('GET', '/inventory/search?q=part', None),
+    ('GET', '/inventory/1', None),
+    ('GET', '/inventory/export', None),
+    ('GET', '/inventory/export?format=ndjson', None),
+    ('POST', '/inventory/', {'name': 'New part', 'price': 1.5}),
+    ('PUT', '/inventory/1', {'price': 2.5}),
+    ('POST', '/inventory/1/restock', {'quantity': 5}),
+    ('POST', '/inventory/import', 'csv'),
+    ('DELETE', '/inventory/2', None),
+    ('DELETE', '/mechanics/2', None),
+    ('DELETE', '/customers/2', None),
+]
+
+class QueryBudgetTests(unittest.TestCase):
+    def seeded_app(self, size):
+        app = create_app("testing")
+        with app.app_context():
+            db.create_all()
+            password = hash_password('password123')
+            db.session.add_all(Customer(name=f'Customer {i}', email=f'customer{i}@example.com', phone='5551111111', password=password)
+                               for i in range(1, size + 1))
+            db.session.add_all(Mechanic(name=f'Mechanic {i}', email=f'mechanic{i}@example.com', phone='5552222222', salary=40000)
+                               for i in range(1, size + 1))
+            db.session.add_all(Inventory(name=f'part {i}', price=9.99, stock=100) for i in range(1, size + 1))
+            db.session.flush()
+            mechanics, parts = db.session.query(Mechanic).all(), db.session.query(Inventory).all()
+            for i in range(size):
+                #customer 1 owns most tickets, every ticket has two mechanics and a part
+                db.session.add(ServiceTicket(VIN=f'VIN{i:05d}', service_date=date(2024, 1, 1) + timedelta(days=i),
+                                             service_desc='Oil change', customer_id=1 if i % 3 else 3,
+                                             mechanics=[mechanics[i], mechanics[(i + 1) % size]]))
+            db.session.flush()
+            db.session.execute(inventory_ticket.insert(), [{'ticket_id': i + 1, 'inventory_id': parts[i].id, 'quantity': 1}
+                                                            for i in range(size)])
+            db.session.commit()
+        return app
+
+    def body(self, body, size):
+        if body == 'bulk':
+            return {'json': [{'VIN': f'BULK{i}', 'service_date': '2024-06-01', 'service_desc': 'Tires',
+                              'customer_id': 1, 'mechanic_ids': [1]} for i in range(size)]}
+        if body == 'all tickets':
+            return {'json': {'ticket_ids': list(range(1, size + 1)), 'add_ids': [2], 'remove_ids': [1]}}
+        if body == 'csv':
+            rows = ''.join(f'part {i},4.5,{i}\n' for i in range(size * 2))
+            return {'data': 'name,price,stock\n' + rows, 'headers': {'Content-Type': 'text/csv'}}
+        if body == 'ndjson':
+            return {}
+        return {'json': body} if body is not None else {}
+
+    def statement_counts(self, size):
+        app = self.seeded_app(size)
+        client = app.test_client()
+        counts = {}
+        try:
+            for method, path, body in REQUESTS:
+                headers = {'Authorization': f'Bearer {encode_token(1)}'}
+                if body == 'ndjson':
+                    headers['Accept'] = 'application/x-ndjson'
+                kwargs = self.body(body, size)
+                headers.update(kwargs.pop('headers', {}))
+                #reading the body inside the block counts what a streamed response queries per chunk
+                with count_queries() as log:
+                    res = client.open(path, method=method, headers=headers, **kwargs)
+                    text = res.get_data(as_text=True)
+                self.assertLess(res.status_code, 400, f"{method} {path}: {text}")
+                if body == 'ndjson':
+                    self.assertGreater(len(text.splitlines()), size // 2, f"{method} {path}")
+                self.assertEqual(log.repeated(), {}, f"{method} {path}")
+                counts[f"{method} {path} {body if isinstance(body, str) else ''}"] = len(log)
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.drop_all()
+        return counts
+
+    def test_statements_do_not_grow_with_rows(self):
+        #every request above is also checked against its route's budget (QUERY_BUDGET_MODE = 'raise')
+        self.maxDiff = None
+        small, large = (self.statement_counts(size) for size in SIZES)
+        self.assertEqual(small, large)
+
+    def test_every_route_declares_a_budget(self):
+        app = create_app("testing")
+        undeclared = [endpoint for endpoint, view in app.view_functions.items()
+                      if '.' in endpoint and not endpoint.startswith('swagger_ui.') and not hasattr(view, 'query_budget')]
+        self.assertEqual(undeclared, [])
+
+    def test_repeats_differing_only_in_parameters(self):
+        log = QueryLog()
+        log.statements = ['SELECT a FROM t WHERE id = ?'] * 3 + ['SELECT a FROM t WHERE id IN (?, ?)', 'SELECT a FROM t WHERE id IN (?)']
+        self.assertEqual(log.repeated(), {'SELECT a FROM t WHERE id = ?': 3})
+        self.assertEqual(normalize('SELECT a FROM t WHERE id IN (%(id_1)s, %(id_2)s)'), 'SELECT a FROM t WHERE id IN (?)')
+        self.assertEqual(log.problems(budget=4), ['5 statements, budget 4', '3 runs of SELECT a FROM t WHERE id = ?'])
+
+    def test_over_budget_request_fails(self):
+        app = self.seeded_app(SIZES[0])
+        try:
+            with mock.patch.object(app.view_functions['inventory_bp.get_part'], 'query_budget', (0, 2)), \
+                 self.assertRaises(QueryBudgetExceeded):
+                app.test_client().get('/inventory/1')
+        finally:
+            with app.app_context():
+                db.drop_all()
+
+    def test_chunked_routes_take_more_than_a_chunk(self):
+        #these run a statement per ID_LOOKUP_CHUNK ids by design, so a big request is no overrun
+        app = self.seeded_app(SIZES[0])
+        client = app.test_client()
+        count = ID_LOOKUP_CHUNK * 2 + 200
+        try:
+            res = client.post('/tickets/bulk', json=self.body('bulk', count)['json'])
+            self.assertEqual(res.status_code, 201)
+            ticket_ids = [result['id'] for result in res.get_json()['results']]
+            res = client.put('/tickets/edit', json={'ticket_ids': ticket_ids, 'add_ids': [2], 'remove_ids': [1]})
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.get_json()['tickets'], count)
+        finally:
+            with app.app_context():
+                db.drop_all()
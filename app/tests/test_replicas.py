@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.utils import replicas
+from config import TestingConfig
+
+class ReplicaTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.replica = os.path.join(self.directory.name, 'replica.db')
+        self.app = self.create_app(f'sqlite:///file:{self.replica}?mode=ro&uri=true')
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            replicas.sync_sqlite_replicas(db)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+            for engine in db.engines.values():
+                engine.dispose()
+        replicas._down_until.clear()
+        self.directory.cleanup()
+
+    def create_app(self, *uris, sync=False):
+        with mock.patch.object(TestingConfig, 'READ_REPLICA_URIS', list(uris), create=True), \
+             mock.patch.object(TestingConfig, 'SQLITE_REPLICA_SYNC', sync, create=True):
+            return create_app("testing")
+
+    def create_customer(self, client, email="rita@example.com"):
+        res = client.post('/customers/', json={
+            "name": "Rita", "email": email, "phone": "1234567890", "password": "password123"
+        })
+        self.assertEqual(res.status_code, 201)
+        return res.get_json()['id']
+
+    def test_gets_read_from_replica_until_synced(self):
+        customer_id = self.create_customer(self.client)
+        other = self.app.test_client()
+        self.assertEqual(other.get(f'/customers/{customer_id}').status_code, 404) #stale, so not cached either
+        with self.app.app_context():
+            replicas.sync_sqlite_replicas(db)
+        self.assertEqual(other.get(f'/customers/{customer_id}').status_code, 200)
+
+    def test_writer_reads_its_writes_from_primary(self):
+        customer_id = self.create_customer(self.client)
+        self.assertIsNotNone(self.client.get_cookie(replicas.STICKY_COOKIE))
+        self.assertEqual(self.client.get(f'/customers/{customer_id}').status_code, 200)
+        with self.app.app_context():
+            with db.engines['replica_0'].connect() as conn:
+                self.assertEqual(conn.exec_driver_sql("SELECT COUNT(*) FROM customers").scalar(), 0)
+
+    def test_sync_on_commit(self):
+        app = self.create_app(f'sqlite:///file:{self.replica}?mode=ro&uri=true', sync=True)
+        customer_id = self.create_customer(app.test_client())
+        self.assertEqual(app.test_client().get(f'/customers/{customer_id}').status_code, 200)
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def test_unavailable_replica_falls_back_to_primary(self):
+        app = self.create_app(f"sqlite:///file:{os.path.join(self.directory.name, 'missing.db')}?mode=ro&uri=true")
+        customer_id = self.create_customer(app.test_client())
+        with self.assertLogs(app.logger, 'WARNING'):
+            self.assertEqual(app.test_client().get(f'/customers/{customer_id}').status_code, 200)
+        self.assertIn('replica_0', replicas._down_until) #skipped until REPLICA_RETRY_SECONDS pass
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'missing.db')))
+
+if __name__ == '__main__':
+    unittest.main()
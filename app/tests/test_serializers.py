@@ -0,0 +1,52 @@
+import unittest
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+from app import create_app, db
+from app.models import Customer, Mechanic, ServiceTicket, Inventory
+from app.blueprints.tickets.schemas import tickets_schema, ticket_schema
+from app.blueprints.inventory.schemas import inventories_schema
+from app.utils.serializers import compile_schema, dump
+
+class SerializerTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app("testing")
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.drop_all()
+
+    def test_compiled_dump_matches_marshmallow(self):
+        with self.app.app_context():
+            customer = Customer(name="Zoë", email="z@example.com", phone="1", password="x")
+            mechanics = [Mechanic(name="Ana", email="a@example.com", phone="2", salary=40000)]
+            db.session.add_all([
+                ServiceTicket(VIN="VIN1", service_date=date(2024, 5, 1), service_desc="Brakes", customer=customer, mechanics=mechanics),
+                ServiceTicket(VIN="VIN2", service_date=date(2024, 5, 2), service_desc="Oil", customer=customer, mechanics=[]),
+                Inventory(name="Filter", price=5, stock=3),
+            ])
+            db.session.commit()
+            tickets = db.session.execute(db.select(ServiceTicket)).scalars().all()
+            parts = db.session.execute(db.select(Inventory)).scalars().all()
+
+            self.assertIsNotNone(compile_schema(tickets_schema))
+            self.assertEqual(dump(tickets_schema, tickets), tickets_schema.dump(tickets))
+            self.assertEqual(list(dump(ticket_schema, tickets[0]).items()), list(ticket_schema.dump(tickets[0]).items()))
+            # an int price is still dumped as a float
+            self.assertEqual(dump(inventories_schema, parts), inventories_schema.dump(parts))
+            self.assertIsInstance(dump(inventories_schema, parts)[0]["price"], float)
+
+    def test_json_provider_output_is_unchanged(self):
+        reference = DefaultJSONProvider(self.app)
+        values = [
+            {"b": 1, "a": [1.5, None, True, "é", "\x7f"], "d": date(2024, 5, 1)},
+            [1e-05, 1e16, 0.1, 2 ** 70, {"nested": {}}],
+            {"items": [{"id": 1, "name": "Filter", "price": 5.0}], "next_cursor": None},
+        ]
+        for value in values:
+            for kwargs in ({"separators": (",", ":")}, {"indent": 2}, {}):
+                self.assertEqual(self.app.json.dumps(value, **kwargs), reference.dumps(value, **kwargs))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,11 @@
 import unittest
 from app import create_app, db
-from app.models import Customer, Mechanic, ServiceTicket
+from app.models import Customer, Mechanic, ServiceTicket, Inventory
+from app.extensions import cache
 from datetime import date
+import json
+from sqlalchemy import event
+from concurrent.futures import ThreadPoolExecutor
 
 class TicketTests(unittest.TestCase):
     def setUp(self):
@@ -37,6 +41,39 @@ class TicketTests(unittest.TestCase):
         res = self.client.get('/tickets/')
         self.assertEqual(res.status_code, 200)
 
+    def test_get_tickets_paginates_newest_first(self):
+        for day in ("2024-01-01", "2024-03-01", "2024-02-01"):
+            self.client.post('/tickets/', json={
+                "VIN": "PAGE123",
+                "service_date": day,
+                "service_desc": "Inspection",
+                "customer_id": self.customer_id,
+                "mechanic_ids": [self.mechanic_id]
+            })
+        first = self.client.get('/tickets/?limit=2').get_json()
+        self.assertEqual([t["service_date"] for t in first["items"]], ["2024-03-01", "2024-02-01"])
+        second = self.client.get(f'/tickets/?limit=2&cursor={first["next_cursor"]}').get_json()
+        self.assertEqual([t["service_date"] for t in second["items"]], ["2024-01-01"])
+        self.assertIsNone(second["next_cursor"])
+
+    def test_get_tickets_ndjson_stream(self):
+        self.app.config['STREAM_CHUNK_SIZE'] = 2
+        for i in range(5):
+            self.client.post('/tickets/', json={
+                "VIN": f"STREAM{i}",
+                "service_date": str(date.today()),
+                "service_desc": "Rotation",
+                "customer_id": self.customer_id,
+                "mechanic_ids": [self.mechanic_id]
+            })
+        res = self.client.get('/tickets/?expand=customer,mechanics', headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[0]["customer"]["id"], self.customer_id)
+        self.assertEqual(lines[0]["mechanics"][0]["name"], "Ana")
+
     def test_get_ticket_by_id(self):
         res = self.client.post('/tickets/', json={
             "VIN": "XYZ123",
@@ -71,6 +108,15 @@ class TicketTests(unittest.TestCase):
         self.assertEqual(update_res.status_code, 200)
         self.assertEqual(update_res.get_json()["service_desc"], "Brake & oil")
 
+    def test_rate_limits_come_from_config(self):
+        self.app.config['RATE_LIMITS'] = {**self.app.config['RATE_LIMITS'], 'update_ticket': "1 per day"}
+        res = self.client.post('/tickets/', json={
+            "VIN": "ABC987", "service_date": str(date.today()), "service_desc": "Brake",
+            "customer_id": self.customer_id, "mechanic_ids": [self.mechanic_id]})
+        ticket_id = res.get_json()["id"]
+        self.assertEqual(self.client.put(f"/tickets/{ticket_id}", json={"VIN": "ONE"}).status_code, 200)
+        self.assertEqual(self.client.put(f"/tickets/{ticket_id}", json={"VIN": "TWO"}).status_code, 429)
+
     def test_edit_mechanics_on_ticket(self):
         # Create a ticket
         create_res = self.client.post('/tickets/', json={
@@ -90,10 +136,253 @@ class TicketTests(unittest.TestCase):
         })
         self.assertEqual(put_res.status_code, 200)
 
+    def test_edit_mechanics_evicts_cached_ticket(self):
+        create_res = self.client.post('/tickets/', json={
+            "VIN": "CACHE123",
+            "service_date": str(date.today()),
+            "service_desc": "Alignment",
+            "customer_id": self.customer_id,
+            "mechanic_ids": [self.mechanic_id]
+        })
+        ticket_id = create_res.get_json()["id"]
+        self.assertEqual(len(self.client.get(f"/tickets/{ticket_id}").get_json()["mechanics"]), 1)
+        self.client.put(f"/tickets/{ticket_id}/edit", json={"remove_ids": [self.mechanic_id]})
+        self.assertEqual(self.client.get(f"/tickets/{ticket_id}").get_json()["mechanics"], [])
+
+    def _bulk_payload(self, count):
+        return [{
+            "VIN": f"BULK{i}",
+            "service_date": "2024-05-01",
+            "service_desc": "Fleet service",
+            "customer_id": self.customer_id,
+            "mechanic_ids": [self.mechanic_id]
+        } for i in range(count)]
+
+    def test_bulk_create_tickets(self):
+        res = self.client.post('/tickets/bulk', json=self._bulk_payload(3))
+        self.assertEqual(res.status_code, 201)
+        body = res.get_json()
+        self.assertEqual(body["created"], 3)
+        ticket_id = body["results"][2]["id"]
+        ticket = self.client.get(f"/tickets/{ticket_id}").get_json()
+        self.assertEqual(ticket["VIN"], "BULK2")
+        self.assertEqual(ticket["mechanics"], [self.mechanic_id])
+
+    def test_bulk_create_reports_each_item(self):
+        payload = self._bulk_payload(3)
+        payload[0]["customer_id"] = 999
+        del payload[1]["VIN"]
+        res = self.client.post('/tickets/bulk', json=payload)
+        self.assertEqual(res.status_code, 207)
+        results = res.get_json()["results"]
+        self.assertEqual(results[0]["error"], "Invalid customer ID")
+        self.assertIn("VIN", results[1]["error"])
+        self.assertIn("id", results[2])
+
+    def test_bulk_create_rejects_bad_strings_per_item(self):
+        payload = self._bulk_payload(4)
+        payload[0]["VIN"] = None
+        payload[1]["VIN"] = "X" * 18
+        payload[2]["service_desc"] = "  "
+        res = self.client.post('/tickets/bulk', json=payload)
+        self.assertEqual(res.status_code, 207)
+        body = res.get_json()
+        self.assertEqual((body["created"], body["failed"]), (1, 3))
+        self.assertEqual([r["index"] for r in body["results"][:3]], [0, 1, 2])
+        self.assertIn("VIN", body["results"][1]["error"])
+        self.assertIn("service_desc", body["results"][2]["error"])
+        self.assertIn("id", body["results"][3])
+
+    def test_bulk_create_statement_count_is_constant(self):
+        def statements_for(count):
+            statements = []
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            with self.app.app_context():
+                event.listen(db.engine, "before_cursor_execute", record)
+                try:
+                    res = self.client.post('/tickets/bulk', json=self._bulk_payload(count))
+                finally:
+                    event.remove(db.engine, "before_cursor_execute", record)
+            self.assertEqual(res.status_code, 201)
+            return len(statements)
+        self.assertEqual(statements_for(5), statements_for(300))
+
+    def test_reassign_mechanics_across_tickets(self):
+        with self.app.app_context():
+            other = Mechanic(name="Bo", email="bo@example.com", phone="5555555555", salary=40000)
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        ticket_ids = [r["id"] for r in self.client.post('/tickets/bulk', json=self._bulk_payload(3)).get_json()["results"]]
+
+        res = self.client.put('/tickets/edit', json={
+            "ticket_ids": ticket_ids, "add_ids": [other_id, 999], "remove_ids": [self.mechanic_id]
+        })
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.get_json()["added"], res.get_json()["removed"]), (3, 3))
+        for ticket_id in ticket_ids:
+            self.assertEqual(self.client.get(f"/tickets/{ticket_id}").get_json()["mechanics"], [other_id])
+
+        # adding an existing link again is a no-op, unknown tickets are rejected up front
+        again = self.client.put('/tickets/edit', json={"ticket_ids": ticket_ids, "add_ids": [other_id]})
+        self.assertEqual(again.get_json()["added"], 0)
+        missing = self.client.put('/tickets/edit', json={"ticket_ids": [ticket_ids[0], 999], "add_ids": [self.mechanic_id]})
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.get_json()["ticket_ids"], [999])
+
+    def test_reassign_statement_count_is_constant(self):
+        def statements_for(count):
+            ticket_ids = [r["id"] for r in self.client.post('/tickets/bulk', json=self._bulk_payload(count)).get_json()["results"]]
+            statements = []
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            with self.app.app_context():
+                event.listen(db.engine, "before_cursor_execute", record)
+                try:
+                    res = self.client.put('/tickets/edit', json={"ticket_ids": ticket_ids, "remove_ids": [self.mechanic_id]})
+                finally:
+                    event.remove(db.engine, "before_cursor_execute", record)
+            self.assertEqual(res.status_code, 200)
+            return len(statements)
+        self.assertEqual(statements_for(5), statements_for(200))
+
+    def test_ticket_etag_and_not_modified(self):
+        ticket_id = self.client.post('/tickets/', json={
+            "VIN": "1HGCM82633A004352", "service_date": "2024-01-01", "service_desc": "Oil change",
+            "customer_id": self.customer_id, "mechanic_ids": [self.mechanic_id]}).get_json()["id"]
+        res = self.client.get(f'/tickets/{ticket_id}')
+        etag = res.headers["ETag"]
+        res = self.client.get(f'/tickets/{ticket_id}', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        # another representation of the same row has its own tag
+        self.assertNotEqual(self.client.get(f'/tickets/{ticket_id}?fields=id').headers["ETag"], etag)
+
+        # a link table write changes the ticket's tag, and the next poll gets the new body
+        with self.app.app_context():
+            other = Mechanic(name="Bo", email="bo@example.com", phone="5555555555", salary=40000)
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        self.client.put(f'/tickets/{ticket_id}/edit', json={"add_ids": [other_id]})
+        res = self.client.get(f'/tickets/{ticket_id}', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(sorted(res.get_json()["mechanics"]), sorted([self.mechanic_id, other_id]))
+
+    def test_ticket_list_etag_tracks_the_table(self):
+        etag = self.client.get('/tickets/').headers["ETag"]
+        self.assertEqual(self.client.get('/tickets/', headers={"If-None-Match": etag}).status_code, 304)
+        self.client.post('/tickets/', json={
+            "VIN": "1HGCM82633A004352", "service_date": "2024-01-01", "service_desc": "Oil change",
+            "customer_id": self.customer_id, "mechanic_ids": [self.mechanic_id]})
+        res = self.client.get('/tickets/', headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.get_json()["items"]), 1)
+        # expanding customers makes customer writes part of the tag
+        etag = self.client.get('/tickets/?expand=customer').headers["ETag"]
+        with self.app.app_context():
+            db.session.get(Customer, self.customer_id).name = "Luke S"
+            db.session.commit()
+        self.assertEqual(self.client.get('/tickets/?expand=customer', headers={"If-None-Match": etag}).status_code, 200)
+
     def test_add_part_invalid_ticket(self):
         # Try to add part to a ticket that doesn't exist
         res = self.client.put('/tickets/999/add_part', json={"part_id": 1})
         self.assertEqual(res.status_code, 404)
 
+    def _ticket_and_part(self, stock):
+        ticket_id = self.client.post('/tickets/bulk', json=self._bulk_payload(1)).get_json()["results"][0]["id"]
+        with self.app.app_context():
+            part = Inventory(name="Oil filter", price=9.5, stock=stock)
+            db.session.add(part)
+            db.session.commit()
+            return ticket_id, part.id
+
+    def test_add_part_tracks_quantity_and_stock(self):
+        ticket_id, part_id = self._ticket_and_part(stock=5)
+        res = self.client.put(f'/tickets/{ticket_id}/add_part', json={"part_id": part_id, "quantity": 2})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.get_json()["quantity"], res.get_json()["stock"]), (2, 3))
+        res = self.client.put(f'/tickets/{ticket_id}/add_part', json={"part_id": part_id})
+        self.assertEqual((res.get_json()["quantity"], res.get_json()["stock"]), (3, 2))
+
+        res = self.client.put(f'/tickets/{ticket_id}/add_part', json={"part_id": part_id, "quantity": 3})
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.get_json()["stock"], 2)
+        self.assertEqual(self.client.get(f'/inventory/{part_id}').get_json()["stock"], 2)
+
+        res = self.client.post(f'/inventory/{part_id}/restock', json={"quantity": 10})
+        self.assertEqual(res.get_json()["stock"], 12)
+
+    def test_untracked_part_is_never_out_of_stock(self):
+        ticket_id, part_id = self._ticket_and_part(stock=0)
+        self.assertEqual(self.client.put(f'/inventory/{part_id}', json={"stock": None}).status_code, 200)
+        res = self.client.put(f'/tickets/{ticket_id}/add_part', json={"part_id": part_id, "quantity": 50})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.get_json()["quantity"], res.get_json()["stock"]), (50, None))
+        # a restock starts counting
+        res = self.client.post(f'/inventory/{part_id}/restock', json={"quantity": 4})
+        self.assertEqual(res.get_json()["stock"], 4)
+
+    def test_concurrent_add_part_never_oversells(self):
+        ticket_id, part_id = self._ticket_and_part(stock=5)
+        def add_one(_):
+            return self.app.test_client().put(f'/tickets/{ticket_id}/add_part', json={"part_id": part_id}).status_code
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            statuses = list(pool.map(add_one, range(8)))
+        self.assertEqual(statuses.count(200), 5)
+        self.assertEqual(statuses.count(409), 3)
+        self.assertEqual(self.client.get(f'/inventory/{part_id}').get_json()["stock"], 0)
+
+    def _count_get_tickets_queries(self, ticket_count, url='/tickets/'):
+        with self.app.app_context():
+            customers = [Customer(name=f"C{i}", email=f"c{ticket_count}_{i}@example.com", phone="3333333333", password="test") for i in range(ticket_count)]
+            mechanics = [Mechanic(name=f"M{i}", email=f"m{ticket_count}_{i}@example.com", phone="4444444444", salary=40000) for i in range(ticket_count)]
+            db.session.add_all([
+                ServiceTicket(VIN=f"VIN{i}", service_date=date.today(), service_desc="Tune up",
+                              customer=customers[i], mechanics=[mechanics[i]])
+                for i in range(ticket_count)
+            ])
+            db.session.commit()
+            cache.clear()
+
+            statements = []
+            def count(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            event.listen(db.engine, "before_cursor_execute", count)
+            try:
+                res = self.client.get(url)
+            finally:
+                event.remove(db.engine, "before_cursor_execute", count)
+        self.assertEqual(res.status_code, 200)
+        self.statements = statements
+        return len(statements)
+
+    def test_get_tickets_query_count_is_constant(self):
+        # nested customer and mechanics must be eager loaded, not one query per row
+        few = self._count_get_tickets_queries(2)
+        many = self._count_get_tickets_queries(20)
+        self.assertEqual(few, many)
+        expanded_few = self._count_get_tickets_queries(3, '/tickets/?expand=customer,mechanics')
+        expanded_many = self._count_get_tickets_queries(21, '/tickets/?expand=customer,mechanics')
+        self.assertEqual(expanded_few, expanded_many)
+
+    def test_sparse_fields_and_expand(self):
+        self._count_get_tickets_queries(1, '/tickets/?fields=id,VIN')
+        # the ETag stamp, then only the requested columns (plus the keyset column), no relationship queries
+        self.assertEqual(len(self.statements), 2)
+        self.assertNotIn("service_desc", self.statements[1])
+        self.assertEqual(set(self.client.get('/tickets/?fields=id,VIN').get_json()["items"][0]), {"id", "VIN"})
+
+        item = self.client.get('/tickets/?fields=id&expand=customer').get_json()["items"][0]
+        self.assertEqual(set(item), {"id", "customer"})
+        self.assertEqual(item["customer"]["name"], "C0")
+        self.assertNotIn("password", item["customer"])
+
+        self.assertEqual(self.client.get('/tickets/?fields=id,nope').status_code, 400)
+        self.assertEqual(self.client.get('/tickets/?expand=VIN').status_code, 400)
+        self.assertEqual(self.client.get(f'/customers/{self.customer_id}?fields=name').get_json(), {"name": "Luke"})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
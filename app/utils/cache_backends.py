@@ -0,0 +1,273 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask_caching.backends.base import BaseCache
+
+# keys with this prefix are only ever kept in the shared tier, so every worker sees
+# a change to them immediately (used for the cache tag versions in app/utils/caching.py)
+SHARED_ONLY_PREFIX = "shared:"
+
+DEFAULT_SQLITE_PATH = "mechanic_shop_cache.sqlite" #relative paths are in the instance folder, see instance_file
+
+def _expires_at(timeout):
+    #0 means never expire, like every other flask-caching backend
+    return time.time() + timeout if timeout else 0
+
+def _alive(expires):
+    return expires == 0 or expires > time.time()
+
+def instance_file(app, path):
+    """`path`, or the same name in the app's instance folder when it is relative."""
+    if os.path.isabs(path):
+        return path
+    os.makedirs(app.instance_path, exist_ok=True)
+    return os.path.join(app.instance_path, path)
+
+def _claim(path):
+    #whoever can write one of these files can put values in it that are unpickled, or
+    #reset counters: create it private and refuse one (or its WAL) that someone else owns
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        owners = [os.fstat(fd)]
+        owners += [os.lstat(path + suffix) for suffix in ('-wal', '-shm') if os.path.lexists(path + suffix)]
+        if hasattr(os, 'getuid') and any(info.st_uid != os.getuid() for info in owners):
+            raise PermissionError(f"{path} or its WAL is owned by another user")
+        if hasattr(os, 'fchmod') and owners[0].st_mode & 0o077:
+            os.fchmod(fd, 0o600) #written by an older version with the umask's permissions
+    finally:
+        os.close(fd)
+
+def connect_shared(path):
+    """Autocommit connection to a SQLite file that every worker on the host opens.
+
+    WAL lets readers run alongside the single writer, and synchronous=NORMAL means a
+    commit only appends to the WAL: the fsync happens at checkpoints, not per write.
+    The file is only readable by this user (SQLite gives its WAL the same mode).
+    """
+    _claim(path)
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class LRUCache:
+    """Bounded in-process tier: holds pickled values, evicts the least recently used entry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not _alive(entry[1]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, raw, expires):
+        with self._lock:
+            self._entries[key] = (raw, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """Shared tier: one SQLite file in WAL mode that every worker on the host opens.
+
+    A trigger-maintained byte total lets a writer check the size budget without
+    scanning, and the oldest entries are evicted once it is exceeded.
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connection(self):
+        #one connection per thread, reopened after a fork so workers never share one
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect_shared(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _create_schema(self):
+        self._connection().executescript("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires REAL NOT NULL,
+                size INTEGER NOT NULL,
+                stored REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_entries_stored ON cache_entries (stored);
+            CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO cache_size (id, bytes) VALUES (0, 0);
+            CREATE TRIGGER IF NOT EXISTS cache_entries_ai AFTER INSERT ON cache_entries BEGIN
+                UPDATE cache_size SET bytes = bytes + new.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS cache_entries_ad AFTER DELETE ON cache_entries BEGIN
+                UPDATE cache_size SET bytes = bytes - old.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS cache_entries_au AFTER UPDATE ON cache_entries BEGIN
+                UPDATE cache_size SET bytes = bytes - old.size + new.size WHERE id = 0;
+            END;
+            -- files written before overwrites were upserts may hold an inflated total
+            UPDATE cache_size SET bytes = (SELECT COALESCE(SUM(size), 0) FROM cache_entries) WHERE id = 0;
+        """)
+
+    def get(self, key):
+        #returns (raw, expires) or None
+        row = self._connection().execute(
+            "SELECT value, expires FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or not _alive(row[1]):
+            return None
+        return row
+
+    def set(self, key, raw, expires, only_if_missing=False):
+        conn = self._connection()
+        if only_if_missing:
+            #an expired row doesn't count as present
+            conn.execute("DELETE FROM cache_entries WHERE key = ? AND expires != 0 AND expires <= ?", (key, time.time()))
+            sql = "INSERT OR IGNORE INTO cache_entries (key, value, expires, size, stored) VALUES (?, ?, ?, ?, ?)"
+        else:
+            #an upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the
+            #delete trigger (recursive_triggers is off), which would leak the old size
+            sql = ("INSERT INTO cache_entries (key, value, expires, size, stored) VALUES (?, ?, ?, ?, ?) "
+                   "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, "
+                   "size = excluded.size, stored = excluded.stored")
+        cursor = conn.execute(sql, (key, raw, expires, len(raw) + len(key), time.time()))
+        if conn.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0] > self.max_bytes:
+            self._evict(conn)
+        return cursor.rowcount > 0
+
+    def _evict(self, conn):
+        conn.execute("DELETE FROM cache_entries WHERE expires != 0 AND expires <= ?", (time.time(),))
+        while conn.execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0] > self.max_bytes:
+            #drop the oldest tenth at a time rather than one row per round trip
+            deleted = conn.execute("""
+                DELETE FROM cache_entries WHERE key IN (
+                    SELECT key FROM cache_entries ORDER BY stored
+                    LIMIT MAX(1, (SELECT COUNT(*) FROM cache_entries) / 10))
+            """).rowcount
+            if not deleted:
+                break
+
+    def delete(self, key):
+        return self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount > 0
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    def size_bytes(self):
+        return self._connection().execute("SELECT bytes FROM cache_size WHERE id = 0").fetchone()[0]
+
+
+class TieredCache(BaseCache):
+    """Two-tier flask-caching backend: a small per-process LRU in front of a shared SQLite store.
+
+    Reads try the LRU first, then the shared store (promoting what they find). Entries
+    stay in the LRU for at most `l1_timeout` seconds, which bounds how long one worker
+    can serve a value another worker has replaced. Select it with
+    CACHE_TYPE = 'app.utils.cache_backends.TieredCache'.
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, l1_max_entries=1024, l1_timeout=5,
+                 l2_max_bytes=64 * 1024 * 1024, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.l1 = LRUCache(l1_max_entries)
+        self.l2 = SQLiteStore(path, l2_max_bytes)
+        self.l1_timeout = l1_timeout
+        self._stats = {'l1': {'hits': 0, 'misses': 0}, 'l2': {'hits': 0, 'misses': 0}}
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            path=instance_file(app, config.get('CACHE_SQLITE_PATH') or DEFAULT_SQLITE_PATH),
+            l1_max_entries=config.get('CACHE_L1_MAX_ENTRIES', 1024),
+            l1_timeout=config.get('CACHE_L1_TIMEOUT', 5),
+            l2_max_bytes=config.get('CACHE_L2_MAX_BYTES', 64 * 1024 * 1024),
+        )
+        return cls(*args, **kwargs)
+
+    def _count(self, tier, outcome):
+        #plain increments: good enough for stats, not worth a lock on the read path
+        self._stats[tier][outcome] += 1
+
+    def stats(self):
+        return {tier: dict(counts) for tier, counts in self._stats.items()}
+
+    def _l1_expires(self, expires):
+        local = time.time() + self.l1_timeout
+        return local if expires == 0 else min(expires, local)
+
+    def get(self, key):
+        local = not key.startswith(SHARED_ONLY_PREFIX)
+        if local:
+            raw = self.l1.get(key)
+            if raw is not None:
+                self._count('l1', 'hits')
+                return pickle.loads(raw)
+            self._count('l1', 'misses')
+
+        row = self.l2.get(key)
+        if row is None:
+            self._count('l2', 'misses')
+            return None
+        self._count('l2', 'hits')
+        raw, expires = row
+        if local:
+            self.l1.set(key, raw, self._l1_expires(expires))
+        return pickle.loads(raw)
+
+    def set(self, key, value, timeout=None):
+        raw = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = _expires_at(self._normalize_timeout(timeout))
+        self.l2.set(key, raw, expires)
+        if not key.startswith(SHARED_ONLY_PREFIX):
+            self.l1.set(key, raw, self._l1_expires(expires))
+        return True
+
+    def add(self, key, value, timeout=None):
+        raw = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = _expires_at(self._normalize_timeout(timeout))
+        added = self.l2.set(key, raw, expires, only_if_missing=True)
+        if added and not key.startswith(SHARED_ONLY_PREFIX):
+            self.l1.set(key, raw, self._l1_expires(expires))
+        return added
+
+    def delete(self, key):
+        self.l1.delete(key)
+        return self.l2.delete(key)
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+        return True
@@ -0,0 +1,106 @@
+import functools
+import hashlib
+from uuid import uuid4
+from flask import current_app, g, request, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from app.extensions import cache
+from app.utils.cache_backends import SHARED_ONLY_PREFIX
+from app.utils.metrics import cache_result
+from app.utils.replicas import DEFAULT_MAX_LAG_SECONDS
+
+# Cached views are keyed on the current version of every tag they depend on.
+# A write bumps the version of the tags it touches, so older entries are never
+# read again and simply age out. Tags are bumped automatically from session
+# events, so routes don't have to remember to evict anything.
+
+# which tags a write to each table makes stale
+TABLE_TAGS = {
+    'customers': ('customers',),
+    'mechanics': ('mechanics',),
+    'service_tickets': ('tickets',),
+    'ticket_mechanic': ('tickets', 'mechanics'),
+    'inventory': ('inventory',),
+    'inventory_ticket': ('tickets', 'inventory'),
+}
+
+def _version_key(tag):
+    #versions must never be served from a worker-local tier
+    return f"{SHARED_ONLY_PREFIX}tag-version:{tag}"
+
+def tag_versions(tags):
+    keys = [_version_key(tag) for tag in tags]
+    versions = cache.get_many(*keys)
+    if None in versions:
+        #first use (or evicted): start a fresh version, add() keeps a concurrent one if it won
+        for key, version in zip(keys, versions):
+            if version is None:
+                cache.add(key, uuid4().hex, timeout=0)
+        versions = cache.get_many(*keys)
+    #still missing (a NullCache, or evicted at once): a version nothing was cached under
+    return [version or uuid4().hex for version in versions]
+
+def _settling_key(tag):
+    return f"{SHARED_ONLY_PREFIX}tag-settling:{tag}"
+
+def invalidate(*tags):
+    #random tokens instead of counters, so an evicted version can never come back to an old value
+    cache.set_many({_version_key(tag): uuid4().hex for tag in tags}, timeout=0)
+    if current_app.config.get('READ_REPLICA_URIS'):
+        #replicas may serve the old rows for a while yet: don't cache what they return meanwhile
+        lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', DEFAULT_MAX_LAG_SECONDS)
+        if lag:
+            cache.set_many({_settling_key(tag): 1 for tag in tags}, timeout=lag)
+
+def cached_view(*tags, timeout=None, **kwargs):
+    """cache.cached() keyed on the request path, query string and the versions of `tags`.
+
+    timeout=None uses CACHE_DEFAULT_TIMEOUT; entries can live for hours because any
+    commit that writes one of the tagged tables moves the key.
+    """
+    def make_cache_key(*args, **view_kwargs):
+        query = sorted(request.args.items(multi=True))
+        raw = f"{request.path}?{query}:{':'.join(tag_versions(tags))}"
+        g.view_cache_lookup = True
+        cache_result('hit') #until the view runs, below
+        return "view:" + hashlib.md5(raw.encode()).hexdigest()
+
+    def fresh(response):
+        #a replica read of a just-written tag may predate the write, see app/utils/replicas.py
+        return not (g.get('read_replica') and any(cache.get_many(*(_settling_key(tag) for tag in tags))))
+
+    def decorator(f):
+        @functools.wraps(f)
+        def render(*args, **view_kwargs):
+            if g.pop('view_cache_lookup', False): #not when `unless` skipped the cache
+                cache_result('miss')
+            return f(*args, **view_kwargs)
+        return cache.cached(timeout=timeout, make_cache_key=make_cache_key, response_filter=fresh, **kwargs)(render)
+    return decorator
+
+def _pending_tags(session):
+    return session.info.setdefault('cache_tags', set())
+
+@event.listens_for(Session, 'before_flush')
+def _collect_flushed(session, flush_context, instances):
+    for obj in session.new | session.dirty | session.deleted:
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            _pending_tags(session).update(TABLE_TAGS.get(table.name, ()))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_statement(orm_execute_state):
+    #insert()/update()/delete() run through session.execute, including association tables
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table
+        _pending_tags(orm_execute_state.session).update(TABLE_TAGS.get(table.name, ()))
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags and has_app_context():
+        invalidate(*tags)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('cache_tags', None)
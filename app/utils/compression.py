@@ -0,0 +1,158 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+from flask import Response, request, current_app
+
+try:
+    import brotli
+except ImportError: #optional, gzip only without it
+    brotli = None
+
+# Content-negotiated compression. Responses are gzip- (or, when the brotli package is
+# installed, br-) encoded after the view has run, if the client accepts it, the type
+# compresses well and the body is big enough: below COMPRESS_MIN_SIZE a body already
+# fits in one packet, so compressing it only costs CPU. Streamed responses (NDJSON,
+# exports) are compressed chunk by chunk, flushing after each so rows still arrive as
+# they are produced.
+#
+# Static files (the app's and Swagger UI's) are compressed once, at the highest level,
+# when the app starts, and served from memory to every client that accepts the encoding.
+
+DEFAULT_MIN_SIZE = 1400
+DEFAULT_LEVEL = 6 #gzip
+DEFAULT_BR_LEVEL = 4 #brotli, compresses better than gzip 6 and faster
+STATIC_LEVEL = 9
+STATIC_BR_LEVEL = 9 #11 takes seconds on the Swagger UI bundle, per worker
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/yaml',
+    'application/xml', 'image/svg+xml',
+}
+
+mimetypes.add_type('application/yaml', '.yaml')
+mimetypes.add_type('application/yaml', '.yml')
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def etag_variants(etag):
+    """A strong ETag and the tags its compressed bodies are sent with."""
+    return [etag, *(f"{etag}-{encoding}" for encoding in ENCODINGS)]
+
+def _compressible(mimetype):
+    return mimetype is not None and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES)
+
+def _accepted_encoding():
+    return request.accept_encodings.best_match(ENCODINGS)
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def _compress_stream(chunks, encoding, level):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31) #31: gzip container
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    try:
+        for chunk in chunks:
+            out = compress(chunk.encode() if isinstance(chunk, str) else chunk) + flush()
+            if out:
+                yield out
+        yield finish()
+    finally:
+        #stream_with_context pops its request context when the stream is closed
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def compress_response(response):
+    if not _compressible(response.mimetype) or request.method == 'HEAD' \
+            or response.status_code < 200 or response.status_code in (204, 206, 304) \
+            or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    config = current_app.config
+    if not response.is_streamed and response.calculate_content_length() < config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    if encoding is None:
+        return response
+    level = config.get('COMPRESS_BR_LEVEL', DEFAULT_BR_LEVEL) if encoding == 'br' else config.get('COMPRESS_LEVEL', DEFAULT_LEVEL)
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(_compress(response.get_data(), encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        #a strong tag names exact bytes, so each encoding gets its own
+        response.set_etag(f"{etag}-{encoding}")
+    return response
+
+# (file, mtime, size, encoding) -> (compressed body, digest of the original), shared by every app in the process
+_static_cache = {}
+
+def _static_entry(path, encoding):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, encoding)
+    entry = _static_cache.get(key)
+    if entry is None:
+        #also picks up a file edited while the server runs
+        with open(path, 'rb') as f:
+            data = f.read()
+        level = STATIC_BR_LEVEL if encoding == 'br' else STATIC_LEVEL
+        entry = _static_cache[key] = (_compress(data, encoding, level), hashlib.sha1(data).hexdigest())
+    return entry
+
+def _static_files(url_prefix, folder, min_size):
+    #url path -> file, for every file under `folder` worth compressing
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            if _compressible(mimetypes.guess_type(name)[0]) and os.path.getsize(path) >= min_size:
+                relative = os.path.relpath(path, folder).replace(os.sep, '/')
+                files[f"{url_prefix.rstrip('/')}/{relative}"] = path
+    return files
+
+def init_compression(app, static=()):
+    """Compress responses, and precompress the app's static folder plus any extra
+    (url prefix, folder) pairs in `static`. Call after registering blueprints."""
+    min_size = app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+    files = {}
+    for url_prefix, folder in [(app.static_url_path, app.static_folder), *static]:
+        if folder and os.path.isdir(folder):
+            files.update(_static_files(url_prefix, folder, min_size))
+    for path in files.values():
+        for encoding in ENCODINGS:
+            _static_entry(path, encoding)
+
+    @app.before_request
+    def serve_precompressed():
+        path = files.get(request.path)
+        if path is None or request.method not in ('GET', 'HEAD'):
+            return None
+        encoding = _accepted_encoding()
+        if encoding is None:
+            return None #the route serves the file as is
+        body, digest = _static_entry(path, encoding)
+        response = Response(body, mimetype=mimetypes.guess_type(path)[0])
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(f"{digest}-{encoding}")
+        response.last_modified = os.path.getmtime(path)
+        max_age = app.get_send_file_max_age(path)
+        if max_age is None:
+            response.cache_control.no_cache = True
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+        return response.make_conditional(request)
+
+    app.after_request(compress_response)
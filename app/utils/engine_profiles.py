@@ -0,0 +1,93 @@
+from sqlalchemy import event
+from app.utils.replicas import REPLICA_PREFIX, init_replicas
+
+# Database engine settings per environment, picked by DATABASE_PROFILE (or, when that is
+# unset, from the database URI). Pool options go to create_engine() through
+# SQLALCHEMY_ENGINE_OPTIONS; anything already set there wins. SQLite pragmas are per
+# connection, so they are run on every new pool connection from a connect event.
+#
+# For SQLite files shared by several workers:
+#   journal_mode=WAL      readers and the writer stop blocking each other
+#   synchronous=NORMAL    in WAL a commit appends to the log without an fsync; a power
+#                         cut can lose the last commits but never corrupts the file
+#   busy_timeout          a writer waits for the lock instead of failing at once with
+#                         "database is locked"
+#   mmap_size, cache_size reads come straight from the page cache
+#
+# row_version_etags: whether conditional GETs (app/utils/etags.py) may run. Row versions
+# are MAX(version) + 1 computed inside the writing transaction, which only gives each
+# write a distinct version that commits in order when writes are serialized, as they
+# are on SQLite. On a server database two concurrent writes can get the same version,
+# the table's tag misses one of them and a client could be sent a stale 304, so there
+# ETags are turned off and every GET gets a full response.
+
+MB = 1024 * 1024
+
+PROFILES = {
+    'dev': {
+        'engine_options': {},
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000},
+        'row_version_etags': True,
+    },
+    # throwaway databases: no durability, just speed and no lock errors from the threaded tests
+    'test': {
+        'engine_options': {},
+        'pragmas': {'journal_mode': 'MEMORY', 'synchronous': 'OFF', 'busy_timeout': 5000},
+        'row_version_etags': True,
+    },
+    'production-sqlite': {
+        'engine_options': {'pool_size': 10, 'max_overflow': 10, 'pool_timeout': 10},
+        'pragmas': {
+            'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 10000,
+            'mmap_size': 256 * MB, 'cache_size': -64 * 1024, #negative: KiB, so 64 MB
+            'temp_store': 'MEMORY',
+        },
+        'row_version_etags': True,
+    },
+    # Postgres and the like: check connections before use, since the server or a proxy
+    # may have dropped them, and replace them before server-side idle limits do
+    'production-server-db': {
+        'engine_options': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 10,
+                           'pool_pre_ping': True, 'pool_recycle': 1800},
+        'pragmas': {},
+        'row_version_etags': False,
+    },
+}
+
+def profile_for(uri):
+    return 'production-sqlite' if (uri or '').startswith('sqlite') else 'production-server-db'
+
+def set_pragmas(engine, pragmas):
+    """Run `pragmas` on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+#set by whoever writes the database; a read-only replica connection can't change them
+WRITER_PRAGMAS = ('journal_mode', 'synchronous')
+
+def init_db(app, db):
+    """db.init_app(app) with the engine profile of the active config, and its read replicas."""
+    name = app.config.get('DATABASE_PROFILE') or profile_for(app.config.get('SQLALCHEMY_DATABASE_URI'))
+    profile = PROFILES[name]
+    app.config['DATABASE_PROFILE'] = name
+    app.config['ROW_VERSION_ETAGS'] = profile['row_version_etags']
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**profile['engine_options'], **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    init_replicas(app)
+    db.init_app(app)
+    for key in list(db.metadatas):
+        if key and key.startswith(REPLICA_PREFIX):
+            #a replica's schema is the primary's: keep create_all()/drop_all() off it
+            del db.metadatas[key]
+    with app.app_context():
+        for key, engine in db.engines.items():
+            pragmas = profile['pragmas']
+            if key and key.startswith(REPLICA_PREFIX):
+                pragmas = {name: value for name, value in pragmas.items() if name not in WRITER_PRAGMAS}
+            set_pragmas(engine, pragmas)
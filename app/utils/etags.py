@@ -0,0 +1,68 @@
+import hashlib
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy import select, func
+from app.models import db
+from app.utils.streaming import wants_ndjson
+from app.utils.compression import etag_variants
+
+# Conditional GET. ETags come from row versions (see Versioned in app/models.py), so
+# checking one costs a single indexed query and no serialization: a poll that matches
+# gets 304 with no body, before the view or its cache are touched.
+#
+# A single row is tagged with its version. A collection is tagged with MAX(version) and
+# COUNT(*) of its table: every insert or update raises the max and every delete lowers
+# the count. ?expand= pulls in other tables, so their max and count join the tag. The
+# query string is part of every tag, since fields, expansions and pages differ in body.
+#
+# That is only sound where writes are serialized (SQLite): engine profiles for other
+# databases set ROW_VERSION_ETAGS = False and conditional() then steps aside.
+
+def _expanded_models(model):
+    relationships = db.inspect(model).relationships
+    names = request.args.get('expand', '').split(',')
+    #unknown names are the view's 400 to report
+    return [relationships[name].mapper.class_ for name in dict.fromkeys(n.strip() for n in names) if name in relationships]
+
+def _table_stamp(model):
+    return (select(func.max(model.version)).scalar_subquery(),
+            select(func.count()).select_from(model).scalar_subquery())
+
+def current_etag(model, id=None):
+    """The ETag a GET of this request's URL would carry now, or None for a missing row."""
+    columns = []
+    if id is not None:
+        columns.append(select(model.version).where(model.id == id).scalar_subquery())
+    models = _expanded_models(model) if id is not None else [model, *_expanded_models(model)]
+    for other in models:
+        columns.extend(_table_stamp(other))
+    stamp = tuple(db.session.execute(select(*columns)).one())
+    if id is not None and stamp[0] is None:
+        return None
+    query = sorted(request.args.items(multi=True))
+    return hashlib.md5(f"{request.path}?{query}:{stamp}".encode()).hexdigest()
+
+def conditional(model):
+    """Strong ETag on 200 responses and 304 for a matching If-None-Match.
+
+    Goes above cached_view. Routes with an id in the path are tagged per row, the rest
+    per collection. NDJSON streams, and databases without ROW_VERSION_ETAGS, are left alone.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            if wants_ndjson() or not current_app.config.get('ROW_VERSION_ETAGS', True):
+                return view(**kwargs)
+            etag = current_etag(model, next(iter(kwargs.values()), None))
+            #clients hold the tag of whichever encoding they were sent
+            matched = etag and next((tag for tag in etag_variants(etag) if request.if_none_match.contains(tag)), None)
+            if matched:
+                response = make_response('', 304)
+                response.set_etag(matched)
+                return response
+            response = make_response(view(**kwargs))
+            if etag is not None and response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
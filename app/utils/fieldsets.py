@@ -0,0 +1,88 @@
+from functools import lru_cache
+from flask import request
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only, joinedload, selectinload
+
+# Sparse reads. ?fields=a,b keeps only those top-level fields and ?expand=rel swaps a
+# relationship's ids for the related objects. Schemas list what can be expanded in an
+# `expansions` dict of field factories; the compact (usually id-only) field is what the
+# schema class itself declares.
+#
+# The SQL follows the schema that will dump the rows: every model is loaded with
+# load_only() on exactly the columns its schema dumps, and each relationship the schema
+# dumps gets an eager loader projected the same way, recursively. Anything a client
+# didn't ask for is never selected, let alone serialized.
+
+def _names(arg):
+    raw = request.args.get(arg)
+    if raw is None:
+        return None
+    return tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+
+@lru_cache(maxsize=None)
+def _variant(schema_class, expand):
+    #one subclass per set of expansions, kept out of marshmallow's class registry
+    if not expand:
+        return schema_class
+    attrs = {name: schema_class.expansions[name]() for name in expand}
+    attrs['Meta'] = type('Meta', (schema_class.Meta,), {'register': False})
+    return type(schema_class.__name__, (schema_class,), attrs)
+
+@lru_cache(maxsize=256)
+def _schemas(schema_class, only, expand):
+    variant = _variant(schema_class, expand)
+    return variant(only=only), variant(only=only, many=True)
+
+def requested_schemas(schema_class):
+    """(schema, many schema) for the ?fields= and ?expand= of this request.
+
+    Raises ValueError naming anything the schema doesn't have.
+    """
+    only = _names('fields')
+    expand = _names('expand') or ()
+    available = schema_class().fields
+    expansions = getattr(schema_class, 'expansions', {})
+    unknown = [name for name in only or () if name not in available] + [name for name in expand if name not in expansions]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if only is not None:
+        only = tuple(sorted(set(only) | set(expand))) #expanding a field also selects it
+    return _schemas(schema_class, only, frozenset(expand))
+
+def _columns(model, schema):
+    mapper = inspect(model)
+    names = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+    for name, field in schema.dump_fields.items():
+        attribute = field.attribute or name
+        if attribute in mapper.column_attrs and attribute not in names:
+            names.append(attribute)
+    return [getattr(model, name) for name in names]
+
+def column_projection(model, schema, always=()):
+    """load_only() on the columns `schema` dumps, plus `always` (e.g. keyset columns)."""
+    return (load_only(*_columns(model, schema), *always),)
+
+def relationship_loaders(model, schema):
+    """Eager loaders, projected to what is dumped, for every relationship `schema` nests."""
+    mapper = inspect(model)
+    loaders = []
+    for name, field in schema.dump_fields.items():
+        relationship = mapper.relationships.get(field.attribute or name)
+        if relationship is None or not isinstance(field, fields.Nested):
+            continue
+        target, nested = relationship.mapper.class_, field.schema
+        attribute = getattr(model, relationship.key)
+        #many-to-one rides along in the same SELECT, collections get one IN query each
+        loader = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+        loader = loader.load_only(*_columns(target, nested))
+        nested_loaders = relationship_loaders(target, nested)
+        loaders.append(loader.options(*nested_loaders) if nested_loaders else loader)
+    return tuple(loaders)
+
+def read_plan(model, schema_class, key_columns=()):
+    """Everything a read needs from ?fields=/?expand=: (schema, many schema, column
+    options, relationship loaders). Column options can go on any query; relationship
+    loaders are kept separate because a streamed (yield_per) query can't carry them."""
+    one, many = requested_schemas(schema_class)
+    return one, many, column_projection(model, many, key_columns), relationship_loaders(model, many)
@@ -0,0 +1,85 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+from app.utils.metrics import serializing
+
+try:
+    import orjson
+except ImportError: #optional: without it responses go through the stdlib encoder
+    orjson = None
+
+# Flask's provider with a faster encoder that must stay byte-for-byte compatible with it.
+# orjson is used for the two shapes Flask's response() asks for (compact, or indent=2 in
+# debug) and its output is checked for the few things it spells differently from the
+# json module: non-ASCII and DEL characters (escaped by ensure_ascii), floats near the
+# exponent cutoffs (1e-05 vs 0.00001, 1e+16 vs 1e16) and anything it can't encode (huge
+# ints, non-str keys). Those responses, and any call with other arguments, are encoded
+# by the json module instead.
+# orjson writes NaN/Infinity as null where the json module writes non-JSON NaN/Infinity;
+# our columns never hold either.
+
+# Floats the json module writes in exponent form (|x| < 1e-4 or >= 1e16) are the ones
+# orjson may spell differently. Looking for them with a regex costs more than orjson
+# saves, so the output is squeezed with bytes.translate instead: drop digits, '.', '-'
+# and whitespace, and fold the bytes that can precede a number into ':'. An exponent
+# then shows up as ":e" (or a leading "e"), and a small float as "0.0000" in the raw
+# output. A string that happens to contain either just takes the json module path.
+_SQUEEZE = bytes(ord(':') if c in b'[,' else ord('e') if c == ord('E') else c for c in range(256))
+_SQUEEZE_DROP = b'0123456789.- \n'
+
+def _float_format_differs(raw):
+    squeezed = raw.translate(_SQUEEZE, _SQUEEZE_DROP)
+    return b':e' in squeezed or squeezed.startswith(b'e') or b'0.0000' in raw
+
+class FastJSONProvider(DefaultJSONProvider):
+    def __init__(self, app):
+        super().__init__(app)
+        self._encoders = {}
+
+    def _orjson_option(self, kwargs):
+        #the orjson option matching these json.dumps arguments, or None
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return None
+        indent, separators = kwargs.get('indent'), kwargs.get('separators')
+        if indent is None and separators == (',', ':'):
+            option = 0
+        elif indent == 2 and separators in (None, (',', ': ')):
+            option = orjson.OPT_INDENT_2
+        else:
+            return None
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        #dates, dataclasses and str/int/dict/list subclasses go through Flask's default, like the json module
+        return option | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+
+    def dumps(self, obj, **kwargs):
+        with serializing(): #counted in the request's Server-Timing, see app/utils/metrics.py
+            return self._dumps(obj, **kwargs)
+
+    def _dumps(self, obj, **kwargs):
+        option = self._orjson_option(kwargs)
+        if option is not None:
+            try:
+                raw = orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                raw = None
+            if raw is not None and (not self.ensure_ascii or (raw.isascii() and b'\x7f' not in raw)) \
+                    and not _float_format_differs(raw):
+                return raw.decode()
+        return self._encoder(kwargs).encode(obj)
+
+    def _encoder(self, kwargs):
+        #json.dumps builds a new JSONEncoder per call; keep one per argument set instead
+        key = tuple(sorted((name, value if not isinstance(value, list) else tuple(value)) for name, value in kwargs.items()))
+        try:
+            encoder = self._encoders.get(key)
+        except TypeError: #unhashable argument, e.g. a custom default
+            encoder, key = None, None
+        if encoder is None:
+            kwargs.setdefault("default", self.default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            kwargs.setdefault("sort_keys", self.sort_keys)
+            cls = kwargs.pop('cls', None) or json.JSONEncoder
+            encoder = cls(**kwargs)
+            if key is not None:
+                self._encoders[key] = encoder
+        return encoder
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import time
+from limits.storage import Storage
+from app.utils.cache_backends import connect_shared, instance_file
+
+# Rate limit counters shared by every worker on the host, in a SQLite file (WAL, no
+# fsync per commit, see connect_shared). Select it with
+# RATELIMIT_STORAGE_URI = 'sqlite:////path/to/limits.sqlite', or 'sqlite:///limits.sqlite'
+# for a file in the instance folder (see instance_storage_uri).
+#
+# A hit is one upsert that resets an expired window, adds to a live one and returns
+# the new count, so concurrent workers can't lose increments and a check is a single
+# statement with no transaction around it. Only fixed-window limits are supported,
+# which is Flask-Limiter's default strategy.
+
+PURGE_EVERY = 1000 #hits per process between sweeps of expired windows
+
+def instance_storage_uri(app):
+    """Point a relative sqlite:/// RATELIMIT_STORAGE_URI at the instance folder. Call before limiter.init_app."""
+    uri = app.config.get('RATELIMIT_STORAGE_URI') or ''
+    if uri.startswith('sqlite:///'):
+        app.config['RATELIMIT_STORAGE_URI'] = 'sqlite:///' + instance_file(app, uri[len('sqlite:///'):])
+
+class SQLiteStorage(Storage):
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        #sqlite:////abs/path or sqlite:///relative/path, as SQLAlchemy spells them
+        self.path = uri.split('://', 1)[1][1:]
+        self._local = threading.local()
+        self._hits = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        #one connection per thread, reopened after a fork so workers never share one
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect_shared(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        conn = self._connection()
+        value = conn.execute("""
+            INSERT INTO rate_limits (key, value, expires) VALUES (:key, :amount, :expires)
+            ON CONFLICT (key) DO UPDATE SET
+                value = CASE WHEN expires <= :now THEN excluded.value ELSE value + excluded.value END,
+                expires = CASE WHEN expires <= :now THEN excluded.expires ELSE expires END
+            RETURNING value
+        """, {'key': key, 'amount': amount, 'expires': now + expiry, 'now': now}).fetchone()[0]
+        self._hits += 1
+        if self._hits % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM rate_limits WHERE expires <= ?", (now,))
+        return value
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value FROM rate_limits WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connection().execute("SELECT expires FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key):
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
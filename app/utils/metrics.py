@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.utils.cache_backends import connect_shared, instance_file
+
+# Where a request's time goes. Every request gets a Server-Timing header:
+#   Server-Timing: total;dur=12.4, db;dur=5.1;desc="3 queries", serialize;dur=2.2, cache;desc=miss
+#   total      before_request to after_request, so the work before the first byte
+#   db         time in cursor.execute for this request's statements, any engine
+#   serialize  dump() and JSON encoding, minus any SQL run by lazy loads meanwhile
+#   cache      hit or miss of a cached view, absent when the view isn't cached
+# and is counted in Prometheus histograms and counters per endpoint, served by GET /metrics.
+# Those are recorded when the request is torn down, so a streamed response counts
+# until its last chunk.
+#
+# Recording is a few dict updates under a lock per request. Each worker keeps its own
+# counts; with METRICS_SQLITE_PATH set, they are added to a SQLite file shared by every
+# worker on the host (at most every METRICS_FLUSH_SECONDS, and before /metrics reads it),
+# so any worker answers /metrics for all of them.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) #seconds, Prometheus' defaults
+DEFAULT_FLUSH_SECONDS = 5
+
+FAMILIES = {
+    'http_requests_total': ('counter', "Requests served, by endpoint, method and status."),
+    'http_request_duration_seconds': ('histogram', "Time from the start of a request until its response is fully sent."),
+    'http_request_db_seconds': ('histogram', "Time a request spent executing SQL."),
+    'http_request_db_statements_total': ('counter', "SQL statements executed by requests."),
+    'http_request_serialize_seconds_total': ('counter', "Time requests spent dumping and JSON-encoding responses."),
+    'http_cache_requests_total': ('counter', "Cached views served from the cache (hit) or rendered (miss)."),
+}
+
+
+class Metrics:
+    """Counters keyed by (name, labels), shared through a SQLite file when `path` is set."""
+
+    def __init__(self, path=None, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.counts = defaultdict(float) #everything so far, or what isn't in the shared file yet
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._next_flush = time.monotonic() + flush_seconds
+        if path:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS metrics (name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, "
+                "PRIMARY KEY (name, labels)) WITHOUT ROWID"
+            )
+
+    def _connection(self):
+        #reopened after a fork so workers never share one
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = connect_shared(self.path)
+            self._pid = os.getpid()
+        return self._conn
+
+    def add(self, updates):
+        """Apply [(name, labels, amount), ...] at once."""
+        with self._lock:
+            for name, labels, amount in updates:
+                self.counts[name, labels] += amount
+        if self.path and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._next_flush = time.monotonic() + self.flush_seconds
+            if not self.counts:
+                return
+            rows = [(name, labels, value) for (name, labels), value in self.counts.items()]
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) "
+                                 "ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value", rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.counts.clear()
+
+    def snapshot(self):
+        if not self.path:
+            with self._lock:
+                return dict(self.counts)
+        self.flush()
+        with self._lock:
+            return {(name, labels): value for name, labels, value in self._connection().execute("SELECT name, labels, value FROM metrics")}
+
+    def render(self):
+        """The Prometheus text exposition format."""
+        values = self.snapshot()
+        by_family = defaultdict(list)
+        for (name, labels), value in values.items():
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+                    family = name[:-len(suffix)]
+            by_family[family].append((name, labels, value))
+        lines = []
+        for family in sorted(by_family):
+            kind, text = FAMILIES.get(family, ('untyped', ''))
+            lines += [f"# HELP {family} {text}", f"# TYPE {family} {kind}"]
+            #buckets in le order, each series' _sum and _count after its buckets
+            for name, labels, value in sorted(by_family[family], key=lambda row: (_series(row[1]), row[0] != f'{family}_bucket', row[0], _le(row[1]))):
+                lines.append(f"{name}{{{labels}}} {int(value) if value.is_integer() else repr(value)}")
+        return "\n".join(lines) + "\n"
+
+def _label_value(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def labels(**values):
+    return ','.join(f'{name}="{_label_value(value)}"' for name, value in values.items())
+
+def _series(text):
+    return ','.join(part for part in text.split(',') if not part.startswith('le='))
+
+def _le(text):
+    for part in text.split(','):
+        if part.startswith('le='):
+            value = part[4:-1]
+            return float('inf') if value == '+Inf' else float(value)
+    return 0.0
+
+def histogram(name, series, value):
+    updates = [(f'{name}_bucket', f'{series},le="{bound:g}"', 1) for bound in BUCKETS if value <= bound]
+    updates += [(f'{name}_bucket', f'{series},le="+Inf"', 1), (f'{name}_sum', series, value), (f'{name}_count', series, 1)]
+    return updates
+
+# per-request timing
+
+def _timing():
+    return g.get('request_timing') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+    timing = _timing()
+    if timing is not None:
+        timing['db'] += elapsed
+        timing['statements'] += 1
+
+@event.listens_for(Engine, 'handle_error')
+def _statement_failed(context):
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+@contextmanager
+def serializing():
+    """Count the time inside as serialization for the current request."""
+    timing = _timing()
+    if timing is None:
+        yield
+        return
+    started, db = time.perf_counter(), timing['db']
+    try:
+        yield
+    finally:
+        timing['serialize'] += time.perf_counter() - started - (timing['db'] - db)
+
+def cache_result(result):
+    timing = _timing()
+    if timing is not None:
+        timing['cache'] = result
+
+def server_timing(timing, total):
+    parts = [f"total;dur={total * 1000:.1f}",
+             f'db;dur={timing["db"] * 1000:.1f};desc="{timing["statements"]} queries"',
+             f"serialize;dur={timing['serialize'] * 1000:.1f}"]
+    if timing['cache']:
+        parts.append(f"cache;desc={timing['cache']}")
+    return ', '.join(parts)
+
+def init_metrics(app):
+    """Time every request and serve /metrics. Call before other before_request hooks are added."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    path = app.config.get('METRICS_SQLITE_PATH') #relative to the instance folder
+    metrics = app.extensions['metrics'] = Metrics(path and instance_file(app, path),
+                                                  app.config.get('METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+
+    @app.before_request
+    def start_timing():
+        g.request_timing = {'start': time.perf_counter(), 'db': 0.0, 'statements': 0, 'serialize': 0.0,
+                            'cache': None, 'status': 500}
+
+    @app.after_request
+    def add_server_timing(response):
+        timing = g.get('request_timing')
+        if timing is not None:
+            timing['status'] = response.status_code
+            response.headers['Server-Timing'] = server_timing(timing, time.perf_counter() - timing['start'])
+        return response
+
+    @app.teardown_request
+    def record(exc):
+        timing = g.pop('request_timing', None)
+        if timing is None:
+            return
+        endpoint = request.endpoint or 'unmatched' #unrouted paths share one series
+        series = labels(endpoint=endpoint, method=request.method)
+        updates = [('http_requests_total', labels(endpoint=endpoint, method=request.method, status=timing['status']), 1),
+                   ('http_request_db_statements_total', series, timing['statements']),
+                   ('http_request_serialize_seconds_total', series, timing['serialize'])]
+        updates += histogram('http_request_duration_seconds', series, time.perf_counter() - timing['start'])
+        updates += histogram('http_request_db_seconds', series, timing['db'])
+        if timing['cache']:
+            updates.append(('http_cache_requests_total', labels(endpoint=endpoint, result=timing['cache']), 1))
+        metrics.add(updates)
+
+    @app.route('/metrics', endpoint='metrics')
+    def prometheus_metrics():
+        return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8',
+                        headers={'Cache-Control': 'no-store'})
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import date
+from flask import request, current_app
+from sqlalchemy import select, func, and_, or_
+from app.models import db
+from app.utils.serializers import dump
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(values):
+    #opaque to clients: base64 of the sort key of the last row on the page
+    raw = json.dumps([v.isoformat() if isinstance(v, date) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, key_columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list) or len(values) != len(key_columns):
+        raise ValueError("Invalid cursor.")
+
+    decoded = []
+    for column, value in zip(key_columns, values):
+        python_type = column.type.python_type
+        if python_type is date:
+            decoded.append(date.fromisoformat(value))
+        elif python_type is int and isinstance(value, int) and not isinstance(value, bool):
+            decoded.append(value)
+        else:
+            raise ValueError("Invalid cursor.")
+    return decoded
+
+def _after(key_columns, values, descending):
+    #row-value comparison (a, b) > (x, y) spelled out so it works on every backend
+    conditions = []
+    for i, column in enumerate(key_columns):
+        compare = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*[key_columns[j] == values[j] for j in range(i)], compare))
+    return or_(*conditions)
+
+def keyset_order(query, key_columns, cursor=None, descending=False):
+    #order `query` by the key and start it right after `cursor`, if given
+    if cursor:
+        query = query.where(_after(key_columns, decode_cursor(cursor, key_columns), descending))
+    return query.order_by(*[column.desc() if descending else column.asc() for column in key_columns])
+
+def page_args():
+    default = current_app.config.get('DEFAULT_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    limit = int(request.args.get('limit', default))
+    if limit < 1:
+        raise ValueError("limit must be positive.")
+    return min(limit, maximum), request.args.get('cursor')
+
+def keyset_paginate(query, key_columns, schema, descending=False, options=()):
+    """Run one page of `query` ordered by `key_columns` and return the response body.
+
+    Pages are addressed by an opaque cursor holding the sort key of the last row seen,
+    so every page is an index range scan instead of an OFFSET. Loader `options` are only
+    applied to the page query, not the optional count. Raises ValueError on bad
+    limit/cursor arguments.
+    """
+    limit, cursor = page_args()
+
+    page_query = keyset_order(query.options(*options), key_columns, cursor, descending)
+    #fetch one extra row to know whether there is a next page without a COUNT
+    rows = db.session.execute(page_query.limit(limit + 1)).scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in key_columns])
+
+    body = {"items": dump(schema, rows), "next_cursor": next_cursor}
+    if request.args.get('count', '').lower() in ('1', 'true', 'yes'):
+        #the total is opt-in since it costs a full scan
+        body["count"] = db.session.execute(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        ).scalar_one()
+    return body
@@ -0,0 +1,110 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+
+# Passwords are stored as "scrypt$<log2 n>$<r>$<p>$<salt>$<hash>". scrypt is memory-hard
+# (128 * r * n bytes per call) and its cost is set per deployment, so the work factor can
+# go up later: a hash made with other parameters is redone on the next successful login.
+# Rows that still hold a plaintext password are treated the same way.
+#
+# A hash takes tens of milliseconds of CPU. hashlib.scrypt releases the GIL, so it runs
+# on a small shared pool: a worker's other threads keep serving while a login hashes,
+# at most PASSWORD_HASH_WORKERS hashes run at once per process, and past
+# PASSWORD_HASH_MAX_PENDING queued logins new ones are turned away instead of piling up.
+
+PREFIX = 'scrypt'
+DEFAULT_LOG2_N = 14 #16 MB and roughly 50 ms per hash with r=8
+DEFAULT_R = 8
+DEFAULT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_MAX_PENDING = 64
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes are already queued; the caller should answer 503."""
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _setting(name, default):
+    return current_app.config.get(name, default) if has_app_context() else default
+
+def _cost():
+    return (_setting('PASSWORD_SCRYPT_LOG2_N', DEFAULT_LOG2_N),
+            _setting('PASSWORD_SCRYPT_R', DEFAULT_R),
+            _setting('PASSWORD_SCRYPT_P', DEFAULT_P))
+
+def _scrypt(password, salt, log2_n, r, p):
+    n = 1 << log2_n
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * r * n * p, dklen=HASH_BYTES)
+
+def _hash(password, cost):
+    salt = os.urandom(SALT_BYTES)
+    log2_n, r, p = cost
+    return f"{PREFIX}${log2_n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, log2_n, r, p))}"
+
+def _verify(stored, password, cost):
+    #returns (matches, needs_rehash)
+    parts = stored.split('$')
+    if len(parts) != 6 or parts[0] != PREFIX:
+        #legacy plaintext row
+        return hmac.compare_digest(stored.encode(), password.encode()), True
+    log2_n, r, p = (int(part) for part in parts[1:4])
+    expected = _unb64(parts[5])
+    matches = hmac.compare_digest(_scrypt(password, _unb64(parts[4]), log2_n, r, p), expected)
+    return matches, (log2_n, r, p) != cost
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None
+
+def _run(fn, *args):
+    global _executor, _pending
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _pending = threading.BoundedSemaphore(_setting('PASSWORD_HASH_MAX_PENDING', DEFAULT_MAX_PENDING))
+                _executor = ThreadPoolExecutor(max_workers=_setting('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+                                               thread_name_prefix='password-hash')
+    if not _pending.acquire(blocking=False):
+        raise PasswordHasherBusy()
+    try:
+        return _executor.submit(fn, *args).result()
+    finally:
+        _pending.release()
+
+def hash_password(password):
+    return _run(_hash, password, _cost())
+
+def verify_password(stored, password):
+    """Check `password` against a stored value. Returns (matches, needs_rehash).
+
+    A stored value that looks like a hash but can't be parsed never matches.
+    """
+    try:
+        return _run(_verify, stored, password, _cost())
+    except ValueError as e: #bad numbers or base64, or scrypt parameters it refuses
+        if has_app_context():
+            current_app.logger.error("unreadable password hash %r...: %s", stored[:20], e)
+        return False, False
+
+# hashed once, on first use, with the cost in force then
+_dummy_hash = None
+
+def burn_verify(password):
+    """Spend what a real verify would, so unknown emails can't be told apart by timing."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password('not a real password')
+    verify_password(_dummy_hash, password)
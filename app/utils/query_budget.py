@@ -0,0 +1,110 @@
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Query budgets: how many SQL statements a route may run, whatever the size of the data.
+#
+#   @customers_bp.route('/my-tickets', methods=['GET'])
+#   @query_budget(4)
+#   def get_my_tickets(user_id): ...
+#
+# Every request's statements are collected and, when it returns, checked against the
+# budget of its view (statements from the view, its decorators and the hooks around it;
+# a streamed body's later queries are not included). Undeclared routes are only checked
+# for the N+1 signature: the same statement, differing only in its parameters, run more
+# than `repeats` times - one lazy load per row. The limit on statements alone catches a
+# loop only once the test data is bigger than the budget; repeats catch it at 3 rows.
+#
+# QUERY_BUDGET_MODE decides what an overrun does: 'raise' (the tests, so any request
+# in any test that overruns fails it), 'log' (development, and staging via the
+# environment) or unset to not collect anything. count_queries() does the same counting
+# around any block of code.
+
+DEFAULT_REPEATS = 2
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*,)*\s*(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)\s*\)")
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+def normalize(statement):
+    """The statement with IN lists folded, so only parameter values tell two runs apart."""
+    return ' '.join(_IN_LIST.sub('(?)', statement).split())
+
+class QueryLog:
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def repeated(self, limit=DEFAULT_REPEATS):
+        """{statement: times} for statements run more than `limit` times."""
+        return {statement: times for statement, times in Counter(map(normalize, self.statements)).items() if times > limit}
+
+    def problems(self, budget=None, repeats=DEFAULT_REPEATS):
+        found = []
+        if budget is not None and len(self) > budget:
+            found.append(f"{len(self)} statements, budget {budget}")
+        for statement, times in (self.repeated(repeats) if repeats is not None else {}).items():
+            found.append(f"{times} runs of {statement[:200]}")
+        return found
+
+_active = threading.local()
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements this thread runs inside the block into a QueryLog."""
+    log = QueryLog()
+    stack = _active.__dict__.setdefault('logs', [])
+    stack.append(log)
+    try:
+        yield log
+    finally:
+        stack.remove(log)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record(conn, cursor, statement, parameters, context, executemany):
+    for log in getattr(_active, 'logs', ()):
+        log.statements.append(statement)
+    if has_request_context():
+        log = g.get('query_log')
+        if log is not None:
+            log.statements.append(statement)
+
+def query_budget(statements, repeats=DEFAULT_REPEATS):
+    """Declare a route's statement budget. Goes right under the route() decorator.
+
+    None for either turns that check off, for routes whose work is meant to grow in batches.
+    """
+    def decorator(f):
+        f.query_budget = (statements, repeats)
+        return f
+    return decorator
+
+def budget_of(view):
+    return getattr(view, 'query_budget', (None, DEFAULT_REPEATS))
+
+def init_query_budget(app):
+    if not app.config.get('QUERY_BUDGET_MODE'):
+        return
+
+    @app.before_request
+    def start_query_log():
+        g.query_log = QueryLog()
+
+    @app.after_request
+    def check_query_budget(response):
+        log = g.pop('query_log', None)
+        if log is None or request.endpoint not in current_app.view_functions:
+            return response
+        problems = log.problems(*budget_of(current_app.view_functions[request.endpoint]))
+        if problems:
+            message = f"{request.method} {request.path} ({request.endpoint}) over its query budget: {'; '.join(problems)}"
+            if current_app.config['QUERY_BUDGET_MODE'] == 'raise':
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
@@ -0,0 +1,131 @@
+import click
+import random
+import sqlite3
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+# Read replicas. Each URI in READ_REPLICA_URIS becomes a bind named replica_<n>, and
+# RoutingSession sends the reads of GET and HEAD requests to one of them. The primary
+# gets everything else:
+#   - flushes and insert/update/delete statements, and every later statement of a
+#     session that has written (it must see its own writes)
+#   - all statements of other requests, and of code running outside a request
+#   - reads from a client that wrote less than REPLICA_MAX_LAG_SECONDS ago, so a GET
+#     right after a PUT isn't answered by a replica that hasn't caught up (a cookie)
+# A replica that can't be connected to is skipped for REPLICA_RETRY_SECONDS; with no
+# replica left, reads go to the primary. Reads served on the ASGI event loop use the
+# async engine their request carries instead (see app/asgi.py). Cached views don't store replica reads of
+# tables written in the last REPLICA_MAX_LAG_SECONDS either (see cached_view).
+#
+# Locally, replicas can be SQLite files opened read-only
+# ('sqlite:///file:replica.db?mode=ro&uri=true'). sync_sqlite_replicas() copies the
+# primary over them, after every commit when SQLITE_REPLICA_SYNC is set.
+
+REPLICA_PREFIX = 'replica_'
+STICKY_COOKIE = 'read_primary_until'
+DEFAULT_MAX_LAG_SECONDS = 5
+DEFAULT_RETRY_SECONDS = 30
+EVENT_LOOP_ENGINE = 'mechanic_shop.event_loop_engine' #WSGI environ key
+
+_down_until = {} #replica bind key -> when to try it again
+
+def _replica_keys(engines):
+    return [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+
+def _reads_may_use_replica():
+    if not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return False
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) < time.time()
+    except ValueError:
+        return True
+
+def _pick_replica(engines):
+    keys = _replica_keys(engines)
+    random.shuffle(keys)
+    for key in keys:
+        if _down_until.get(key, 0) > time.time():
+            continue
+        try:
+            #a pool checkout: the session's own connect right after reuses this connection
+            with engines[key].connect():
+                pass
+            return engines[key]
+        except DBAPIError as e:
+            _down_until[key] = time.time() + current_app.config.get('REPLICA_RETRY_SECONDS', DEFAULT_RETRY_SECONDS)
+            current_app.logger.warning("replica %s unavailable, reading from the primary: %s", key, e)
+    return None
+
+
+class RoutingSession(Session):
+    """db.session: reads of GET/HEAD requests from a replica, the rest from the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and EVENT_LOOP_ENGINE in request.environ:
+            return request.environ[EVENT_LOOP_ENGINE]
+        if bind is None:
+            if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+                self.info['wrote'] = True
+                if has_request_context():
+                    g.wrote_primary = True
+            elif not self.info.get('wrote') and _reads_may_use_replica():
+                if 'replica' not in self.info:
+                    #one replica per session, so a request reads one consistent copy
+                    self.info['replica'] = _pick_replica(self._db.engines)
+                if self.info['replica'] is not None:
+                    g.read_replica = True
+                    return self.info['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def sync_sqlite_replicas(db):
+    """Copy the primary SQLite database over every SQLite replica (local setups only)."""
+    primary = db.engines[None]
+    if primary.dialect.name != 'sqlite':
+        return
+    for key in _replica_keys(db.engines):
+        replica = db.engines[key]
+        if replica.dialect.name != 'sqlite':
+            continue
+        path = replica.url.database
+        if replica.url.query.get('uri'):
+            path = path[len('file:'):]
+        source = primary.raw_connection()
+        try:
+            target = sqlite3.connect(path)
+            try:
+                source.driver_connection.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _sync_after_commit(session):
+    if session.info.get('wrote') and current_app and current_app.config.get('SQLITE_REPLICA_SYNC'):
+        sync_sqlite_replicas(session._db)
+
+@click.command('sync-replicas')
+def sync_replicas_command():
+    """Copy the primary database over the SQLite read replicas."""
+    db = current_app.extensions['sqlalchemy']
+    sync_sqlite_replicas(db)
+    for key in _replica_keys(db.engines):
+        click.echo(f"{key}: {db.engines[key].url.render_as_string(hide_password=True)}")
+
+def init_replicas(app):
+    """Add a bind per READ_REPLICA_URIS entry (before db.init_app) and the read-your-writes cookie."""
+    replicas = {f'{REPLICA_PREFIX}{i}': uri for i, uri in enumerate(app.config.get('READ_REPLICA_URIS') or ())}
+    if not replicas:
+        return
+    app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), **replicas}
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('wrote_primary'):
+            seconds = app.config.get('REPLICA_MAX_LAG_SECONDS', DEFAULT_MAX_LAG_SECONDS)
+            response.set_cookie(STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,74 @@
+import re
+from sqlalchemy import DDL, event, select, text
+from app.models import db, Inventory
+
+# Part name search. On SQLite the names are indexed by an FTS5 table that mirrors
+# `inventory` through triggers, so every write path (ORM, bulk insert/update, raw SQL)
+# keeps it in sync. The table is created and dropped with `inventory`, and migration 4
+# builds it for existing databases. Other backends fall back to a case-insensitive
+# substring match per word (LIKE '%term%'): it finds every word prefix FTS would, plus
+# matches inside words, and can't use an index, so it scans the table.
+
+FTS_TABLE = 'inventory_fts'
+SEARCH_CANDIDATES = 1000
+
+# prefix='2 3' adds index entries for 2- and 3-character prefixes, so the short
+# queries typed while someone is still typing don't scan the whole term list
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, content='inventory', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, name) VALUES (new.id, new.name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    #only renames touch the index, stock and price updates don't
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name ON inventory BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE} (rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+FTS_DROP = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+for statement in FTS_DDL:
+    event.listen(Inventory.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in FTS_DROP:
+    event.listen(Inventory.__table__, 'before_drop', DDL(statement).execute_if(dialect='sqlite'))
+
+def create_search_index(conn):
+    #for databases whose inventory table predates the index: create it and index existing rows
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"))
+
+def _terms(q):
+    #words only, so user input can never be read as FTS5 query syntax
+    return re.findall(r"\w+", q.lower())
+
+def search_parts(q, limit, candidates=SEARCH_CANDIDATES):
+    """Parts whose name has a word starting with each word of `q`, best match first."""
+    terms = _terms(q)
+    if not terms:
+        return []
+    if db.session.get_bind().dialect.name == 'sqlite':
+        # bm25 is computed per match, and a short prefix can match most of the catalog, so
+        # only the first `candidates` matches are ranked. Broad queries trade a little
+        # relevance for staying in single-digit milliseconds; narrower ones rank every match.
+        query = select(Inventory).from_statement(text(
+            f"SELECT inventory.* FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match LIMIT :candidates) AS hits "
+            "JOIN inventory ON inventory.id = hits.rowid ORDER BY hits.rank, hits.rowid LIMIT :limit"
+        ))
+        match = ' '.join(f'"{term}"*' for term in terms)
+        params = {'match': match, 'candidates': max(candidates, limit), 'limit': limit}
+        return db.session.execute(query, params).scalars().all()
+
+    query = select(Inventory)
+    for term in terms:
+        query = query.where(Inventory.name.icontains(term, autoescape=True))
+    return db.session.execute(query.order_by(Inventory.name, Inventory.id).limit(limit)).scalars().all()
@@ -0,0 +1,97 @@
+import datetime
+from weakref import WeakKeyDictionary
+from flask import current_app, has_app_context
+from marshmallow import Schema, fields, missing
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+from app.utils.metrics import serializing
+
+# Schema.dump walks every field of every row through several layers of generic code
+# (accessor lookup, missing checks, per-field _serialize). For the flat auto schemas we
+# serve lists with, compile_schema() generates one plain function per schema that reads
+# the attributes and builds the dict directly, falling back to the field's own
+# _serialize for any value that isn't already the output type. The result is the same
+# dict, with the same key order, as schema.dump().
+
+# field class -> python type its _serialize would return unchanged
+_PASSTHROUGH = {
+    fields.Integer: int,
+    fields.Float: float,
+    fields.String: str,
+    fields.Boolean: bool,
+}
+_ISO_FORMATS = (None, 'iso', 'iso8601')
+
+_compiled = WeakKeyDictionary()
+
+def _value_expression(field, var, env, index):
+    #an expression turning `var` into what field.serialize() would return
+    env[f'_f{index}'] = field
+    slow = f"_f{index}._serialize({var}, None, obj)"
+    field_type = type(field)
+    if field_type in _PASSTHROUGH and not getattr(field, 'as_string', False):
+        env[f'_t{index}'] = _PASSTHROUGH[field_type]
+        return f"({var} if {var}.__class__ is _t{index} or {var} is None else {slow})"
+    if field_type is fields.Date and field.format in _ISO_FORMATS:
+        return f"({var}.isoformat() if {var}.__class__ is _date else {slow} if {var} is not None else None)"
+    if field_type in (fields.Nested, fields.Pluck):
+        nested = compile_schema(field.schema)
+        if nested is None:
+            return slow
+        env[f'_n{index}'] = nested
+        #Pluck dumps the nested object, then keeps one of its keys
+        pick = f"[{field._field_data_key!r}]" if field_type is fields.Pluck else ""
+        many = field.schema.many or field.many
+        dump = f"[_n{index}(item){pick} for item in {var}]" if many else f"_n{index}({var}){pick}"
+        return f"(None if {var} is None else {dump})"
+    return None
+
+def compile_schema(schema):
+    """Return a function dumping one object like schema.dump(obj, many=False) would, or
+    None when the schema uses something compiled code doesn't reproduce (hooks, custom
+    accessors, dotted attributes, fields other than the plain ones above)."""
+    if schema in _compiled:
+        return _compiled[schema]
+
+    function = None
+    plain_schema = (
+        not schema._hooks[PRE_DUMP] and not schema._hooks[POST_DUMP]
+        and type(schema).get_attribute is Schema.get_attribute
+        and schema.dict_class is dict
+    )
+    if plain_schema:
+        env = {'_date': datetime.date}
+        reads, items = [], []
+        for index, (name, field) in enumerate(schema.dump_fields.items()):
+            attribute = field.attribute or name
+            expression = _value_expression(field, f'v{index}', env, index)
+            if expression is None or not attribute.isidentifier() or field.dump_default is not missing:
+                break
+            reads.append(f"    v{index} = obj.{attribute}")
+            key = field.data_key if field.data_key is not None else name
+            items.append(f"{key!r}: {expression}")
+        else:
+            source = "def dump_one(obj):\n" + "\n".join(reads) + "\n    return {" + ", ".join(items) + "}\n"
+            exec(compile(source, f"<compiled {type(schema).__name__}>", "exec"), env)
+            function = env['dump_one']
+
+    _compiled[schema] = function
+    return function
+
+def dump(schema, obj, many=None):
+    """schema.dump(obj), through the compiled serializer when possible.
+
+    Set FAST_SERIALIZER = False to always use marshmallow.
+    """
+    with serializing():
+        return _dump(schema, obj, many)
+
+def _dump(schema, obj, many):
+    many = schema.many if many is None else many
+    enabled = current_app.config.get('FAST_SERIALIZER', True) if has_app_context() else True
+    dump_one = compile_schema(schema) if enabled else None
+    if dump_one is None or obj is None:
+        return schema.dump(obj, many=many)
+    if not many:
+        return schema.dump(obj, many=False) if isinstance(obj, dict) else dump_one(obj)
+    #compiled code reads attributes, dicts go through marshmallow
+    return [schema.dump(item, many=False) if isinstance(item, dict) else dump_one(item) for item in obj]
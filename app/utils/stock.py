@@ -0,0 +1,56 @@
+from sqlalchemy import func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Inventory, ServiceTicket, inventory_ticket, bump_versions
+
+# Stock only ever moves through single UPDATE ... SET stock = stock +/- n statements,
+# never a read in Python followed by a write, so concurrent requests on any number of
+# workers can't lose each other's updates. The database row lock taken by the UPDATE
+# is the only serialization, and only between requests touching the same part.
+#
+# A part with a NULL stock isn't tracked: it can be used without limit and stays NULL
+# until its stock is set (PUT /inventory/<id>) or it is restocked, which counts from 0.
+
+def consume_part(ticket_id, part_id, quantity):
+    """Take `quantity` units of a part off the shelf and record them on a ticket.
+
+    Returns (stock left, quantity now on the ticket), or None when the part doesn't
+    have enough stock, in which case nothing is changed. Stock left is None for an
+    untracked part. Doesn't commit.
+    """
+    row = db.session.execute(
+        update(Inventory)
+        .where(Inventory.id == part_id, or_(Inventory.stock.is_(None), Inventory.stock >= quantity)) #the guard and the decrement are one statement
+        .values(stock=Inventory.stock - quantity) #NULL stays NULL
+        .returning(Inventory.stock)
+    ).one_or_none()
+    if row is None:
+        return None
+    return row.stock, _add_to_ticket(ticket_id, part_id, quantity)
+
+def _add_to_ticket(ticket_id, part_id, quantity):
+    used = _increment_used(ticket_id, part_id, quantity)
+    if used is not None:
+        return used
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(inventory_ticket).values(inventory_id=part_id, ticket_id=ticket_id, quantity=quantity))
+        db.session.execute(bump_versions(ServiceTicket, [ticket_id]).execution_options(synchronize_session=False)) #the ticket now lists the part
+        return quantity
+    except IntegrityError:
+        #another request added the same part to this ticket first
+        return _increment_used(ticket_id, part_id, quantity)
+
+def _increment_used(ticket_id, part_id, quantity):
+    return db.session.execute(
+        update(inventory_ticket)
+        .where(inventory_ticket.c.inventory_id == part_id, inventory_ticket.c.ticket_id == ticket_id)
+        .values(quantity=inventory_ticket.c.quantity + quantity)
+        .returning(inventory_ticket.c.quantity)
+    ).scalar_one_or_none()
+
+def restock(part_id, quantity):
+    """Put `quantity` units of a part on the shelf. Returns the new stock, or None for an unknown part. Doesn't commit."""
+    return db.session.execute(
+        update(Inventory).where(Inventory.id == part_id)
+        .values(stock=func.coalesce(Inventory.stock, 0) + quantity).returning(Inventory.stock)
+    ).scalar_one_or_none()
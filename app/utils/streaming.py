@@ -0,0 +1,51 @@
+from flask import Response, request, current_app, stream_with_context
+from sqlalchemy import select, inspect
+from app.models import db
+from app.utils.pagination import keyset_order
+from app.utils.serializers import dump
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+DEFAULT_STREAM_CHUNK_SIZE = 500
+
+def wants_ndjson():
+    #only stream when the client prefers NDJSON over plain JSON (*/* still gets JSON)
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def ndjson_lines(rows):
+    dumps = current_app.json.dumps
+    return ''.join(dumps(row) + '\n' for row in rows)
+
+def stream_collection(query, key_columns, schema, descending=False, options=(),
+                      encode=ndjson_lines, mimetype=NDJSON_MIMETYPE, prefix='', headers=None):
+    """Stream every row of `query`, NDJSON (one object per line) unless `encode` says otherwise.
+
+    Rows are fetched with yield_per and dumped one chunk at a time, so memory is
+    bounded by STREAM_CHUNK_SIZE rather than the size of the table. `encode` turns a
+    chunk of dumped rows into text and `prefix` is sent before the first chunk.
+    Honors the same ?cursor= as the paginated response; ?limit= is optional here
+    and uncapped. Raises ValueError on bad arguments before any byte is sent.
+    """
+    chunk_size = current_app.config.get('STREAM_CHUNK_SIZE', DEFAULT_STREAM_CHUNK_SIZE)
+    query = keyset_order(query, key_columns, request.args.get('cursor'), descending)
+    if 'limit' in request.args:
+        limit = int(request.args['limit'])
+        if limit < 1:
+            raise ValueError("limit must be positive.")
+        query = query.limit(limit)
+    query = query.execution_options(yield_per=chunk_size)
+    entity = query.column_descriptions[0]['entity']
+    primary_key = inspect(entity).primary_key[0]
+    def generate():
+        if prefix:
+            yield prefix
+        result = db.session.execute(query).scalars()
+        for chunk in result.partitions():
+            if options:
+                #selectin loaders can't ride on a yield_per result, so eager load each chunk
+                #by primary key instead; the identity map hands back the same objects
+                ids = [getattr(row, primary_key.key) for row in chunk]
+                db.session.execute(select(entity).where(primary_key.in_(ids)).options(*options)).scalars().all()
+            yield encode(dump(schema, chunk))
+
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers=headers)
@@ -3,7 +3,9 @@ from jose import jwt
 import jose
 from functools import wraps
 from flask import request, jsonify
+import hashlib
 import os
+from app.utils.cache_backends import LRUCache
 
 SECRET_KEY = "a super secret, secret key"
 SECRET_KEY = os.environ.get('SECRET_KEY') or "super secret secrets"
@@ -18,25 +20,53 @@ def encode_token(user_id): #using unique pieces of info to make our tokens user
     token = jwt.encode(payload, SECRET_KEY, algorithm='HS256')
     return token
 
+# tokens that already passed verification, so a session's repeat requests skip the
+# HMAC check and claim parsing. Keyed by a digest (the cache never holds a usable token),
+# and each entry expires with the token's own exp claim.
+TOKEN_CACHE_MAX_ENTRIES = 4096
+_verified_tokens = LRUCache(max_entries=TOKEN_CACHE_MAX_ENTRIES)
+_token_stats = {'hits': 0, 'misses': 0, 'rejections': 0}
+
+def token_cache_stats():
+    return dict(_token_stats, size=len(_verified_tokens))
+
+def verify_token(token):
+    """Return the user id of a valid token; raises jose's JWTError subclasses otherwise."""
+    key = hashlib.sha256(token.encode()).digest()
+    user_id = _verified_tokens.get(key)
+    if user_id is not None:
+        _token_stats['hits'] += 1
+        return user_id
+    _token_stats['misses'] += 1
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+        user_id = data['sub']  # Fetch the user ID
+        expires = data.get('exp')
+        if not isinstance(expires, (int, float)):
+            #jose only checks exp when present; ours always carry one, and the cache needs it
+            raise jose.exceptions.JWTClaimsError("Missing exp claim")
+    except (jose.exceptions.JWTError, KeyError):
+        _token_stats['rejections'] += 1
+        raise
+    _verified_tokens.set(key, user_id, expires)
+    return user_id
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
         # Look for the token in the Authorization header
         if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
+            # "Bearer <token>"; a header without the scheme used to raise an IndexError
+            token = request.headers['Authorization'].partition(" ")[2].strip()
         
             if not token:
                 return jsonify({'message': 'Token is missing!'}), 400
 
             try:
-                # Decode the token
-                data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-                user_id = data['sub']  # Fetch the user ID
-                
+                user_id = verify_token(token)
             except jose.exceptions.ExpiredSignatureError:
                 return jsonify({'message': 'Token has expired!'}), 400
-            except jose.exceptions.JWTError:
+            except (jose.exceptions.JWTError, KeyError):
                 return jsonify({'message': 'Invalid token!'}), 400
 
             #return f(user_id, *args, **kwargs)
@@ -44,4 +74,4 @@ def token_required(f):
         else: 
             return jsonify({'message': 'You must be logged in to access this!'}), 400
 
-    return decorated
\ No newline at end of file
+    return decorated
@@ -0,0 +1,7 @@
+from app.asgi import create_asgi_app
+from app.models import db
+
+# uvicorn asgi_app:app --workers 4
+app = create_asgi_app('production')
+with app.flask_app.app_context():
+    db.create_all()
@@ -0,0 +1,116 @@
+"""Reads served by the WSGI app (gunicorn threads) and the ASGI app (one event loop), side by side.
+
+    python -m benchmarks.asgi_vs_wsgi [--tickets 50000] [--clients 32] [--reporters 4] [--threads 8] [--seconds 10] [--db-latency-ms 0]
+
+Both servers run one worker process on the same file seeded by benchmarks.seed, with
+the view cache off so every request reaches the database. --clients connections keep fetching single
+customers (a tablet opening a record) while --reporters connections keep running a
+ticket report: a count over every ticket and a page of fully expanded tickets. WSGI
+serves them on --threads threads, so a few reports can hold most of them; asgi_app.py
+serves the reads on its event loop, with each database call awaiting on aiosqlite.
+
+A local SQLite query is CPU work, not waiting, so there is little for the event loop
+to overlap. --db-latency-ms adds a wait before every statement, like the round trip to
+a database server: a sleep on a WSGI thread, an await on the event loop.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import tempfile
+import time
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+from app.models import db
+from benchmarks.routes import bench_app, start_server
+from benchmarks.seed import seed
+
+REPORT_PATH = '/tickets/?count=true&limit=100&expand=customer,mechanics,parts'
+
+def _latency():
+    return float(os.environ.get('BENCH_DB_LATENCY_MS', 0)) / 1000
+
+def wsgi_app():
+    app = bench_app()
+    if _latency():
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: time.sleep(_latency()))
+    return app
+
+def asgi_app():
+    from app.asgi import AsyncApp
+    app = AsyncApp(bench_app())
+    if _latency():
+        event.listen(app.engine.sync_engine, 'before_cursor_execute', lambda *args: await_only(asyncio.sleep(_latency())))
+    return app
+
+async def _connection(port, next_path, stop_at, latencies):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        writer.write(f"GET {next_path()} HTTP/1.1\r\nHost: bench\r\nAccept-Encoding: identity\r\n\r\n".encode())
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        if not head.startswith(b"HTTP/1.1 200"):
+            raise RuntimeError(head.decode(errors='replace'))
+        await reader.readexactly(int(re.search(rb"(?i)content-length: *(\d+)", head).group(1)))
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+
+async def load(port, customers, clients, reporters, seconds):
+    rng = random.Random(1)
+    lookups, reports = [], []
+    stop_at = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(_connection(port, lambda: f'/customers/{rng.randint(1, customers)}', stop_at, lookups) for _ in range(clients)),
+        *(_connection(port, lambda: REPORT_PATH, stop_at, reports) for _ in range(reporters)),
+    )
+    return lookups, reports
+
+def _summary(latencies, seconds):
+    latencies = sorted(latencies)
+    if not latencies:
+        return f"{0:>8} {'-':>8} {'-':>8}"
+    return (f"{len(latencies) / seconds:>8.0f} {latencies[len(latencies) // 2] * 1000:>8.1f} "
+            f"{latencies[int(len(latencies) * 0.99)] * 1000:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=50000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--reporters', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads for WSGI')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--db-latency-ms', type=float, default=0, help='simulated round trip per statement')
+    parser.add_argument('--modes', nargs='+', default=['wsgi', 'asgi'])
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        customers = seed(f'sqlite:///{path}', args.tickets)['customers']
+        print(f"{args.tickets} tickets; {args.clients} lookup + {args.reporters} report connections for {args.seconds:g}s; "
+              f"WSGI on {args.threads} threads; {args.db_latency_ms:g} ms per statement")
+        print(f"{'':>5} {'lookups/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'reports/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for mode in args.modes:
+            env = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'BENCH_DB_LATENCY_MS': str(args.db_latency_ms)}
+            if mode == 'wsgi':
+                server, port = start_server('gunicorn', 'benchmarks.asgi_vs_wsgi:wsgi_app()', env, threads=args.threads)
+            else:
+                server, port = start_server('uvicorn', 'benchmarks.asgi_vs_wsgi:asgi_app', env)
+            try:
+                asyncio.run(load(port, customers, 2, 1, 1)) #warm up pools and imports
+                lookups, reports = asyncio.run(load(port, customers, args.clients, args.reporters, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{mode:>5}  {_summary(lookups, args.seconds)}  {_summary(reports, args.seconds)}")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == '__main__':
+    main()
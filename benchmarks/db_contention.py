@@ -0,0 +1,116 @@
+"""Write throughput of several worker processes sharing one SQLite file, per engine profile.
+
+    python -m benchmarks.db_contention [--writers 4] [--readers 2] [--transactions 300] [--profiles baseline dev production-sqlite] [--dir .]
+
+Each writer process commits small transactions like the app's (take a part out of
+stock, open a ticket) while reader processes page through tickets, all on one fresh
+database file per profile. "baseline" is create_engine() with no options or pragmas,
+which is what the app ran on before engine profiles. Put --dir on the disk the
+database will live on: fsync cost is most of the difference.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from multiprocessing import Event, Pool
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+from app.models import db, Customer, Inventory, ServiceTicket
+from app.utils.engine_profiles import PROFILES, set_pragmas
+
+PARTS = 100
+
+def _engine(url, profile):
+    if profile == 'baseline':
+        return create_engine(url)
+    engine = create_engine(url, **PROFILES[profile]['engine_options'])
+    set_pragmas(engine, PROFILES[profile]['pragmas'])
+    return engine
+
+def _write(args):
+    url, profile, transactions, seed = args
+    engine = _engine(url, profile)
+    rng = random.Random(seed)
+    latencies, locked = [], 0
+    for _ in range(transactions):
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(update(Inventory).where(Inventory.id == rng.randint(1, PARTS)).values(stock=Inventory.stock - 1))
+                conn.execute(insert(ServiceTicket).values(VIN='BENCH', service_date=date.today(), service_desc='bench', customer_id=1))
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+        latencies.append(time.perf_counter() - started)
+    engine.dispose()
+    return latencies, locked
+
+_stop = None
+
+def _init_reader(stop):
+    global _stop
+    _stop = stop
+
+def _read(args):
+    url, profile = args
+    engine = _engine(url, profile)
+    reads = 0
+    while not _stop.is_set():
+        with engine.connect() as conn:
+            conn.execute(select(ServiceTicket).order_by(ServiceTicket.id.desc()).limit(50)).all()
+            conn.execute(select(func.count()).select_from(ServiceTicket)).scalar()
+        reads += 1
+    engine.dispose()
+    return reads
+
+def run(profile, writers, readers, transactions, directory):
+    handle, path = tempfile.mkstemp(suffix='.db', dir=directory)
+    os.close(handle)
+    url = f'sqlite:///{path}'
+    try:
+        engine = _engine(url, profile)
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Customer).values(name='Bench', email='bench@example.com', phone='1', password='x'))
+            conn.execute(insert(Inventory), [{'name': f'Part {i}', 'price': 1.0, 'stock': 10 ** 6} for i in range(PARTS)])
+        engine.dispose()
+
+        stop = Event()
+        with Pool(max(readers, 1), initializer=_init_reader, initargs=(stop,)) as reader_pool, Pool(writers) as writer_pool:
+            reading = reader_pool.map_async(_read, [(url, profile)] * readers)
+            started = time.perf_counter()
+            results = writer_pool.map(_write, [(url, profile, transactions, seed) for seed in range(writers)])
+            elapsed = time.perf_counter() - started
+            stop.set()
+            reads = sum(reading.get())
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    latencies = sorted(latency for worker, _ in results for latency in worker)
+    locked = sum(count for _, count in results)
+    committed = len(latencies) - locked
+    return committed / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000, locked, reads / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--transactions', type=int, default=300, help='per writer')
+    parser.add_argument('--profiles', nargs='+', default=['baseline', 'dev', 'production-sqlite'])
+    parser.add_argument('--dir', default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.transactions} transactions, {args.readers} readers, in {args.dir}")
+    print(f"{'profile':>18} {'commits/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'locked':>7} {'reads/s':>8}")
+    for profile in args.profiles:
+        rate, p50, p99, locked, reads = run(profile, args.writers, args.readers, args.transactions, args.dir)
+        print(f"{profile:>18} {rate:>10.0f} {p50:>8.2f} {p99:>8.2f} {locked:>7} {reads:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
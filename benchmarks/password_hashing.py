@@ -0,0 +1,65 @@
+"""Logins per second at each scrypt cost.
+
+    python -m benchmarks.password_hashing [--logins 200] [--threads 8] [--costs 12 13 14 15]
+
+Runs real POST /customers/login requests through the app (test client, scratch
+SQLite database) from several threads at once, so the numbers include the bounded
+hashing pool. Pick the largest cost whose rate covers the morning rush.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+import config
+from app.models import db, Customer
+
+
+def run(log2_n, logins, threads, path):
+    config.TestingConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+    from app import create_app
+    from app.utils import passwords
+    app = create_app('testing')
+    app.config.update(PASSWORD_SCRYPT_LOG2_N=log2_n, RATELIMIT_ENABLED=False)
+    passwords._executor = None #fresh pool per run
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Customer(name='Bench', email='bench@example.com', phone='1', password=passwords.hash_password('pw')))
+        db.session.commit()
+
+    def login(_):
+        res = app.test_client().post('/customers/login', json={'email': 'bench@example.com', 'password': 'pw'})
+        assert res.status_code == 200, res.status_code
+
+    login(0)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    with app.app_context():
+        db.drop_all()
+    return logins / elapsed, elapsed / logins * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--costs', type=int, nargs='+', default=[12, 13, 14, 15])
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        print(f"{'log2 n':>6} {'memory':>8} {'logins/s':>9} {'ms/login':>9}")
+        for log2_n in args.costs:
+            rate, latency = run(log2_n, args.logins, args.threads, path)
+            memory = 128 * 8 * (1 << log2_n) // (1024 * 1024)
+            print(f"{log2_n:>6} {memory:>6}MB {rate:>9.1f} {latency:>9.2f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
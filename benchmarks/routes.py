@@ -0,0 +1,484 @@
+"""Latency percentiles, throughput and peak RSS of every route on seeded data, saved as JSON.
+
+    python -m benchmarks.routes [--tickets 100000] [--driver client http] [--requests 200] [--concurrency 16]
+                                [--server gunicorn|uvicorn] [--workers 1] [--threads 8] [--cache off|on]
+                                [--only tickets. ...] [--db seeded.db] [--out results.json] [--compare old.json]
+
+Seeds a database with benchmarks.seed (or copies --db), then runs every scenario below
+through each driver:
+    client  the Flask test client in this process, one request at a time: the app's own
+            cost per request, without a server or sockets
+    http    a real server (gunicorn, or uvicorn with asgi_app.py) in another process and
+            --concurrency keep-alive connections sending at once
+Each driver gets its own copy of the seeded file, since write scenarios change it. A
+scenario's requests are built before the clock starts, with a fixed random seed.
+
+For each scenario this reports p50/p95/p99 latency, requests per second, non-2xx
+responses and the peak RSS of the serving process(es) while it ran. --out saves it all
+as JSON; --compare reads an earlier file and flags scenarios whose p95 grew or whose
+throughput fell by more than --threshold, exiting with status 1 if any did.
+
+The view cache is off by default, so repeated reads measure queries and serialization
+rather than cache hits; rate limits are always off.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from uuid import uuid4
+from sqlalchemy import create_engine, insert, update
+from app.models import Customer, Inventory, Mechanic
+from app.utils.util import encode_token
+from benchmarks.seed import FIRST_DAY, JOBS, PART_WORDS, PASSWORD, counts, seed
+
+IGNORED_ENDPOINTS = ('static', 'swagger_ui.show', 'swagger_ui.static')
+
+def bench_app():
+    """create_app('production') on $SQLALCHEMY_DATABASE_URI, rate limits off, the cache off unless BENCH_CACHE=on."""
+    from config import ProductionConfig
+    from app import create_app
+    ProductionConfig.SQLALCHEMY_DATABASE_URI = os.environ['SQLALCHEMY_DATABASE_URI']
+    ProductionConfig.RATELIMIT_ENABLED = False
+    ProductionConfig.RATELIMIT_STORAGE_URI = 'memory://'
+    if os.environ.get('BENCH_CACHE') == 'on':
+        ProductionConfig.CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH', ProductionConfig.CACHE_SQLITE_PATH)
+    else:
+        ProductionConfig.CACHE_TYPE = 'NullCache'
+    return create_app('production')
+
+def wsgi_app():
+    return bench_app()
+
+def asgi_app():
+    from app.asgi import AsyncApp
+    return AsyncApp(bench_app())
+
+# scenarios
+
+def _spares(model, row):
+    #rows for a delete scenario to use up, one per request
+    def prepare(conn, needed):
+        token = uuid4().hex[:8]
+        return conn.execute(insert(model).returning(model.id), [row(f'{token}-{i}') for i in range(needed)]).scalars().all()
+    return prepare
+
+def _refill_stock(conn, needed):
+    #add_part takes stock; keep every part well supplied so no request is refused
+    conn.execute(update(Inventory).values(stock=Inventory.stock + needed))
+
+def _csv(rng, state):
+    rows = [f"import part {rng.randrange(10 ** 6)},{rng.randrange(199, 9999) / 100},{rng.randrange(100)}" for _ in range(500)]
+    return ('name,price,stock\n' + '\n'.join(rows)).encode()
+
+def scenarios(scale):
+    customers, mechanics, parts, tickets = (scale[k] for k in ('customers', 'mechanics', 'parts', 'tickets'))
+    unique = count()
+
+    def customer(rng):
+        return rng.randint(1, customers)
+
+    def ticket_payload(rng):
+        return {'VIN': f'BENCH{rng.randrange(10 ** 12):012d}', 'service_date': str(FIRST_DAY + timedelta(days=rng.randrange(1000))),
+                'service_desc': rng.choice(JOBS), 'customer_id': customer(rng),
+                'mechanic_ids': rng.sample(range(1, mechanics + 1), 2)}
+
+    def scenario(name, endpoint, method, path, body=None, auth=None, headers=None, prepare=None, max_requests=None):
+        return {'name': name, 'endpoint': endpoint, 'method': method, 'path': path, 'body': body, 'auth': auth,
+                'headers': headers or {}, 'prepare': prepare, 'max_requests': max_requests}
+
+    return [
+        scenario('POST /customers/', 'customers.create_customer', 'POST', lambda rng, state: '/customers/',
+                 lambda rng, state: {'name': 'Bench Customer', 'email': f'bench{next(unique)}-{uuid4().hex[:8]}@example.com',
+                                     'phone': '5550000000', 'password': PASSWORD}),
+        scenario('POST /customers/login', 'customers.login', 'POST', lambda rng, state: '/customers/login',
+                 lambda rng, state: {'email': f'customer{customer(rng) - 1}@example.com', 'password': PASSWORD}),
+        scenario('GET /customers/', 'customers.get_customers', 'GET', lambda rng, state: '/customers/?limit=50'),
+        scenario('GET /customers/<id>', 'customers.get_customer', 'GET', lambda rng, state: f'/customers/{customer(rng)}'),
+        scenario('PUT /customers/<id>', 'customers.update_customer', 'PUT', lambda rng, state: f'/customers/{state.setdefault("id", customer(rng))}',
+                 lambda rng, state: {'phone': f'555{rng.randrange(10 ** 7):07d}'}, auth=lambda rng, state: state['id']),
+        scenario('DELETE /customers/<id>', 'customers.delete_customer', 'DELETE',
+                 lambda rng, state: f'/customers/{state.setdefault("id", state["spares"].pop())}', auth=lambda rng, state: state['id'],
+                 prepare=_spares(Customer, lambda key: {'name': 'Spare', 'email': f'spare-{key}@example.com', 'phone': '5550000000', 'password': 'x'})),
+        scenario('GET /customers/my-tickets', 'customers.get_my_tickets', 'GET', lambda rng, state: '/customers/my-tickets',
+                 auth=lambda rng, state: customer(rng)),
+        scenario('GET /customers/my-tickets?expand', 'customers.get_my_tickets', 'GET',
+                 lambda rng, state: '/customers/my-tickets?expand=mechanics,parts', auth=lambda rng, state: customer(rng)),
+
+        scenario('POST /mechanics/', 'mechanics.create_mechanic', 'POST', lambda rng, state: '/mechanics/',
+                 lambda rng, state: {'name': 'Bench Mechanic', 'email': f'bench{next(unique)}-{uuid4().hex[:8]}@example.com',
+                                     'phone': '5560000000', 'salary': 50000.0}),
+        scenario('GET /mechanics/', 'mechanics.get_mechanics', 'GET', lambda rng, state: '/mechanics/?limit=50'),
+        scenario('GET /mechanics/<id>', 'mechanics.get_mechanic', 'GET', lambda rng, state: f'/mechanics/{rng.randint(1, mechanics)}'),
+        scenario('PUT /mechanics/<id>', 'mechanics.update_mechanic', 'PUT', lambda rng, state: f'/mechanics/{rng.randint(1, mechanics)}',
+                 lambda rng, state: {'salary': float(rng.randrange(40000, 90000))}),
+        scenario('DELETE /mechanics/<id>', 'mechanics.delete_mechanic', 'DELETE', lambda rng, state: f'/mechanics/{state["spares"].pop()}',
+                 prepare=_spares(Mechanic, lambda key: {'name': 'Spare', 'email': f'spare-{key}@example.com', 'phone': '5560000000', 'salary': 1.0})),
+        scenario('GET /mechanics/most_worked', 'mechanics.mechanics_by_ticket_count', 'GET', lambda rng, state: '/mechanics/most_worked?limit=5'),
+        scenario('GET /mechanics/most_worked?dates', 'mechanics.mechanics_by_ticket_count', 'GET',
+                 lambda rng, state: '/mechanics/most_worked?start_date=2024-01-01&end_date=2024-12-31'),
+
+        scenario('POST /tickets/', 'tickets.create_ticket', 'POST', lambda rng, state: '/tickets/', lambda rng, state: ticket_payload(rng)),
+        scenario('POST /tickets/bulk', 'tickets.create_tickets_bulk', 'POST', lambda rng, state: '/tickets/bulk',
+                 lambda rng, state: [ticket_payload(rng) for _ in range(50)]),
+        scenario('GET /tickets/', 'tickets.get_tickets', 'GET', lambda rng, state: '/tickets/?limit=50'),
+        scenario('GET /tickets/?count', 'tickets.get_tickets', 'GET', lambda rng, state: '/tickets/?limit=50&count=true'),
+        scenario('GET /tickets/?expand', 'tickets.get_tickets', 'GET', lambda rng, state: '/tickets/?limit=100&expand=customer,mechanics,parts'),
+        scenario('GET /tickets/ ndjson', 'tickets.get_tickets', 'GET', lambda rng, state: '/tickets/',
+                 headers={'Accept': 'application/x-ndjson'}, max_requests=5),
+        scenario('GET /tickets/<id>', 'tickets.get_ticket', 'GET', lambda rng, state: f'/tickets/{rng.randint(1, tickets)}?expand=customer,mechanics,parts'),
+        scenario('PUT /tickets/<id>', 'tickets.update_ticket', 'PUT', lambda rng, state: f'/tickets/{rng.randint(1, tickets)}',
+                 lambda rng, state: {'service_desc': rng.choice(JOBS)}),
+        scenario('PUT /tickets/<id>/edit', 'tickets.update_ticket_mechanics', 'PUT', lambda rng, state: f'/tickets/{rng.randint(1, tickets)}/edit',
+                 lambda rng, state: dict(zip(('add_ids', 'remove_ids'), ([m] for m in rng.sample(range(1, mechanics + 1), 2))))),
+        scenario('PUT /tickets/edit', 'tickets.update_tickets_mechanics', 'PUT', lambda rng, state: '/tickets/edit',
+                 lambda rng, state: {'ticket_ids': rng.sample(range(1, tickets + 1), 100),
+                                     **dict(zip(('add_ids', 'remove_ids'), ([m] for m in rng.sample(range(1, mechanics + 1), 2))))}),
+        scenario('PUT /tickets/<id>/add_part', 'tickets.add_part_to_ticket', 'PUT', lambda rng, state: f'/tickets/{rng.randint(1, tickets)}/add_part',
+                 lambda rng, state: {'part_id': rng.randint(1, parts), 'quantity': 1}, prepare=_refill_stock),
+
+        scenario('POST /inventory/', 'inventory_bp.create_part', 'POST', lambda rng, state: '/inventory/',
+                 lambda rng, state: {'name': f'bench part {next(unique)}-{uuid4().hex[:8]}', 'price': 9.99}),
+        scenario('GET /inventory/', 'inventory_bp.get_parts', 'GET', lambda rng, state: '/inventory/?limit=50'),
+        scenario('GET /inventory/search', 'inventory_bp.search_inventory', 'GET', lambda rng, state: f'/inventory/search?q={rng.choice(PART_WORDS)[:3]}'),
+        scenario('GET /inventory/<id>', 'inventory_bp.get_part', 'GET', lambda rng, state: f'/inventory/{rng.randint(1, parts)}'),
+        scenario('PUT /inventory/<id>', 'inventory_bp.update_part', 'PUT', lambda rng, state: f'/inventory/{rng.randint(1, parts)}',
+                 lambda rng, state: {'price': rng.randrange(199, 9999) / 100}),
+        scenario('DELETE /inventory/<id>', 'inventory_bp.delete_part', 'DELETE', lambda rng, state: f'/inventory/{state["spares"].pop()}',
+                 prepare=_spares(Inventory, lambda key: {'name': f'spare {key}', 'price': 1.0, 'stock': 0})),
+        scenario('POST /inventory/<id>/restock', 'inventory_bp.restock_part', 'POST', lambda rng, state: f'/inventory/{rng.randint(1, parts)}/restock',
+                 lambda rng, state: {'quantity': 5}),
+        scenario('GET /inventory/export', 'inventory_bp.export_parts', 'GET', lambda rng, state: '/inventory/export', max_requests=20),
+        scenario('GET /inventory/export ndjson', 'inventory_bp.export_parts', 'GET', lambda rng, state: '/inventory/export?format=ndjson', max_requests=20),
+        scenario('POST /inventory/import', 'inventory_bp.import_parts', 'POST', lambda rng, state: '/inventory/import', _csv,
+                 headers={'Content-Type': 'text/csv'}, max_requests=20),
+
+        scenario('GET /metrics', 'metrics', 'GET', lambda rng, state: '/metrics'),
+    ]
+
+def uncovered(app, all_scenarios):
+    covered = {s['endpoint'] for s in all_scenarios}
+    return sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                  if rule.endpoint not in covered and rule.endpoint not in IGNORED_ENDPOINTS)
+
+def build_requests(s, n, spares, seed_value):
+    """(method, path, headers, body) for n requests of scenario s."""
+    rng = random.Random(f"{seed_value}:{s['name']}")
+    requests = []
+    for _ in range(n):
+        state = {'spares': spares}
+        path = s['path'](rng, state)
+        headers = dict(s['headers'])
+        body = b''
+        if s['body'] is not None:
+            body = s['body'](rng, state)
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+                headers.setdefault('Content-Type', 'application/json')
+        if s['auth'] is not None:
+            headers['Authorization'] = f"Bearer {encode_token(s['auth'](rng, state))}"
+        requests.append((s['method'], path, headers, body))
+    return requests
+
+# measurements
+
+def _percentile(ordered, p):
+    #nearest rank
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def _rss(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def _tree(pid):
+    pids = [pid]
+    for pid in pids:
+        try:
+            for task in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{task}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+class PeakRSS:
+    """Samples the summed RSS of a process and its children every few ms (Linux /proc)."""
+
+    def __init__(self, pid, interval=0.005):
+        self.pid, self.interval, self.peak = pid, interval, 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, sum(_rss(pid) for pid in _tree(self.pid)))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def summarize(latencies, statuses, elapsed, peak_rss):
+    ordered = sorted(latencies)
+    errors = [status for status in statuses if not 200 <= status < 300]
+    return {
+        'requests': len(ordered),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'throughput': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(_percentile(ordered, 50) * 1000, 2),
+        'p95_ms': round(_percentile(ordered, 95) * 1000, 2),
+        'p99_ms': round(_percentile(ordered, 99) * 1000, 2),
+        'peak_rss_mb': round(peak_rss / 2 ** 20, 1) if peak_rss else None,
+    }
+
+# drivers
+
+def run_client(s, requests, warmup):
+    client = _client_app.test_client()
+    def send(method, path, headers, body):
+        response = client.open(path, method=method, headers=headers, data=body)
+        response.get_data()
+        response.close()
+        return response.status_code
+    for request in requests[:warmup]:
+        send(*request)
+    latencies, statuses = [], []
+    with PeakRSS(os.getpid()) as rss:
+        started = time.perf_counter()
+        for request in requests[warmup:]:
+            sent = time.perf_counter()
+            statuses.append(send(*request))
+            latencies.append(time.perf_counter() - sent)
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, statuses, elapsed, rss.peak)
+
+_client_app = None
+
+async def _exchange(connection, method, path, headers, body):
+    reader, writer = connection
+    head = [f"{method} {path} HTTP/1.1", "Host: bench", "Accept-Encoding: identity", f"Content-Length: {len(body)}"]
+    head += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    lines = (await reader.readuntil(b"\r\n\r\n")).decode('latin-1').split("\r\n")
+    status = int(lines[0].split()[1])
+    response_headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in lines[1:] if line)}
+    if method == 'HEAD' or status in (204, 304):
+        pass
+    elif 'content-length' in response_headers:
+        await reader.readexactly(int(response_headers['content-length']))
+    elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+        while (size := int((await reader.readline()).split(b';')[0], 16)):
+            await reader.readexactly(size + 2)
+        while (await reader.readline()) not in (b'\r\n', b''): #trailers
+            pass
+    else:
+        await reader.read() #body runs to the end of the connection
+        return status, False
+    return status, response_headers.get('connection', '').lower() != 'close'
+
+async def _http_worker(port, queue, latencies, statuses):
+    connection = None
+    while queue:
+        request = queue.pop()
+        if connection is None:
+            connection = await asyncio.open_connection('127.0.0.1', port)
+        sent = time.perf_counter()
+        status, keep_alive = await _exchange(connection, *request)
+        if latencies is not None:
+            latencies.append(time.perf_counter() - sent)
+            statuses.append(status)
+        if not keep_alive:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+async def _http_load(port, requests, concurrency, latencies=None, statuses=None):
+    queue = list(reversed(requests))
+    await asyncio.gather(*(_http_worker(port, queue, latencies, statuses) for _ in range(min(concurrency, len(requests)))))
+
+def run_http(s, requests, warmup, server, port, concurrency):
+    asyncio.run(_http_load(port, requests[:warmup], concurrency))
+    latencies, statuses = [], []
+    with PeakRSS(server.pid) as rss:
+        started = time.perf_counter()
+        asyncio.run(_http_load(port, requests[warmup:], concurrency, latencies, statuses))
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, statuses, elapsed, rss.peak)
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(kind, target, env, workers=1, threads=8):
+    """Start gunicorn (target 'module:factory()') or uvicorn (target 'module:factory') and wait for its port."""
+    port = _free_port()
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning',
+                   '--bind', f'127.0.0.1:{port}', target]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', '--factory', target, '--workers', str(workers),
+                   '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    server = subprocess.Popen(command, env={**os.environ, **env}, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{kind} exited with status {server.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, port
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{kind} did not start")
+
+# reports
+
+def compare(previous, current, threshold):
+    """Print what changed against an earlier results file; returns the regressed scenarios."""
+    regressions = []
+    print(f"\nagainst {previous['meta'].get('commit') or 'previous run'} ({previous['meta'].get('date')}):")
+    for driver, results in current['results'].items():
+        for name, now in results.items():
+            before = previous['results'].get(driver, {}).get(name)
+            if not before:
+                continue
+            p95 = now['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+            rate = now['throughput'] / before['throughput'] - 1 if before['throughput'] else 0
+            worse = p95 > threshold or rate < -threshold
+            if worse:
+                regressions.append((driver, name))
+            print(f"  {'REGRESSED' if worse else '':>9} {driver:>6} {name:<36} p95 {p95:+7.1%}  req/s {rate:+7.1%}")
+    return regressions
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help='an already seeded SQLite file to copy instead of seeding')
+    parser.add_argument('--driver', nargs='+', choices=['client', 'http'], default=['client', 'http'])
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=16, help='connections for the http driver')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--cache', choices=['off', 'on'], default='off')
+    parser.add_argument('--only', nargs='+', help='scenarios whose name or endpoint starts with one of these')
+    parser.add_argument('--out', help='write the results as JSON')
+    parser.add_argument('--compare', help='an earlier --out file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative p95 or throughput change counted as a regression')
+    args = parser.parse_args()
+
+    global _client_app
+    directory = tempfile.mkdtemp(prefix='bench-routes-')
+    template = os.path.join(directory, 'seeded.db')
+    try:
+        if args.db:
+            shutil.copy(args.db, template)
+            engine = create_engine(f'sqlite:///{template}')
+            with engine.connect() as conn:
+                scale = {table: conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+                         for table in ('customers', 'mechanics', 'inventory', 'service_tickets')}
+            engine.dispose()
+            scale = counts(scale['service_tickets'], scale['customers'], scale['mechanics'], scale['inventory'])
+        else:
+            print(f"seeding {args.tickets} tickets...", flush=True)
+            scale = seed(f'sqlite:///{template}', args.tickets, seed=args.seed)
+
+        chosen = [s for s in scenarios(scale)
+                  if not args.only or any(s['name'].startswith(p) or s['endpoint'].startswith(p) for p in args.only)]
+        meta = {'commit': _commit(), 'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(), 'scale': scale, 'seed': args.seed,
+                **{key: getattr(args, key) for key in ('requests', 'warmup', 'concurrency', 'server', 'workers', 'threads', 'cache')}}
+        report = {'meta': meta, 'results': {}}
+
+        for driver in args.driver:
+            path = os.path.join(directory, f'{driver}.db')
+            shutil.copy(template, path)
+            env = {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'BENCH_CACHE': args.cache,
+                   'CACHE_SQLITE_PATH': os.path.join(directory, f'{driver}-cache.sqlite')}
+            engine = create_engine(f'sqlite:///{path}')
+            server = None
+            if driver == 'client':
+                os.environ.update(env)
+                _client_app = bench_app()
+                missing = uncovered(_client_app, chosen if not args.only else scenarios(scale))
+                if missing:
+                    print(f"no scenario for: {', '.join(missing)}")
+            else:
+                target = 'benchmarks.routes:wsgi_app()' if args.server == 'gunicorn' else 'benchmarks.routes:asgi_app'
+                server, port = start_server(args.server, target, env, args.workers, args.threads)
+            print(f"\n{driver}: {args.requests} requests per scenario" +
+                  (f", {args.concurrency} connections to {args.server}" if server else ", one at a time"))
+            print(f"{'scenario':<36} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>7} {'errors':>6}")
+            results = report['results'][driver] = {}
+            try:
+                for s in chosen:
+                    n = min(args.requests, s['max_requests'] or args.requests)
+                    warmup = min(args.warmup, n // 5 or 1)
+                    spares = []
+                    if s['prepare']:
+                        with engine.begin() as conn:
+                            spares = s['prepare'](conn, n + warmup) or []
+                    requests = build_requests(s, n + warmup, spares, args.seed)
+                    if server:
+                        result = run_http(s, requests, warmup, server, port, args.concurrency)
+                    else:
+                        result = run_client(s, requests, warmup)
+                    result['endpoint'] = s['endpoint']
+                    results[s['name']] = result
+                    print(f"{s['name']:<36} {result['throughput']:>8.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                          f"{result['p99_ms']:>8.2f} {result['peak_rss_mb'] or 0:>7.1f} {result['errors']:>6}", flush=True)
+            finally:
+                if server:
+                    server.terminate()
+                    server.wait()
+                engine.dispose()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nsaved {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
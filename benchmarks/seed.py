@@ -0,0 +1,113 @@
+"""Deterministic synthetic data: customers, mechanics, parts and tickets at any scale.
+
+    python -m benchmarks.seed --db shop.db [--tickets 100000] [--customers N] [--mechanics N] [--parts N] [--seed 0]
+
+The same arguments always produce the same rows, so results from different runs (and
+different commits) are measured on identical data. Unset counts follow --tickets: a
+customer per 10 tickets, a mechanic per 2000 (at least 10), a part per 50 (at least 200).
+Tickets get 1-3 mechanics and 0-3 parts and spread over three years; every customer's
+password is PASSWORD. The schema is created and migrated the way flask upgrade-db does.
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine, insert
+from app.migrations import upgrade
+from app.models import db, Customer, Inventory, Mechanic, ServiceTicket, inventory_ticket, ticket_mechanic
+from app.utils import search #noqa: F401, creates the part search index with the inventory table
+from app.utils.passwords import hash_password
+
+PASSWORD = 'password123'
+FIRST_DAY = date(2023, 1, 1)
+DAYS = 3 * 365
+BATCH = 10000
+
+FIRST_NAMES = ['Ana', 'Ben', 'Chloe', 'Dev', 'Elif', 'Femi', 'Grace', 'Hugo', 'Ines', 'Jon', 'Kofi', 'Lena', 'Mei', 'Nils', 'Omar', 'Priya']
+LAST_NAMES = ['Alvarez', 'Brown', 'Chen', 'Dubois', 'Eze', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen', 'Kowalski', 'Lopez', 'Novak', 'Okafor']
+PART_WORDS = ['oil', 'air', 'cabin', 'fuel', 'brake', 'spark', 'timing', 'wiper', 'coolant', 'transmission', 'wheel', 'ignition']
+PART_KINDS = ['filter', 'pad', 'rotor', 'plug', 'belt', 'blade', 'hose', 'pump', 'sensor', 'bearing', 'coil', 'gasket']
+JOBS = ['Oil change', 'Brake pads and rotors', 'Tire rotation', 'Timing belt replacement', 'Battery replacement',
+        'Coolant flush', 'Check engine light diagnosis', 'Wheel alignment', 'Spark plug replacement', 'AC recharge']
+VIN_CHARS = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789' #no I, O or Q
+
+def counts(tickets, customers=None, mechanics=None, parts=None):
+    return {
+        'customers': customers or max(1, tickets // 10),
+        'mechanics': mechanics or max(10, tickets // 2000),
+        'parts': parts or max(200, tickets // 50),
+        'tickets': tickets,
+    }
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def seed(url, tickets, customers=None, mechanics=None, parts=None, seed=0):
+    """Create the schema at `url` and fill it. Returns the row counts."""
+    scale = counts(tickets, customers, mechanics, parts)
+    rng = random.Random(seed)
+    password = hash_password(PASSWORD) #one hash for everyone: hashing each would take minutes
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    upgrade(engine)
+
+    def name(i):
+        return f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]}"
+
+    with engine.begin() as conn:
+        conn.execute(insert(Customer), [
+            {'name': name(i), 'email': f'customer{i}@example.com', 'phone': f'555{i:07d}', 'password': password}
+            for i in range(scale['customers'])
+        ])
+        conn.execute(insert(Mechanic), [
+            {'name': name(i + 7), 'email': f'mechanic{i}@example.com', 'phone': f'556{i:07d}', 'salary': rng.randrange(40000, 90000, 500)}
+            for i in range(scale['mechanics'])
+        ])
+        conn.execute(insert(Inventory), [
+            {'name': f'{rng.choice(PART_WORDS)} {rng.choice(PART_KINDS)} {i}', 'price': rng.randrange(199, 49999) / 100,
+             'stock': rng.randrange(0, 500)}
+            for i in range(scale['parts'])
+        ])
+        for batch in _batches({
+            'VIN': ''.join(rng.choice(VIN_CHARS) for _ in range(17)),
+            'service_date': FIRST_DAY + timedelta(days=rng.randrange(DAYS)),
+            'service_desc': rng.choice(JOBS),
+            'customer_id': rng.randint(1, scale['customers']),
+        } for _ in range(tickets)):
+            conn.execute(insert(ServiceTicket), batch)
+        for batch in _batches({'ticket_id': ticket, 'mechanic_id': mechanic}
+                              for ticket in range(1, tickets + 1)
+                              for mechanic in rng.sample(range(1, scale['mechanics'] + 1), rng.randint(1, 3))):
+            conn.execute(insert(ticket_mechanic), batch)
+        for batch in _batches({'ticket_id': ticket, 'inventory_id': part, 'quantity': rng.randint(1, 4)}
+                              for ticket in range(1, tickets + 1)
+                              for part in rng.sample(range(1, scale['parts'] + 1), rng.randint(0, 3))):
+            conn.execute(insert(inventory_ticket), batch)
+    engine.dispose()
+    return scale
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='SQLite file to create (or a database URL)')
+    parser.add_argument('--tickets', type=int, default=100000)
+    parser.add_argument('--customers', type=int)
+    parser.add_argument('--mechanics', type=int)
+    parser.add_argument('--parts', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    url = args.db if '://' in args.db else f'sqlite:///{args.db}'
+    started = time.perf_counter()
+    scale = seed(url, args.tickets, args.customers, args.mechanics, args.parts, args.seed)
+    print(', '.join(f"{count} {table}" for table, count in scale.items()) + f" in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
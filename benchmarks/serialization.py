@@ -0,0 +1,65 @@
+"""Rows per second for list responses, marshmallow + json vs compiled serializer + FastJSONProvider.
+
+    python -m benchmarks.serialization [--rows 5000] [--repeat 5]
+
+Serializes in-memory tickets (with their customer and mechanics) and parts the way
+GET /tickets and GET /inventory do, and checks both paths produce the same bytes.
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from app.models import Customer, Mechanic, ServiceTicket, Inventory
+from app.blueprints.tickets.schemas import tickets_schema
+from app.blueprints.inventory.schemas import inventories_schema
+from app.utils.serializers import dump
+
+
+def build_rows(count):
+    mechanics = [Mechanic(id=i, name=f"Mechanic {i}", email=f"m{i}@example.com", phone="5550000", salary=40000.0 + i) for i in range(10)]
+    customers = [Customer(id=i, name=f"Customer {i}", email=f"c{i}@example.com", phone="5551111", password="x") for i in range(100)]
+    tickets = [
+        ServiceTicket(id=i, VIN=f"1HGCM82633A{i:06d}", service_date=date(2024, 1, 1) + timedelta(days=i % 365),
+                      service_desc="Brake pads and rotors", customer=customers[i % 100],
+                      mechanics=[mechanics[i % 10], mechanics[(i + 3) % 10]])
+        for i in range(count)
+    ]
+    parts = [Inventory(id=i, name=f"Part {i}", price=9.99 + i % 50, stock=i % 20) for i in range(count)]
+    return tickets, parts
+
+
+def rate(fn, rows, repeat):
+    best = min(_time(fn) for _ in range(repeat))
+    return rows / best
+
+
+def _time(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    baseline = DefaultJSONProvider(app)
+    compact = {'separators': (',', ':')}
+    tickets, parts = build_rows(args.rows)
+
+    print(f"{'collection':<10} {'before rows/s':>14} {'after rows/s':>13} {'speedup':>8}")
+    with app.app_context():
+        for name, schema, rows in (('tickets', tickets_schema, tickets), ('inventory', inventories_schema, parts)):
+            before = lambda: baseline.dumps({'items': schema.dump(rows), 'next_cursor': None}, **compact)
+            after = lambda: app.json.dumps({'items': dump(schema, rows), 'next_cursor': None}, **compact)
+            assert before() == after(), f"{name}: output differs"
+            old, new = rate(before, len(rows), args.repeat), rate(after, len(rows), args.repeat)
+            print(f"{name:<10} {old:>14,.0f} {new:>13,.0f} {new / old:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Cost of checking a bearer token, with and without the verified-token cache.
+
+    python -m benchmarks.token_cache [--calls 20000]
+
+Compares a full jwt.decode against verify_token on a token it has already seen.
+"""
+import argparse
+import timeit
+from jose import jwt
+from app.utils import util
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    token = util.encode_token(1)
+    util.verify_token(token) #warm the cache
+
+    timings = {
+        'jwt.decode': timeit.timeit(lambda: jwt.decode(token, util.SECRET_KEY, algorithms=['HS256']), number=args.calls),
+        'verify_token (cached)': timeit.timeit(lambda: util.verify_token(token), number=args.calls),
+    }
+    baseline = timings['jwt.decode']
+    for name, seconds in timings.items():
+        print(f"{name:<22} {seconds / args.calls * 1e6:8.2f} us/call {baseline / seconds:6.1f}x")
+    print(util.token_cache_stats())
+
+
+if __name__ == '__main__':
+    main()
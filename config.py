@@ -1,16 +1,66 @@
 import os
 
+# per-client limits on writes, by route (see rate_limit in app/extensions.py)
+RATE_LIMITS = {
+    'create_customer': "5 per day", #no more than 5 new accounts per ip address
+    'update_customer': "5 per day", #prevent changes to accounts too often
+    'delete_customer': "5 per day",
+    'create_mechanic': "5 per day",
+    'update_mechanic': "50 per day",
+    'delete_mechanic': "5 per day",
+    'create_ticket': "100 per day", #a small mechanic company likely will not have more than 100 issues in a day
+    'create_tickets_bulk': "100 per day",
+    'update_ticket': "100 per day",
+}
+
 class DevelopmentConfig:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///mechanic_shop.db' 
+    DATABASE_PROFILE = 'dev' #see app/utils/engine_profiles.py
     DEBUG = True
-    CACHE = 'SimpleCache'
+    # per-process LRU in front of a SQLite file shared by every worker on the host
+    CACHE_TYPE = 'app.utils.cache_backends.TieredCache'
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_SQLITE_PATH = 'mechanic_shop_dev_cache.sqlite' #in the instance folder, like the database
+    # rate limit counters shared by every worker, see app/utils/limiter_storage.py
+    RATELIMIT_STORAGE_URI = 'sqlite:///mechanic_shop_dev_limits.sqlite' #in the instance folder
+    RATE_LIMITS = RATE_LIMITS
+    # read replicas, see app/utils/replicas.py. To try them locally:
+    #   READ_REPLICA_URIS='sqlite:///file:mechanic_shop_replica.db?mode=ro&uri=true' flask run
+    # every commit is then copied to the replica file (SQLITE_REPLICA_SYNC)
+    READ_REPLICA_URIS = os.environ.get('READ_REPLICA_URIS', '').split()
+    SQLITE_REPLICA_SYNC = True
+    QUERY_BUDGET_MODE = 'log' #warn about routes over their query budget
 
 class TestingConfig:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///testing.db'
+    DATABASE_PROFILE = 'test'
     DEBUG = True
     CACHE_TYPE = 'SimpleCache'
+    PASSWORD_SCRYPT_LOG2_N = 10 #cheap hashes keep the suite fast
+    RATELIMIT_STORAGE_URI = 'memory://' #fresh counters for every test app
+    RATE_LIMITS = RATE_LIMITS
+    QUERY_BUDGET_MODE = 'raise' #any request over its route's query budget fails the test, see app/utils/query_budget.py
 
 class ProductionConfig:
     SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI')
-    CACHE_TYPE = "SimpleCache"
\ No newline at end of file
+    DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE') #production-sqlite or production-server-db, from the URI when unset
+    CACHE_TYPE = 'app.utils.cache_backends.TieredCache'
+    CACHE_DEFAULT_TIMEOUT = 6 * 60 * 60 #cached views are invalidated on write, so they can live for hours
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or 'mechanic_shop_cache.sqlite' #relative to the instance folder
+    CACHE_L1_MAX_ENTRIES = 2048 #per worker
+    CACHE_L1_TIMEOUT = 5 #seconds a worker may serve its local copy after another worker replaced it
+    CACHE_L2_MAX_BYTES = 256 * 1024 * 1024
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or 'sqlite:///mechanic_shop_limits.sqlite' #relative to the instance folder
+    RATE_LIMITS = RATE_LIMITS
+    READ_REPLICA_URIS = os.environ.get('READ_REPLICA_URIS', '').split() #space separated; kept in sync by the database
+    #how far replicas may fall behind: a client reads from the primary this long after its
+    #writes, and replica reads of tables written this recently aren't cached
+    REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_RETRY_SECONDS = 30 #an unreachable replica is skipped this long
+    PASSWORD_SCRYPT_LOG2_N = int(os.environ.get('PASSWORD_SCRYPT_LOG2_N', 14)) #see benchmarks/password_hashing.py
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1400)) #bytes; smaller responses go out uncompressed
+    # request metrics summed over every worker on the host, see app/utils/metrics.py
+    METRICS_SQLITE_PATH = os.environ.get('METRICS_SQLITE_PATH') or 'mechanic_shop_metrics.sqlite' #relative to the instance folder
+    METRICS_FLUSH_SECONDS = 5
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE') #'log' on staging to report routes over their query budget